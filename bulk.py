@@ -0,0 +1,244 @@
+"""
+Offline bulk signing and verification of directory trees.
+
+Walks the given files/directories, dispatches each file by extension to the image, PDF or
+video backend across a process pool and appends one JSON line per file to --output.
+
+    python bulk.py sign archive/ --jobs 8
+    python bulk.py verify archive/ incoming/clip.mp4 --mode quick
+
+Workers only compute (hashing or verification); when signing, the parent holds the private
+key and writes each batch of records in a single provenance-store transaction. Completed
+files are appended to a checkpoint after every batch, so an interrupted run picks up where
+it stopped when started again with the same arguments. A crash between a batch commit and
+its checkpoint write can only cause that one batch to be signed twice.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BASE_DIR, 'python_backend'))
+
+from video_utils import DEFAULT_ALG, SUPPORTED_ALGS
+from provenance_store import (transaction, load_private_key, load_public_key,
+                              PROVENANCE_DIR, PRIVATE_KEY_PATH, PUBLIC_KEY_PATH)
+
+MEDIA_TYPES = {
+    ".jpg": "image", ".jpeg": "image", ".png": "image",
+    ".pdf": "pdf",
+    ".mp4": "video", ".mov": "video", ".avi": "video", ".mkv": "video",
+}
+BATCH_SIZE = 64
+# Tasks queued per worker, enough to keep every process busy without materialising the whole tree
+QUEUE_DEPTH = 4
+# Workers start from a clean forkserver, not a fork of the caller: libvips' thread pool doesn't
+# survive fork, so workers forked from a process that already handled an image would hang
+POOL_START_METHOD = "forkserver"
+
+# Per-process state set by the pool initializer
+_worker = {}
+
+
+def iter_media(paths, skip_dir=None):
+    skip_dir = os.path.realpath(skip_dir) if skip_dir else None
+    for path in paths:
+        if os.path.isfile(path):
+            if os.path.splitext(path)[1].lower() in MEDIA_TYPES:
+                yield os.path.abspath(path)
+            continue
+        for root, dirs, files in os.walk(path):
+            # Never pick up our own records or tamper maps
+            dirs[:] = sorted(d for d in dirs if os.path.realpath(os.path.join(root, d)) != skip_dir)
+            for name in sorted(files):
+                if os.path.splitext(name)[1].lower() in MEDIA_TYPES:
+                    yield os.path.abspath(os.path.join(root, name))
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def append_lines(path, lines):
+    with open(path, "a") as f:
+        for line in lines:
+            f.write(line + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# --- Worker side ---
+
+def init_worker(mode, options):
+    # Verifiers report progress with print(); with many processes that is just noise
+    if not options["verbose"]:
+        sys.stdout = open(os.devnull, "w")
+    _worker["options"] = options
+    if mode == "verify":
+        _worker["public_key"] = load_public_key(options["public_key"])
+
+
+def hash_file(path):
+    media = MEDIA_TYPES[os.path.splitext(path)[1].lower()]
+    alg = _worker["options"]["alg"]
+    started = time.perf_counter()
+    if media == "image":
+        from image_sign import hash_image
+        fields = hash_image(path, alg)
+    elif media == "pdf":
+        from pdf_sign import hash_pdf
+        fields = hash_pdf(path, alg)
+    else:
+        from video_sign import hash_video
+        fields = hash_video(path, alg)
+    return media, fields, time.perf_counter() - started
+
+
+def verify_file(path):
+    media = MEDIA_TYPES[os.path.splitext(path)[1].lower()]
+    options = _worker["options"]
+    kwargs = {"public_key": _worker["public_key"], "provenance_dir": options["provenance_dir"], "evidence": False}
+    started = time.perf_counter()
+    if media == "image":
+        from image_verify import verify_image
+        report = verify_image(path, **kwargs)
+    elif media == "pdf":
+        from pdf_verify import verify_pdf
+        report = verify_pdf(path, **kwargs)
+    else:
+        from video_verify import verify_video
+        report = verify_video(path, mode=options["video_mode"], **kwargs)
+    return media, report, time.perf_counter() - started
+
+
+# --- Parent side ---
+
+class BulkRun:
+    def __init__(self, args):
+        self.args = args
+        self.done = load_checkpoint(args.checkpoint)
+        self.private_key = load_private_key(args.key) if args.command == "sign" else None
+        self.pending = []  # (path, result line, fields to sign or None)
+        self.counts = {}
+        self.files = 0
+        self.bytes = 0
+
+    def handle(self, path, future):
+        entry = {"file": path}
+        fields = None
+        try:
+            media, result, elapsed = future.result()
+            entry.update(type=media, elapsed_s=round(elapsed, 3))
+            if self.args.command == "sign":
+                fields = result
+                entry["status"] = "SIGNED"
+            else:
+                entry.update(status=result.get("status"), report=result)
+        except Exception as e:
+            entry.update(status="ERROR", error=f"{type(e).__name__}: {e}")
+        self.pending.append((path, entry, fields))
+        if len(self.pending) >= self.args.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        if self.private_key is not None:
+            with transaction(self.private_key, self.args.provenance_dir) as txn:
+                for _, entry, fields in self.pending:
+                    if fields is not None:
+                        entry["record"] = txn.add(fields)
+
+        append_lines(self.args.output, [json.dumps(entry, default=str) for _, entry, _ in self.pending])
+        # Failed files stay out of the checkpoint so a rerun retries them
+        finished = [path for path, entry, _ in self.pending if entry["status"] != "ERROR"]
+        append_lines(self.args.checkpoint, finished)
+        self.done.update(finished)
+
+        for path, entry, _ in self.pending:
+            self.counts[entry["status"]] = self.counts.get(entry["status"], 0) + 1
+            self.files += 1
+            try:
+                self.bytes += os.path.getsize(path)
+            except OSError:
+                pass
+        self.pending = []
+
+    def run(self):
+        args = self.args
+        options = {
+            "alg": args.alg,
+            "public_key": args.public_key,
+            "provenance_dir": args.provenance_dir,
+            "video_mode": args.mode,
+            "verbose": args.verbose,
+        }
+        task = hash_file if args.command == "sign" else verify_file
+        todo = (path for path in iter_media(args.paths, args.provenance_dir) if path not in self.done)
+
+        started = time.perf_counter()
+        in_flight = {}
+        with ProcessPoolExecutor(args.jobs, mp_context=multiprocessing.get_context(POOL_START_METHOD),
+                                 initializer=init_worker, initargs=(args.command, options)) as pool:
+            try:
+                for path in todo:
+                    if len(in_flight) >= args.jobs * QUEUE_DEPTH:
+                        finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in finished:
+                            self.handle(in_flight.pop(future), future)
+                    in_flight[pool.submit(task, path)] = path
+
+                for future in list(in_flight):
+                    self.handle(in_flight.pop(future), future)
+            except KeyboardInterrupt:
+                for future in in_flight:
+                    future.cancel()
+                print("Interrupted, saving completed files...")
+            finally:
+                self.flush()
+
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        if not self.files:
+            print(f"Nothing to do ({len(self.done)} files already in {args.checkpoint})")
+        else:
+            print(f"{self.files} files in {elapsed:.1f}s "
+                  f"({self.files / elapsed:.1f} files/s, {self.bytes / elapsed / 1e6:.1f} MB/s): "
+                  + ", ".join(f"{status} {count}" for status, count in sorted(self.counts.items())))
+        return self.counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sign or verify directory trees of images, PDFs and videos")
+    parser.add_argument("command", choices=("sign", "verify"))
+    parser.add_argument("paths", nargs="+", help="Files and/or directories (walked recursively)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help="Files per provenance transaction and checkpoint write")
+    parser.add_argument("--alg", default=DEFAULT_ALG, choices=SUPPORTED_ALGS,
+                        help="Hash algorithm for new records (blake3 needs the blake3 package)")
+    parser.add_argument("--mode", choices=("full", "quick"), default="full", help="Video verification mode")
+    parser.add_argument("--key", default=PRIVATE_KEY_PATH, help="Private key (sign)")
+    parser.add_argument("--public-key", default=PUBLIC_KEY_PATH, help="Public key (verify)")
+    parser.add_argument("--provenance-dir", default=PROVENANCE_DIR)
+    parser.add_argument("--output", help="JSONL results (default bulk_<command>.jsonl)")
+    parser.add_argument("--checkpoint", help="Completed-file list used to resume (default bulk_<command>.checkpoint)")
+    parser.add_argument("--verbose", action="store_true", help="Keep backend output from the workers")
+    args = parser.parse_args()
+
+    args.output = args.output or f"bulk_{args.command}.jsonl"
+    args.checkpoint = args.checkpoint or f"bulk_{args.command}.checkpoint"
+
+    counts = BulkRun(args).run()
+    if counts.get("ERROR"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+from gevent import monkey, socket
+from gunicorn.workers.ggevent import GeventWorker
+
+# Only network I/O (sockets, select, time, ...) is patched, which is what keeps uploads and
+# polling cooperative. JobManager runs jobs on real OS threads that spawn ffmpeg, and those
+# need the unpatched world: with patched threading/queue, imageio-ffmpeg's stderr reader and
+# the executor's work queue become greenlets that never run on a job thread, and with patched
+# os the next ffmpeg spawn from a job thread can hang before exec.
+PATCH_OPTIONS = {"thread": False, "queue": False, "subprocess": False, "os": False}
+
+
+class NativeThreadsGeventWorker(GeventWorker):
+    """
+    gunicorn's gevent worker, patching only what request handling needs (PATCH_OPTIONS).
+    """
+
+    def patch(self):
+        monkey.patch_all(**PATCH_OPTIONS)
+
+        # Same as GeventWorker.patch: rewrap the inherited listeners as gevent sockets
+        self.sockets = [socket.socket(s.FAMILY, socket.SOCK_STREAM, fileno=s.sock.detach())
+                        for s in self.sockets]
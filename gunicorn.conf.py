@@ -0,0 +1,27 @@
+import os
+
+# Uploads are read by cooperative gevent greenlets instead of a fixed pool of
+# threads, so slow clients streaming large files can't occupy every request
+# slot and starve /health or job polling. CPU-heavy signing and verification
+# still run on native threads inside JobManager (see gevent_worker.py).
+worker_class = "gevent_worker.NativeThreadsGeventWorker"
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+worker_connections = int(os.environ.get("WORKER_CONNECTIONS", 1000))
+timeout = 600
+
+# Set WARM_BACKENDS=0 to skip importing the media backends before forking (each worker
+# then imports a backend on the first request for its media type)
+warm_backends = os.environ.get("WARM_BACKENDS", "1") != "0"
+
+def on_starting(arbiter):
+    # Runs once in the master before any worker forks. Keys are bootstrapped here (so two
+    # workers can never race to generate different identities) and backends are imported
+    # here so every worker shares them copy-on-write and answers /health immediately.
+
+    # Patch before the app (and its imports) load, exactly as the workers will
+    from gevent import monkey
+    from gevent_worker import PATCH_OPTIONS
+    monkey.patch_all(**PATCH_OPTIONS)
+
+    import server
+    server.bootstrap(warm=warm_backends)
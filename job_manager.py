@@ -1,49 +1,313 @@
+import os
+import re
+import json
+import math
 import uuid
 import time
+import random
+from contextlib import nullcontext
 from concurrent.futures import ThreadPoolExecutor
 import threading
+from job_profiler import JobProfiler, PROFILE_SAMPLE_RATE
+
+try:
+    from gevent import monkey
+except ImportError:
+    monkey = None
+
+# Jobs must finish (or give up cooperatively) before gunicorn's 600s worker timeout
+DEFAULT_DEADLINE = float(os.environ.get("JOB_DEADLINE_SECONDS", 540))
+# New work is refused while the projected wait for a free worker exceeds this
+MAX_QUEUE_WAIT = float(os.environ.get("MAX_QUEUE_WAIT_SECONDS", 120))
+
+# Job status is mirrored here so any Gunicorn worker can answer polls and cancels for jobs
+# another worker accepted; each worker process has its own JobManager
+JOB_STATE_DIR = os.environ.get("JOB_STATE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs"))
+# Status files of finished jobs are removed after this long
+JOB_STATE_TTL = float(os.environ.get("JOB_STATE_TTL_SECONDS", 24 * 3600))
+JOB_ID_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+# Initial processing cost estimates in seconds per MB of upload, refined from completed jobs.
+# Compressed video expands to many raw frames, so it is by far the most expensive per byte.
+DEFAULT_SECONDS_PER_MB = {
+    "image/jpeg": 0.1,
+    "application/pdf": 0.01,
+    "video/mp4": 2.0,
+}
+BASE_JOB_SECONDS = 0.5
+# Weight of the latest observation in the per-media-type moving average
+RATE_SMOOTHING = 0.2
+
+class JobCancelled(BaseException):
+    """
+    Raised from a job's checkpoint when it was cancelled or ran past its deadline.
+    Like asyncio.CancelledError it is not an Exception, so the backends' broad
+    `except Exception` handlers can't swallow it.
+    """
+
+class AdmissionRejected(Exception):
+    def __init__(self, retry_after):
+        super().__init__(f"Queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+def _native_threads_patched():
+    return monkey is not None and monkey.is_module_patched("threading")
+
+def _native_lock():
+    # The lock is shared between request greenlets and native job threads, so it must be a real OS lock
+    if monkey is not None:
+        return monkey.get_original("_thread", "allocate_lock")()
+    return threading.Lock()
 
 class JobManager:
-    def __init__(self, max_workers=1):
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
-        self.jobs = {} # { job_id: { status: 'queued'|'processing'|'done'|'failed', result: ..., error: ... } }
-        self.lock = threading.Lock()
+    def __init__(self, max_workers=1, max_queue_wait=MAX_QUEUE_WAIT, default_deadline=DEFAULT_DEADLINE,
+                 profile_sample_rate=PROFILE_SAMPLE_RATE, state_dir=None):
+        self.max_workers = max_workers
+        self.state_dir = state_dir # Shared job status directory, or None for a single process
+        self.last_prune = 0.0
+        self.max_queue_wait = max_queue_wait
+        self.default_deadline = default_deadline
+        self.profile_sample_rate = profile_sample_rate
+        self.executor = None # Created on first submit, after any gevent monkey-patching
+        self.jobs = {} # { job_id: { status: 'queued'|'processing'|'done'|'failed'|'cancelled', result: ..., error: ... } }
+        self.seconds_per_mb = dict(DEFAULT_SECONDS_PER_MB)
+        self.lock = _native_lock()
+
+    def _get_executor(self):
+        if self.executor is None:
+            if _native_threads_patched():
+                # Under gevent workers a patched ThreadPoolExecutor would run jobs as greenlets and
+                # block the event loop; gevent's executor always uses native threads.
+                from gevent.threadpool import ThreadPoolExecutor as NativeThreadPoolExecutor
+                self.executor = NativeThreadPoolExecutor(max_workers=self.max_workers)
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self.executor
+
+    # --- Admission control ---
+    def estimate_cost(self, kind, size_bytes):
+        rate = self.seconds_per_mb.get(kind, max(DEFAULT_SECONDS_PER_MB.values()))
+        return BASE_JOB_SECONDS + rate * (size_bytes or 0) / (1024 * 1024)
+
+    def _projected_wait_locked(self):
+        now = time.time()
+        backlog = 0.0
+        for job in self.jobs.values():
+            if job["status"] == "queued":
+                backlog += job["cost"]
+            elif job["status"] == "processing":
+                backlog += max(0.0, job["cost"] - (now - job["started_at"]))
+        return backlog / self.max_workers
+
+    def projected_wait(self):
+        """
+        Estimated seconds before a newly submitted job would start.
+        """
+        with self.lock:
+            return self._projected_wait_locked()
+
+    def _check_admission_locked(self):
+        wait = self._projected_wait_locked()
+        if wait > self.max_queue_wait:
+            raise AdmissionRejected(max(1, math.ceil(wait - self.max_queue_wait)))
+
+    def check_admission(self):
+        """
+        Cheap early check (e.g. before reading an upload body); raises AdmissionRejected.
+        """
+        with self.lock:
+            self._check_admission_locked()
+
+    # --- Shared status ---
+    def _state_path(self, job_id, ext=".json"):
+        return os.path.join(self.state_dir, f"{job_id}{ext}")
+
+    def _publish(self, job_id, job):
+        """
+        Write the job's status for the other worker processes. Call with a snapshot taken
+        under the lock; writes are atomic renames, so readers never see a partial file.
+        """
+        if self.state_dir is None:
+            return
+        state = {key: value for key, value in job.items() if key != "cancel_requested"}
+        path = self._state_path(job_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.state_dir, exist_ok=True)
+            with open(tmp_path, "w") as f:
+                json.dump(state, f, default=str)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # This process still answers for the job; only the other workers lose sight of it
+            print(f"Could not publish status of job {job_id}: {e}")
+
+    def _read_state(self, job_id):
+        if self.state_dir is None or not JOB_ID_RE.match(job_id):
+            return None
+        try:
+            with open(self._state_path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _prune_states(self):
+        # At most once a minute, drop status files of jobs that finished long ago
+        now = time.time()
+        if self.state_dir is None or now - self.last_prune < 60:
+            return
+        self.last_prune = now
+        for name in os.listdir(self.state_dir):
+            path = os.path.join(self.state_dir, name)
+            try:
+                if now - os.path.getmtime(path) > JOB_STATE_TTL:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    # --- Jobs ---
+    def submit_job(self, task_func, *args, kind=None, size=0, deadline=None, profile=False):
+        """
+        Queue task_func(*args, checkpoint=...) unless the projected wait is already too long
+        (raises AdmissionRejected). The task must call checkpoint() regularly; it raises
+        JobCancelled once the job is cancelled or past its deadline. `deadline` can only
+        shorten the default one, and must be a finite, positive number of seconds (ValueError).
+
+        With `profile` (or for a random `profile_sample_rate` share of jobs) the task runs
+        under JobProfiler and the job gains a "profile" summary with hotspots and an artifact.
+        """
+        if deadline is None:
+            deadline = self.default_deadline
+        elif not math.isfinite(deadline) or deadline <= 0:
+            raise ValueError(f"Deadline must be a positive number of seconds, got {deadline!r}")
+        deadline = min(deadline, self.default_deadline)
 
-    def submit_job(self, task_func, *args):
         job_id = str(uuid.uuid4())
-        
+        cost = self.estimate_cost(kind, size)
+
         with self.lock:
+            self._check_admission_locked()
+
+            now = time.time()
             self.jobs[job_id] = {
                 "status": "queued",
-                "submitted_at": time.time()
+                "submitted_at": now,
+                "deadline_at": now + deadline,
+                "kind": kind,
+                "size": size,
+                "cost": cost,
+                "cancel_requested": False,
+                "profiled": profile or random.random() < self.profile_sample_rate
             }
+            executor = self._get_executor()
+            snapshot = dict(self.jobs[job_id])
 
+        self._publish(job_id, snapshot)
         # Submit to thread pool
-        self.executor.submit(self._run_job, job_id, task_func, *args)
+        executor.submit(self._run_job, job_id, task_func, *args)
         return job_id
 
+    def cancel_job(self, job_id):
+        """
+        Queued jobs are cancelled immediately; running jobs stop at their next checkpoint.
+        Jobs of other worker processes get a cancel marker their checkpoint picks up.
+        Returns the job's status afterwards, or None if unknown.
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                if job["status"] == "queued":
+                    job["status"] = "cancelled"
+                    job["error"] = "Cancelled"
+                elif job["status"] == "processing":
+                    job["cancel_requested"] = True
+                snapshot = dict(job)
+
+        if job is not None:
+            self._publish(job_id, snapshot)
+            return snapshot["status"]
+
+        state = self._read_state(job_id)
+        if state is None:
+            return None
+        if state["status"] in ("queued", "processing"):
+            open(self._state_path(job_id, ".cancel"), "w").close()
+        return state["status"]
+
+    def _cancel_requested(self, job_id, job):
+        if not job["cancel_requested"] and self.state_dir is not None:
+            job["cancel_requested"] = os.path.exists(self._state_path(job_id, ".cancel"))
+        return job["cancel_requested"]
+
+    def _checkpoint(self, job_id):
+        job = self.jobs[job_id]
+        if self._cancel_requested(job_id, job):
+            raise JobCancelled("Cancelled")
+        if time.time() > job["deadline_at"]:
+            raise JobCancelled(f"Deadline exceeded after {job['deadline_at'] - job['submitted_at']:.0f}s")
+
     def _run_job(self, job_id, task_func, *args):
-        # Update to processing
+        # Update to processing (unless it was cancelled or expired while queued)
         with self.lock:
-             if job_id in self.jobs:
-                self.jobs[job_id]["status"] = "processing"
+            job = self.jobs[job_id]
+            if job["status"] == "cancelled":
+                return
+            job["status"] = "processing"
+            job["started_at"] = time.time()
+            snapshot = dict(job)
+        self._publish(job_id, snapshot)
 
+        profiler = JobProfiler(job_id) if job["profiled"] else None
         try:
+            self._checkpoint(job_id)
+
             # Execute the heavy task
-            result = task_func(*args)
-            
+            with profiler or nullcontext():
+                result = task_func(*args, checkpoint=lambda: self._checkpoint(job_id))
+
+            with self.lock:
+                job["status"] = "done"
+                job["result"] = result
+                self._observe(job)
+        except JobCancelled as e:
+            print(f"Job {job_id} stopped: {e}")
             with self.lock:
-                self.jobs[job_id]["status"] = "done"
-                self.jobs[job_id]["result"] = result
+                job["status"] = "cancelled" if job["cancel_requested"] else "failed"
+                job["error"] = str(e)
         except Exception as e:
             print(f"Job {job_id} failed: {e}")
             with self.lock:
-                self.jobs[job_id]["status"] = "failed"
-                self.jobs[job_id]["error"] = str(e)
+                job["status"] = "failed"
+                job["error"] = str(e)
+        finally:
+            with self.lock:
+                job["finished_at"] = time.time()
+                # Kept for failed and cancelled jobs too: slow files that hit the deadline matter most
+                if profiler is not None and profiler.summary is not None:
+                    job["profile"] = profiler.summary
+                snapshot = dict(job)
+            self._publish(job_id, snapshot)
+            if self.state_dir is not None and os.path.exists(self._state_path(job_id, ".cancel")):
+                os.remove(self._state_path(job_id, ".cancel"))
+            self._prune_states()
+
+    def _observe(self, job):
+        # Refine the per-media-type cost model from what this job actually took
+        size_mb = job["size"] / (1024 * 1024)
+        if job["kind"] is None or size_mb < 1:
+            return
+        observed = max(0.0, time.time() - job["started_at"] - BASE_JOB_SECONDS) / size_mb
+        previous = self.seconds_per_mb.get(job["kind"], observed)
+        self.seconds_per_mb[job["kind"]] = (1 - RATE_SMOOTHING) * previous + RATE_SMOOTHING * observed
 
     def get_job(self, job_id):
+        """
+        The job's status, from this process or, for jobs another worker accepted, from its status file.
+        """
         with self.lock:
-            return self.jobs.get(job_id)
+            job = self.jobs.get(job_id)
+        if job is None:
+            job = self._read_state(job_id)
+        return job
 
 # Singleton Instance
-job_manager = JobManager(max_workers=1)
+job_manager = JobManager(max_workers=1, state_dir=JOB_STATE_DIR)
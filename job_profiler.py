@@ -0,0 +1,158 @@
+import os
+import sys
+import time
+import glob
+import cProfile
+import pstats
+import importlib
+from collections import Counter
+
+try:
+    from gevent import monkey
+except ImportError:
+    monkey = None
+
+# "sampling" (low overhead, safe in production) or "cprofile" (deterministic, slower)
+PROFILE_MODE = os.environ.get("PROFILE_MODE", "sampling")
+# Stack sampling interval for the sampling profiler
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL_MS", 10)) / 1000
+# Fraction of all jobs profiled even without an explicit request (0 disables)
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles"))
+# Oldest artifacts are pruned beyond this many
+PROFILE_KEEP = 200
+TOP_HOTSPOTS = 15
+
+
+def _original(module, name):
+    # The sampler must be a real OS thread watching another OS thread, even under gevent
+    if monkey is not None:
+        return monkey.get_original(module, name)
+    return getattr(importlib.import_module(module), name)
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class JobProfiler:
+    """
+    Context manager profiling the code run inside it on the current thread.
+
+    In sampling mode a native thread snapshots the job thread's stack every `interval`
+    seconds and the artifact is a collapsed-stack file ("a;b;c <count>" per line), which
+    flamegraph.pl, speedscope and most flamegraph viewers read directly. In cprofile mode
+    the artifact is a pstats dump (snakeviz, `python -m pstats`).
+    """
+
+    def __init__(self, name, mode=PROFILE_MODE, interval=PROFILE_INTERVAL, artifact_dir=PROFILE_DIR):
+        self.name = name
+        self.mode = mode
+        self.interval = interval
+        self.artifact_dir = artifact_dir
+        self.stacks = Counter()
+        self.summary = None
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        if self.mode == "cprofile":
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+            return self
+
+        self.thread_id = _original("_thread", "get_ident")()
+        self.root = sys._getframe(1)  # The frame running the `with` block
+        self.running = True
+        self.finished = _original("_thread", "allocate_lock")()
+        self.finished.acquire()
+        _original("_thread", "start_new_thread")(self._sample, ())
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self.started
+        if self.mode == "cprofile":
+            self.profiler.disable()
+        else:
+            self.running = False
+            self.finished.acquire()
+
+        # A profiling problem must never fail the job itself
+        try:
+            if self.mode == "cprofile":
+                self.summary = self._cprofile_summary(duration)
+            else:
+                self.summary = self._sampling_summary(duration)
+        except Exception as e:
+            print(f"Profiling {self.name} failed: {e}")
+            self.summary = {"mode": self.mode, "duration_s": round(duration, 3), "error": str(e)}
+        return False
+
+    # --- Sampling ---
+    def _sample(self):
+        sleep = _original("time", "sleep")
+        try:
+            while self.running:
+                frame = sys._current_frames().get(self.thread_id)
+                if frame is not None:
+                    self.stacks[self._collapse(frame)] += 1
+                sleep(self.interval)
+        finally:
+            self.finished.release()
+
+    def _collapse(self, frame):
+        # Stop at the frame that entered the profiler so executor internals stay out of the graph
+        labels = []
+        while frame is not None:
+            labels.append(_frame_label(frame.f_code))
+            if frame is self.root:
+                break
+            frame = frame.f_back
+        return ";".join(reversed(labels))
+
+    def _sampling_summary(self, duration):
+        total = sum(self.stacks.values())
+        self_counts = Counter()
+        total_counts = Counter()
+        for stack, count in self.stacks.items():
+            labels = stack.split(";")
+            self_counts[labels[-1]] += count
+            for label in set(labels):
+                total_counts[label] += count
+
+        hotspots = [{
+            "function": label,
+            "samples": count,
+            "self_pct": round(100 * count / total, 1),
+            "total_pct": round(100 * total_counts[label] / total, 1),
+        } for label, count in self_counts.most_common(TOP_HOTSPOTS)]
+
+        path = self._artifact_path(".collapsed")
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        return {"mode": "sampling", "interval_ms": self.interval * 1000, "samples": total,
+                "duration_s": round(duration, 3), "hotspots": hotspots, "artifact": path}
+
+    # --- Deterministic ---
+    def _cprofile_summary(self, duration):
+        path = self._artifact_path(".prof")
+        self.profiler.dump_stats(path)
+
+        stats = pstats.Stats(self.profiler).stats
+        ranked = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:TOP_HOTSPOTS]
+        hotspots = [{
+            "function": f"{func} ({os.path.basename(filename)}:{line})",
+            "calls": calls,
+            "self_s": round(tottime, 4),
+            "total_s": round(cumtime, 4),
+        } for (filename, line, func), (_, calls, tottime, cumtime, _) in ranked]
+
+        return {"mode": "cprofile", "duration_s": round(duration, 3), "hotspots": hotspots, "artifact": path}
+
+    def _artifact_path(self, ext):
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        existing = sorted(glob.glob(os.path.join(self.artifact_dir, "*")), key=os.path.getmtime)
+        for old in existing[:max(0, len(existing) - PROFILE_KEEP + 1)]:
+            os.remove(old)
+        return os.path.join(self.artifact_dir, f"{self.name}{ext}")
@@ -0,0 +1,440 @@
+"""
+End-to-end load test for the Hemlock HTTP API.
+
+Drives /api/protect, /api/verify and /api/jobs/<id> polling from concurrent clients and
+writes a JSON report (latency percentiles, throughput, error / 404 / 429 rates and a
+queue-wait breakdown) that can be diffed against a previous run with --baseline.
+
+    python loadtest.py --clients 8 --duration 60 --output report.json
+    python loadtest.py --url http://staging:8000 --mix image=3,pdf=1 --baseline report.json
+
+Without --url a local server is started with gunicorn.conf.py on a free port. It runs from
+the project root like the real service, so provenance records land in ./provenance.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import socket
+import argparse
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+import numpy as np
+import imageio.v3 as iio
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TERMINAL_STATUSES = ("done", "failed", "cancelled")
+PERCENTILES = (50, 90, 95, 99)
+# Any 404 while polling makes the job an error; one that keeps returning 404 this long is lost
+LOST_AFTER_SECONDS = 30
+VIDEO_SHAPE = (240, 320)
+
+
+# --- Fixtures ---
+def make_image(path, side, rng):
+    # Noise barely compresses, so the upload size tracks the pixel count
+    iio.imwrite(path, rng.integers(0, 256, (side, side, 3), dtype=np.uint8))
+
+
+def make_pdf(path, size_kb, rng):
+    header = b"%%PDF-1.4\n1 0 obj\n<< /Length %d >>\nstream\n" % (size_kb * 1024)
+    body = rng.integers(0, 256, size_kb * 1024, dtype=np.uint8).tobytes()
+    with open(path, "wb") as f:
+        f.write(header + body + b"\nendstream\nendobj\ntrailer\n<< >>\n%%EOF\n")
+
+
+def make_video(path, frames, rng):
+    h, w = VIDEO_SHAPE
+    iio.imwrite(path, rng.integers(0, 256, (frames, h, w, 3), dtype=np.uint8), fps=24)
+
+
+FIXTURE_MAKERS = {
+    "image": (".png", make_image),
+    "pdf": (".pdf", make_pdf),
+    "video": (".mp4", make_video),
+}
+
+
+def build_fixtures(sizes, fixture_dir, seed):
+    """
+    One synthetic file per (media, size). Returns {(media, size): path}.
+    """
+    os.makedirs(fixture_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    fixtures = {}
+    for media, media_sizes in sizes.items():
+        ext, make = FIXTURE_MAKERS[media]
+        for size in media_sizes:
+            path = os.path.join(fixture_dir, f"{media}_{size}{ext}")
+            if not os.path.exists(path):
+                make(path, size, rng)
+            fixtures[(media, size)] = path
+    return fixtures
+
+
+# --- HTTP ---
+def http_request(url, fields=None, file_path=None, headers=None, timeout=60):
+    """
+    Returns (status, headers, body). Multipart-encodes `fields` and `file_path` when given.
+    """
+    data = None
+    headers = dict(headers or {})
+    if fields is not None or file_path is not None:
+        boundary = uuid.uuid4().hex
+        parts = []
+        for name, value in (fields or {}).items():
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+        if file_path is not None:
+            with open(file_path, "rb") as f:
+                content = f.read()
+            name = os.path.basename(file_path)
+            parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{name}"\r\n'
+                         f'Content-Type: application/octet-stream\r\n\r\n'.encode() + content + b"\r\n")
+        parts.append(f"--{boundary}--\r\n".encode())
+        data = b"".join(parts)
+        headers["Content-Type"] = f"multipart/form-data; boundary={boundary}"
+
+    request = urllib.request.Request(url, data=data, headers=headers, method="POST" if data else "GET")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def wait_for_job(base_url, job_id, poll_interval, timeout, sample):
+    """
+    Poll until the job is terminal. Returns the final job dict or None if it was lost/timed out.
+    """
+    started = time.perf_counter()
+    first_404 = None
+    while time.perf_counter() - started < timeout:
+        status, _, body = http_request(f"{base_url}/api/jobs/{job_id}")
+        sample["polls"] += 1
+        if status == 404:
+            # Job state is shared by every worker (JOB_STATE_DIR), so whichever one answers should
+            # know the job; a 404 means it expired or its state never reached the shared store
+            sample["polls_404"] += 1
+            first_404 = first_404 or time.perf_counter()
+            if time.perf_counter() - first_404 > LOST_AFTER_SECONDS:
+                return None
+        elif status == 200:
+            first_404 = None
+            job = json.loads(body)
+            if job["status"] in TERMINAL_STATUSES:
+                return job
+        time.sleep(poll_interval)
+    return None
+
+
+# --- Client ---
+def weighted_choice(weights, rng):
+    names = list(weights)
+    return rng.choices(names, [weights[name] for name in names])[0]
+
+
+def run_job(base_url, op, media, size, path, args):
+    sample = {"op": op, "media": media, "size": size, "outcome": None,
+              "polls": 0, "polls_404": 0, "submit_s": None, "e2e_s": None}
+    fields = {}
+    if op == "verify" and args.verify_mode == "quick":
+        fields["mode"] = "quick"
+
+    started = time.perf_counter()
+    try:
+        status, headers, body = http_request(f"{base_url}/api/{op}", fields, path, timeout=args.timeout)
+    except OSError as e:
+        sample["outcome"] = "connection_error"
+        sample["error"] = str(e)
+        return sample
+    sample["submit_s"] = time.perf_counter() - started
+    sample["http_status"] = status
+
+    if status == 429:
+        sample["outcome"] = "rejected"
+        sample["retry_after"] = float(headers.get("Retry-After", 1))
+        return sample
+    if status != 200:
+        sample["outcome"] = "http_error"
+        return sample
+
+    job = wait_for_job(base_url, json.loads(body)["job_id"], args.poll_interval, args.timeout, sample)
+    sample["e2e_s"] = time.perf_counter() - started
+    if job is None:
+        sample["outcome"] = "lost"
+        return sample
+
+    sample["outcome"] = job["status"]
+    if job["status"] == "done" and op == "verify":
+        # A verify job that completes but doesn't verify means the harness or server is broken
+        if job["result"].get("status") not in ("VERIFIED", "UPDATED"):
+            sample["outcome"] = "verify_mismatch"
+    if job.get("started_at"):
+        sample["queue_wait_s"] = job["started_at"] - job["submitted_at"]
+    if job.get("finished_at") and job.get("started_at"):
+        sample["service_s"] = job["finished_at"] - job["started_at"]
+        # Whatever the client saw beyond the job's own lifetime is upload + polling overhead
+        sample["overhead_s"] = sample["e2e_s"] - (job["finished_at"] - job["submitted_at"])
+    return sample
+
+
+def client_loop(client_id, base_url, fixtures, signed, args, deadline, budget, results, lock):
+    rng = random.Random(args.seed * 1000 + client_id)
+    while time.perf_counter() < deadline:
+        with lock:
+            if budget[0] <= 0:
+                return
+            budget[0] -= 1
+
+        op = weighted_choice(args.ops, rng)
+        media = weighted_choice(args.mix, rng)
+        size = rng.choice(args.sizes[media])
+        path = signed[(media, size)] if op == "verify" else fixtures[(media, size)]
+
+        sample = run_job(base_url, op, media, size, path, args)
+        sample["client"] = client_id
+        with lock:
+            results.append(sample)
+
+        if sample["outcome"] == "rejected":
+            time.sleep(min(sample["retry_after"], args.max_backoff))
+
+
+def sign_fixtures(base_url, fixtures, fixture_dir, args):
+    """
+    Protect every fixture once before measuring and download the signed copies that
+    verify requests upload, so verification exercises a real match.
+    """
+    signed = {}
+    for key, path in fixtures.items():
+        status, _, body = http_request(f"{base_url}/api/protect", file_path=path, timeout=args.timeout)
+        if status != 200:
+            raise RuntimeError(f"Warm-up protect of {path} failed with HTTP {status}: {body[:200]!r}")
+        sample = {"polls": 0, "polls_404": 0}
+        job = wait_for_job(base_url, json.loads(body)["job_id"], args.poll_interval, args.timeout, sample)
+        if job is None or job["status"] != "done":
+            raise RuntimeError(f"Warm-up protect of {path} did not finish: {job}")
+        _, _, content = http_request(base_url + job["result"]["asset_url"], timeout=args.timeout)
+        # Protected media may come back in another container (perturbed images are PNG, videos MKV)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        signed_path = os.path.join(fixture_dir, "signed_" + stem + os.path.splitext(job["result"]["asset_url"])[1])
+        with open(signed_path, "wb") as f:
+            f.write(content)
+        signed[key] = signed_path
+    return signed
+
+
+# --- Local server ---
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers, log_path):
+    port = free_port()
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers))
+    log = open(log_path, "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--config", "gunicorn.conf.py", "--bind", f"127.0.0.1:{port}", "server:app"],
+        cwd=BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+
+    started = time.perf_counter()
+    while time.perf_counter() - started < 120:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited during startup, see {log_path}")
+        try:
+            status, _, _ = http_request(f"{base_url}/health", timeout=2)
+            if status == 200:
+                return process, base_url
+        except OSError:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError(f"Server did not become healthy, see {log_path}")
+
+
+# --- Report ---
+def summarize(values):
+    values = sorted(v for v in values if v is not None)
+    if not values:
+        return {"count": 0}
+    summary = {"count": len(values), "mean": round(sum(values) / len(values), 4), "max": round(values[-1], 4)}
+    for p in PERCENTILES:
+        # Linear interpolation between closest ranks
+        pos = (len(values) - 1) * p / 100
+        lo = int(pos)
+        hi = min(lo + 1, len(values) - 1)
+        summary[f"p{p}"] = round(values[lo] + (values[hi] - values[lo]) * (pos - lo), 4)
+    return summary
+
+
+def summarize_samples(samples, wall_s):
+    outcomes = {}
+    for s in samples:
+        outcomes[s["outcome"]] = outcomes.get(s["outcome"], 0) + 1
+    requests = len(samples)
+    completed = outcomes.get("done", 0)
+    # A job that finished but went missing while polled is still an error
+    clean = sum(1 for s in samples if s["outcome"] == "done" and not s["polls_404"])
+    errors = requests - clean - outcomes.get("rejected", 0)
+    polls = sum(s["polls"] for s in samples)
+    polls_404 = sum(s["polls_404"] for s in samples)
+    finished = [s for s in samples if s["outcome"] == "done"]
+
+    return {
+        "requests": requests,
+        "outcomes": outcomes,
+        "throughput_jobs_per_s": round(completed / wall_s, 4) if wall_s else 0,
+        "error_rate": round(errors / requests, 4) if requests else 0,
+        "rejection_rate": round(outcomes.get("rejected", 0) / requests, 4) if requests else 0,
+        "poll_404_rate": round(polls_404 / polls, 4) if polls else 0,
+        "polls": polls,
+        "latency_s": {
+            "submit": summarize([s["submit_s"] for s in samples]),
+            "end_to_end": summarize([s["e2e_s"] for s in finished]),
+            "queue_wait": summarize([s.get("queue_wait_s") for s in finished]),
+            "service": summarize([s.get("service_s") for s in finished]),
+            "upload_and_polling": summarize([s.get("overhead_s") for s in finished]),
+        },
+    }
+
+
+def build_report(samples, wall_s, config, health):
+    scenarios = {}
+    for s in samples:
+        scenarios.setdefault(f"{s['op']}/{s['media']}/{s['size']}", []).append(s)
+    return {
+        "config": config,
+        "server": health,
+        "wall_s": round(wall_s, 3),
+        "overall": summarize_samples(samples, wall_s),
+        "scenarios": {name: summarize_samples(group, wall_s) for name, group in sorted(scenarios.items())},
+    }
+
+
+def diff_reports(baseline, current, path=""):
+    """
+    Numeric leaves present in both reports, as {path: {"baseline", "current", "change_pct"}}.
+    """
+    diff = {}
+    for key, value in current.items():
+        if key == "config" or key not in baseline:
+            continue
+        name = f"{path}.{key}" if path else key
+        old = baseline[key]
+        if isinstance(value, dict) and isinstance(old, dict):
+            diff.update(diff_reports(old, value, name))
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)):
+            change = round(100 * (value - old) / old, 1) if old else None
+            diff[name] = {"baseline": old, "current": value, "change_pct": change}
+    return diff
+
+
+def print_summary(report):
+    overall = report["overall"]
+    e2e = overall["latency_s"]["end_to_end"]
+    wait = overall["latency_s"]["queue_wait"]
+    print(f"\n{overall['requests']} requests in {report['wall_s']}s: {overall['outcomes']}")
+    print(f"throughput {overall['throughput_jobs_per_s']} jobs/s, error rate {overall['error_rate']:.1%}, "
+          f"429 rate {overall['rejection_rate']:.1%}, poll 404 rate {overall['poll_404_rate']:.1%}")
+    if e2e["count"]:
+        print(f"end-to-end p50 {e2e['p50']}s p95 {e2e['p95']}s p99 {e2e['p99']}s | "
+              f"queue wait p50 {wait['p50']}s p95 {wait['p95']}s")
+    for name, scenario in report["scenarios"].items():
+        lat = scenario["latency_s"]["end_to_end"]
+        p95 = lat.get("p95", "-")
+        print(f"  {name:<24} n={scenario['requests']:<5} p95={p95}s errors={scenario['error_rate']:.1%}")
+
+
+# --- CLI ---
+def parse_weights(text):
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def parse_sizes(text):
+    return [int(v) for v in text.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test for the Hemlock HTTP API")
+    parser.add_argument("--url", help="Target server; a local one is started when omitted")
+    parser.add_argument("--workers", type=int, default=2, help="WEB_CONCURRENCY for the local server")
+    parser.add_argument("--clients", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to keep submitting")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests (0 = no limit)")
+    parser.add_argument("--mix", type=parse_weights, default="image=3,pdf=2,video=1",
+                        help="Media type weights")
+    parser.add_argument("--ops", type=parse_weights, default="protect=1,verify=1",
+                        help="Endpoint weights")
+    parser.add_argument("--image-sizes", type=parse_sizes, default="512,1024", help="Image side lengths (px)")
+    parser.add_argument("--pdf-sizes", type=parse_sizes, default="64,1024", help="PDF sizes (KB)")
+    parser.add_argument("--video-frames", type=parse_sizes, default="24", help="Video lengths (frames)")
+    parser.add_argument("--verify-mode", choices=("full", "quick"), default="full")
+    parser.add_argument("--poll-interval", type=float, default=0.25)
+    parser.add_argument("--timeout", type=float, default=600, help="Per-job timeout (s)")
+    parser.add_argument("--max-backoff", type=float, default=10, help="Cap on Retry-After sleeps (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fixture-dir", default=os.path.join(BASE_DIR, "loadtest_fixtures"))
+    parser.add_argument("--output", default="loadtest_report.json")
+    parser.add_argument("--baseline", help="Previous report to diff against")
+    args = parser.parse_args()
+
+    args.sizes = {"image": args.image_sizes, "pdf": args.pdf_sizes, "video": args.video_frames}
+    args.sizes = {media: sizes for media, sizes in args.sizes.items() if args.mix.get(media)}
+    args.mix = {media: weight for media, weight in args.mix.items() if media in args.sizes}
+
+    process = None
+    base_url = args.url
+    if base_url is None:
+        os.makedirs(args.fixture_dir, exist_ok=True)
+        process, base_url = start_server(args.workers, os.path.join(args.fixture_dir, "server.log"))
+        print(f"Started local server at {base_url} with {args.workers} worker(s)")
+
+    try:
+        fixtures = build_fixtures(args.sizes, args.fixture_dir, args.seed)
+        signed = sign_fixtures(base_url, fixtures, args.fixture_dir, args) if args.ops.get("verify") else {}
+        _, _, health = http_request(f"{base_url}/health")
+
+        results = []
+        lock = threading.Lock()
+        budget = [args.requests or float("inf")]
+        started = time.perf_counter()
+        deadline = started + args.duration
+        clients = [threading.Thread(target=client_loop, daemon=True,
+                                    args=(i, base_url, fixtures, signed, args, deadline, budget, results, lock))
+                   for i in range(args.clients)]
+        for client in clients:
+            client.start()
+        for client in clients:
+            client.join()
+        wall_s = time.perf_counter() - started
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    config = {key: value for key, value in vars(args).items() if key not in ("fixture_dir", "output", "baseline")}
+    config["url"] = base_url
+    report = build_report(results, wall_s, config, json.loads(health))
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["diff"] = diff_reports(json.load(f), report)
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print_summary(report)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
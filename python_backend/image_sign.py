@@ -1,92 +1,64 @@
-import sys
 import os
-import json
-import numpy as np
-import imageio.v3 as iio
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import ec
-from video_utils import content_hash
+import sys
+from video_utils import DEFAULT_ALG
+from image_stream import hash_image_blocks
+from provenance_record import KIND_IMAGE
+from provenance_store import store_record, load_private_key, PROVENANCE_DIR
+from perturb import perturb_image, perturbation_key, noise_seed, new_nonce, PERTURB_BITS, IMAGE_OUTPUT_EXT
 
 # Configuration
 GRID_ROWS = 8
 GRID_COLS = 8
 
-def sign_image(image_path: str):
-    # Ensure provenance directory exists
-    os.makedirs("provenance", exist_ok=True)
-    
-    # Check if private key exists
-    if not os.path.exists("keys/private_key.pem"):
-        raise FileNotFoundError("Error: keys/private_key.pem not found. Run from project root or generate keys.")
-    
-    with open("keys/private_key.pem", "rb") as f:
-        private_key = serialization.load_pem_private_key(f.read(), password=None, backend=None)
-
-    # Load Image
+def hash_image(image_path: str, alg: str = DEFAULT_ALG, checkpoint=None, perturb_key=None, output_path=None):
+    """
+    Compute step of signing: the record fields for this image, with no key writes. With a
+    `perturb_key`, the perturbed image is written to `output_path` and that is what gets hashed.
+    """
+    nonce = new_nonce() if perturb_key is not None else None
+    # Hash blocks strip by strip so huge images never need a full-size decode
     try:
-        image = iio.imread(image_path)
+        if perturb_key is None:
+            digests, _ = hash_image_blocks(image_path, GRID_ROWS, GRID_COLS, alg, checkpoint=checkpoint)
+        else:
+            digests = perturb_image(image_path, output_path, noise_seed(perturb_key, nonce),
+                                    GRID_ROWS, GRID_COLS, alg, checkpoint)
     except Exception as e:
         raise ValueError(f"Failed to load image: {e}")
+    fields = {"kind": KIND_IMAGE, "alg": alg, "digests": digests, "grid": (GRID_ROWS, GRID_COLS)}
+    if perturb_key is not None:
+        fields["perturbation"] = (nonce, PERTURB_BITS)
+    return fields
 
-    # Handle RGBA by converting to RGB (transparency creates hashing complexity)
-    if image.shape[-1] == 4:
-         image = image[..., :3]
-
-    h, w, _ = image.shape
-    
-    # Calculate Block Sizes
-    block_h = h // GRID_ROWS
-    block_w = w // GRID_COLS
-
-    block_hashes = []
-
-    # 8x8 Block Hashing
-    for r in range(GRID_ROWS):
-        for c in range(GRID_COLS):
-            # Define Region
-            y1 = r * block_h
-            y2 = (r + 1) * block_h if r < GRID_ROWS - 1 else h
-            x1 = c * block_w
-            x2 = (c + 1) * block_w if c < GRID_COLS - 1 else w
-            
-            # Extract Block
-            block = image[y1:y2, x1:x2]
-            
-            # Hash Block
-            block_bytes = block.astype(np.uint8).tobytes()
-            b_hash = content_hash(block_bytes)
-            block_hashes.append(b_hash.hex())
-
-    import uuid
-    prov_id = uuid.uuid4().hex[:8]
-    
-    # Save Hash Map
-    provenance_data = {
-        "id": prov_id,
-        "grid": [GRID_ROWS, GRID_COLS],
-        "hashes": block_hashes
-    }
-    
-    prov_filename = f"hashes_{prov_id}.json"
-    prov_path = os.path.join("provenance", prov_filename)
-    
-    with open(prov_path, "w") as f:
-        json.dump(provenance_data, f)
+def protected_path(image_path: str) -> str:
+    return os.path.splitext(image_path)[0] + "_protected" + IMAGE_OUTPUT_EXT
 
-    # Sign the Provenance Data
-    data_to_sign = json.dumps(provenance_data, sort_keys=True).encode()
-    signature = private_key.sign(data_to_sign, ec.ECDSA(hashes.SHA256()))
+def sign_image(image_path: str, alg: str = DEFAULT_ALG, checkpoint=None, private_key=None,
+               provenance_dir: str = PROVENANCE_DIR, perturb: bool = False, output_path=None):
+    """
+    Signs the image as is, or with `perturb` writes a PNG with keyed noise (to `output_path`,
+    by default next to the input) and signs that.
+    """
+    if private_key is None:
+        private_key = load_private_key()
 
-    sig_filename = f"sig_{prov_id}.bin"
-    sig_path = os.path.join("provenance", sig_filename)
+    perturb_key = None
+    if perturb:
+        perturb_key = perturbation_key(private_key)
+        output_path = output_path or protected_path(image_path)
 
-    with open(sig_path, "wb") as f:
-        f.write(signature)
+    # Binary record, signed over its exact bytes
+    fields = hash_image(image_path, alg, checkpoint, perturb_key, output_path)
+    prov_path = store_record(fields, private_key, provenance_dir)
+    if perturb:
+        print(f"Perturbed image written to {output_path}")
 
     print(f"Image signed with 8x8 Grid. Hashes saved to {prov_path}")
+    return prov_path
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python image_sign.py <image.png>")
+    args = [a for a in sys.argv[1:] if a != "--perturb"]
+    if len(args) != 1:
+        print("Usage: python image_sign.py <image.png> [--perturb]")
         sys.exit(1)
-    sign_image(sys.argv[1])
+    sign_image(args[0], perturb="--perturb" in sys.argv)
@@ -0,0 +1,138 @@
+import os
+import math
+import numpy as np
+import imageio.v3 as iio
+from video_utils import new_hasher, LEGACY_ALG
+
+try:
+    import pyvips
+except ImportError:  # Strip-wise decoding of huge PNG/TIFF images; without it they are decoded whole
+    pyvips = None
+
+# Rows decoded at a time when streaming
+STRIP_ROWS = 256
+
+# Lossless formats decode bit-exactly under libvips and imageio alike, so block hashes
+# agree whichever decoder produced them. JPEG decoders may differ, so JPEG is never streamed.
+STREAMABLE_EXTS = (".png", ".tif", ".tiff")
+
+# Longest side of the tamper-map preview collected while hashing
+PREVIEW_MAX_DIM = 4096
+
+
+def grid_edges(size: int, parts: int):
+    """
+    Block boundaries along one axis; the last block absorbs the remainder.
+    """
+    step = size // parts
+    return [i * step for i in range(parts)] + [size]
+
+
+def open_strips(image_path: str, strip_rows: int = STRIP_ROWS):
+    """
+    Returns (height, width, strips) where strips yields (y, rgb_strip) from top to bottom.
+    Large lossless images are decoded strip by strip (peak memory ~ strip_rows x width);
+    everything else is decoded whole and sliced, exactly as before.
+    """
+    ext = os.path.splitext(image_path)[1].lower()
+    if pyvips is not None and ext in STREAMABLE_EXTS:
+        image = pyvips.Image.new_from_file(image_path, access="sequential")
+        if image.format == "uchar" and image.bands in (3, 4):
+            return image.height, image.width, _vips_strips(image, strip_rows)
+
+    image = iio.imread(image_path)
+
+    # Handle RGBA by converting to RGB (transparency creates hashing complexity)
+    if image.shape[-1] == 4:
+        image = image[..., :3]
+
+    h, w, _ = image.shape
+    return h, w, ((y, image[y:y + strip_rows]) for y in range(0, h, strip_rows))
+
+
+def _vips_strips(image, strip_rows: int):
+    # Sequential access only allows top-to-bottom reads, which is the order crops are requested in
+    for y in range(0, image.height, strip_rows):
+        rows = min(strip_rows, image.height - y)
+        region = image.crop(0, y, image.width, rows)
+        strip = np.ndarray(buffer=region.write_to_memory(), dtype=np.uint8,
+                           shape=(rows, image.width, image.bands))
+        yield y, strip[..., :3]
+
+
+class BlockHasher:
+    """
+    Incrementally hashes an image's grid blocks from strips. Each block digest equals
+    content_hash(image[y1:y2, x1:x2].tobytes()), since a block's bytes are its rows in order.
+    """
+
+    def __init__(self, h: int, w: int, grid_rows: int, grid_cols: int, alg: str = LEGACY_ALG):
+        self.row_edges = grid_edges(h, grid_rows)
+        self.col_edges = grid_edges(w, grid_cols)
+        self.alg = alg
+        self.row = 0
+        self.hashers = None
+        self.digests = []
+
+    def _finish_row(self):
+        if self.hashers is None:
+            self._start_row()
+        self.digests.extend(hasher.digest() for hasher in self.hashers)
+        self.hashers = None
+        self.row += 1
+
+    def _start_row(self):
+        y1, y2 = self.row_edges[self.row], self.row_edges[self.row + 1]
+        self.hashers = []
+        for x1, x2 in zip(self.col_edges, self.col_edges[1:]):
+            self.hashers.append(new_hasher(self.alg, (y2 - y1) * (x2 - x1) * 3))
+
+    def update(self, y0: int, strip):
+        y, end = y0, y0 + strip.shape[0]
+        while y < end:
+            # Close rows that ended before this point (including empty ones on tiny images)
+            while self.row_edges[self.row + 1] <= y:
+                self._finish_row()
+            if self.hashers is None:
+                self._start_row()
+
+            stop = min(end, self.row_edges[self.row + 1])
+            part = strip[y - y0:stop - y0]
+            for c, hasher in enumerate(self.hashers):
+                block = part[:, self.col_edges[c]:self.col_edges[c + 1]]
+                hasher.update(block.astype(np.uint8, copy=False).tobytes())
+            y = stop
+
+    def finish(self):
+        while self.row < len(self.row_edges) - 1:
+            self._finish_row()
+        return self.digests
+
+
+def preview_step(h: int, w: int) -> int:
+    return max(1, math.ceil(max(h, w) / PREVIEW_MAX_DIM))
+
+
+def hash_image_blocks(image_path: str, grid_rows: int, grid_cols: int, alg: str = LEGACY_ALG,
+                      with_preview: bool = False, checkpoint=None):
+    """
+    Single streaming pass over the image. Returns (digests, preview) where preview (only
+    when requested) is {"image", "step", "shape"}: the image decimated by `step`, used to
+    draw tamper maps without keeping the full-resolution image around.
+    """
+    h, w, strips = open_strips(image_path)
+    hasher = BlockHasher(h, w, grid_rows, grid_cols, alg)
+    step = preview_step(h, w)
+    preview_parts = []
+
+    for y0, strip in strips:
+        if checkpoint is not None:
+            checkpoint()
+        hasher.update(y0, strip)
+        if with_preview:
+            preview_parts.append(strip[(-y0) % step::step, ::step].astype(np.uint8))
+
+    preview = None
+    if with_preview:
+        preview = {"image": np.concatenate(preview_parts), "step": step, "shape": (h, w)}
+    return hasher.finish(), preview
@@ -1,14 +1,70 @@
 import sys
 import os
 import json
+import math
 import numpy as np
 import imageio.v3 as iio
-from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.exceptions import InvalidSignature
-from video_utils import content_hash
+from video_utils import LEGACY_ALG
+from image_stream import hash_image_blocks, grid_edges
+from provenance_record import KIND_IMAGE
+from provenance_store import iter_records, verify_record, load_public_key, PROVENANCE_DIR
 
-def verify_image(image_path: str, public_key_path: str = "keys/public_key.pem"):
+def draw_tamper_map(preview, grid, mismatched_blocks):
+    """
+    Red overlay on the mismatched blocks, drawn on the (possibly decimated) preview so
+    memory stays bounded by the preview size rather than the original image.
+    """
+    grid_rows, grid_cols = grid
+    h, w = preview["shape"]
+    step = preview["step"]
+    # Block edges of the original image, mapped into preview pixels
+    row_edges = [math.ceil(y / step) for y in grid_edges(h, grid_rows)]
+    col_edges = [math.ceil(x / step) for x in grid_edges(w, grid_cols)]
+
+    tamper_map = preview["image"].copy()
+    for idx in mismatched_blocks:
+        r, c = divmod(idx, grid_cols)
+        y1, y2 = row_edges[r], row_edges[r + 1]
+        x1, x2 = col_edges[c], col_edges[c + 1]
+
+        # Draw Red
+        roi = tamper_map[y1:y2, x1:x2].astype(float)
+        red_overlay = np.zeros_like(roi)
+        red_overlay[:] = [255, 0, 0]
+        blended = roi * 0.6 + red_overlay * 0.4
+        tamper_map[y1:y2, x1:x2] = blended.astype(np.uint8)
+        # Borders
+        border = 2
+        tamper_map[y1:y1+border, x1:x2] = [255, 0, 0]
+        tamper_map[y2-border:y2, x1:x2] = [255, 0, 0]
+        tamper_map[y1:y2, x1:x1+border] = [255, 0, 0]
+        tamper_map[y1:y2, x2-border:x2] = [255, 0, 0]
+
+    return tamper_map
+
+def candidate_state(score, mismatches, grid, alg):
+    has_tamper = bool(mismatches)
+    return {
+        "score": score,
+        "status": "VERIFIED" if not has_tamper else "TAMPERED",
+        "failure_type": None if not has_tamper else "BLOCK_HASH_MISMATCH",
+        "mismatched_blocks": mismatches,
+        "grid": tuple(grid),
+        "signed_by": "ECDSA",
+        "hash_alg": alg
+    }
+
+def verify_image(image_path: str, public_key_path: str = "keys/public_key.pem", checkpoint=None,
+                 public_key=None, provenance_dir: str = PROVENANCE_DIR, evidence: bool = True,
+                 evidence_dir: str = None):
+    """
+    `public_key` skips loading the key file (bulk runs reuse one); with `evidence=False`
+    no tamper map is drawn or written. The map goes to `evidence_dir` (default: the
+    provenance directory); concurrent callers each pass their own.
+    """
     report = {
         "file": image_path,
         "status": "UNKNOWN",
@@ -19,22 +75,22 @@ def verify_image(image_path: str, public_key_path: str = "keys/public_key.pem"):
 
     # 1. Load Public Key
     try:
-        with open(public_key_path, "rb") as f:
-            public_key = serialization.load_pem_public_key(f.read())
+        if public_key is None:
+            public_key = load_public_key(public_key_path)
     except Exception as e:
         report["status"] = "ERROR"
         report["failure_type"] = f"Key Load Failed: {e}"
         return report
 
     # 2. Multi-Provenance Discovery
-    provenance_dir = "provenance"
-    candidates = []
     
     # Find all hash files
     try:
         if not os.path.exists(provenance_dir):
             os.makedirs(provenance_dir)
             
+        records = list(iter_records(KIND_IMAGE, provenance_dir))
+        # Legacy JSON records
         hash_files = [f for f in os.listdir(provenance_dir) if f.startswith("hashes_") and f.endswith(".json")]
         
         # Also include legacy/latest 'image_hashes.json' if it exists, for backward compatibility
@@ -46,28 +102,66 @@ def verify_image(image_path: str, public_key_path: str = "keys/public_key.pem"):
         report["failure_type"] = f"Provenance Scan Failed: {e}"
         return report
 
-    if not hash_files:
+    if not records and not hash_files:
         report["status"] = "FAILED"
         report["failure_type"] = "NO_PROVENANCE_FOUND"
         return report
 
-    # 3. Load Image to verify
-    try:
-        image = iio.imread(image_path)
-    except Exception:
-        report["status"] = "ERROR" 
-        return report
+    # 3. Block digests of the image, computed lazily per (grid, algorithm) with one
+    #    streaming decode each. The first pass also keeps a bounded-size preview for the tamper map.
+    digest_cache = {}
+    preview = None
+
+    def block_digests(grid_rows, grid_cols, alg):
+        nonlocal preview
+        key = (grid_rows, grid_cols, alg)
+        if key not in digest_cache:
+            digests, candidate_preview = hash_image_blocks(
+                image_path, grid_rows, grid_cols, alg, with_preview=evidence and preview is None,
+                checkpoint=checkpoint)
+            preview = preview or candidate_preview
+            digest_cache[key] = digests
+        return digest_cache[key]
 
-    if image.shape[-1] == 4:
-        image = image[..., :3]
-    
-    h, w, _ = image.shape
-    
     best_match_score = -1
     best_candidate_report = None
-    
-    # Iterate through all available provenance files to find the correct origin
+
+    # 3a. Binary records: score every candidate of a (grid, algorithm) in one numpy
+    #     comparison, then check signatures from the best score down until one is valid
+    groups = {}
+    for record in records:
+        grid_rows, grid_cols = record.grid
+        if len(record.digests) == grid_rows * grid_cols:
+            groups.setdefault((grid_rows, grid_cols, record.alg), []).append(record)
+
+    scored = []
+    for (grid_rows, grid_cols, alg), group in groups.items():
+        try:
+            digests = block_digests(grid_rows, grid_cols, alg)
+        except Exception:
+            report["status"] = "ERROR"
+            return report
+        current = np.frombuffer(b"".join(digests), dtype=np.uint8).reshape(len(digests), -1)
+        stored = np.stack([record.digests for record in group])
+        if stored.shape[1:] != current.shape:
+            continue
+        block_matches = (stored == current).all(axis=2)
+        for record, matches in zip(group, block_matches):
+            scored.append((matches.mean(), record, matches))
+
+    scored.sort(key=lambda item: item[0], reverse=True)
+    for score, record, matches in scored:
+        if verify_record(record, public_key, provenance_dir):
+            mismatches = np.flatnonzero(~matches).tolist()
+            best_match_score = score
+            best_candidate_report = candidate_state(score, mismatches, record.grid, record.alg)
+            break
+
+    # 3b. Legacy JSON records, signed over their canonical JSON
     for hash_file in hash_files:
+        if best_match_score == 1.0:
+            break
+
         candidate_uuid = hash_file.replace("hashes_", "").replace(".json", "")
         # Handle legacy filename
         if hash_file == "image_hashes.json":
@@ -97,73 +191,25 @@ def verify_image(image_path: str, public_key_path: str = "keys/public_key.pem"):
             # Signature Valid -> Calculate Match Score
             GRID_ROWS, GRID_COLS = prov_data["grid"]
             stored_hashes = prov_data["hashes"]
+            alg = prov_data.get("alg", LEGACY_ALG)
             
             # Basic dimension check
             if len(stored_hashes) != GRID_ROWS * GRID_COLS:
                 continue
 
-            block_h = h // GRID_ROWS
-            block_w = w // GRID_COLS
-            
-            match_count = 0
-            idx = 0
-            mismatches = []
-            
-            # Temporary tamper map for this candidate
-            temp_tamper_map = image.copy()
-            has_tamper = False
-
-            for r in range(GRID_ROWS):
-                for c in range(GRID_COLS):
-                    y1 = r * block_h
-                    y2 = (r + 1) * block_h if r < GRID_ROWS - 1 else h
-                    x1 = c * block_w
-                    x2 = (c + 1) * block_w if c < GRID_COLS - 1 else w
-                    
-                    block = image[y1:y2, x1:x2]
-                    block_bytes = block.astype(np.uint8).tobytes()
-                    curr_hash = content_hash(block_bytes).hex()
-                    
-                    if curr_hash == stored_hashes[idx]:
-                        match_count += 1
-                    else:
-                        has_tamper = True
-                        mismatches.append(idx)
-                        # Draw Red (on temp map)
-                        roi = temp_tamper_map[y1:y2, x1:x2].astype(float)
-                        red_overlay = np.zeros_like(roi)
-                        red_overlay[:] = [255, 0, 0]
-                        blended = roi * 0.6 + red_overlay * 0.4
-                        temp_tamper_map[y1:y2, x1:x2] = blended.astype(np.uint8)
-                        # Borders
-                        border = 2
-                        temp_tamper_map[y1:y1+border, x1:x2] = [255, 0, 0]
-                        temp_tamper_map[y2-border:y2, x1:x2] = [255, 0, 0]
-                        temp_tamper_map[y1:y2, x1:x1+border] = [255, 0, 0]
-                        temp_tamper_map[y1:y2, x2-border:x2] = [255, 0, 0]
-
-                    idx += 1
-            
-            score = match_count / (GRID_ROWS * GRID_COLS)
-            
-            # Save candidate info
-            candidate_state = {
-                "score": score,
-                "status": "VERIFIED" if not has_tamper else "TAMPERED",
-                "failure_type": None if not has_tamper else "BLOCK_HASH_MISMATCH",
-                "mismatched_blocks": mismatches,
-                "tamper_map_img": temp_tamper_map,
-                "signed_by": "ECDSA"
-            }
+            try:
+                current_hashes = [d.hex() for d in block_digests(GRID_ROWS, GRID_COLS, alg)]
+            except Exception:
+                report["status"] = "ERROR"
+                return report
+
+            mismatches = [idx for idx, stored in enumerate(stored_hashes) if current_hashes[idx] != stored]
+            score = (len(stored_hashes) - len(mismatches)) / (GRID_ROWS * GRID_COLS)
             
             # Pick best match
             if score > best_match_score:
                 best_match_score = score
-                best_candidate_report = candidate_state
-                
-                # Optimization: If perfect match, stop looking
-                if score == 1.0:
-                    break
+                best_candidate_report = candidate_state(score, mismatches, (GRID_ROWS, GRID_COLS), alg)
         
         except InvalidSignature:
             continue # Try next file
@@ -176,12 +222,19 @@ def verify_image(image_path: str, public_key_path: str = "keys/public_key.pem"):
         report["failure_type"] = best_candidate_report["failure_type"]
         report["mismatched_blocks"] = best_candidate_report["mismatched_blocks"]
         report["signed_by"] = best_candidate_report["signed_by"]
+        report["hash_alg"] = best_candidate_report["hash_alg"]
         
-        if best_candidate_report["status"] == "TAMPERED":
-            map_path = "provenance/tamper_map.png"
-            iio.imwrite(map_path, best_candidate_report["tamper_map_img"])
+        if best_candidate_report["status"] == "TAMPERED" and evidence:
+            evidence_dir = evidence_dir or provenance_dir
+            os.makedirs(evidence_dir, exist_ok=True)
+            map_path = os.path.join(evidence_dir, "tamper_map.png")
+            tamper_map = draw_tamper_map(preview, best_candidate_report["grid"],
+                                         best_candidate_report["mismatched_blocks"])
+            iio.imwrite(map_path, tamper_map)
             report["tamper_map"] = map_path
             print(f"Tamper detected (Best Match: {best_match_score:.1%}). Map saved to {map_path}")
+        elif best_candidate_report["status"] == "TAMPERED":
+            print(f"Tamper detected (Best Match: {best_match_score:.1%})")
         else:
             print(f"Image verified successfully (Match: {best_match_score:.1%})")
             
@@ -1,58 +1,115 @@
 import sys
-import os
-import json
-import hashlib
-import uuid
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import ec
-
-def sign_pdf(pdf_path: str):
-    # Ensure provenance directory exists
-    os.makedirs("provenance", exist_ok=True)
-    
-    # Check if private key exists
-    if not os.path.exists("keys/private_key.pem"):
-        raise FileNotFoundError("Error: keys/private_key.pem not found. Run from project root or generate keys.")
-    
-    with open("keys/private_key.pem", "rb") as f:
-        private_key = serialization.load_pem_private_key(f.read(), password=None, backend=None)
-
-    # Load PDF Content
+import re
+from video_utils import new_hasher, DEFAULT_ALG
+from provenance_record import KIND_PDF
+from provenance_store import store_record, load_private_key, PROVENANCE_DIR
+
+# Every revision (the original file and each incremental update appended to it)
+# ends with %%EOF, optionally followed by a line ending.
+EOF_MARKER = re.compile(rb"%%EOF[ \t]*(?:\r\n|\r|\n)?")
+
+# Read size when hashing byte ranges from disk
+READ_CHUNK = 1024 * 1024
+
+def revision_boundaries(content, start: int = 0):
+    """
+    End offsets of each revision in content[start:]. Bytes after the last %%EOF form a final range.
+    """
+    ends = [m.end() for m in EOF_MARKER.finditer(content, start)]
+    if not ends or ends[-1] != len(content):
+        if len(content) > start:
+            ends.append(len(content))
+    return ends
+
+def hash_range(f, start: int, end: int, alg: str, checkpoint=None) -> bytes:
+    h = new_hasher(alg, end - start)
+    f.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        if checkpoint is not None:
+            checkpoint()
+        chunk = f.read(min(READ_CHUNK, remaining))
+        if not chunk:
+            break
+        h.update(chunk)
+        remaining -= len(chunk)
+    return h.digest()
+
+def scan_range(f, start: int, end: int, alg: str, checkpoint=None):
+    """
+    One streaming pass over f[start:end] returning (digest, revision ends): the digest of
+    hash_range and the boundaries of revision_boundaries, as absolute file offsets.
+    """
+    h = new_hasher(alg, end - start)
+    ends = []
+    carry = b""
+    offset = start  # File offset of carry[0]
+    f.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        if checkpoint is not None:
+            checkpoint()
+        chunk = f.read(min(READ_CHUNK, remaining))
+        if not chunk:
+            break
+        h.update(chunk)
+        remaining -= len(chunk)
+
+        # Markers may straddle reads: keep the last few bytes, or an unfinished match, for the next one
+        window = carry + chunk
+        keep = max(0, len(window) - (len(b"%%EOF") - 1))
+        for m in EOF_MARKER.finditer(window):
+            if m.end() == len(window):
+                # Trailing whitespace or the line ending may continue in the next read
+                keep = m.start()
+                break
+            ends.append(offset + m.end())
+        offset += keep
+        carry = window[keep:]
+
+    ends.extend(offset + m.end() for m in EOF_MARKER.finditer(carry))
+    scanned_end = offset + len(carry)
+    if (not ends or ends[-1] != scanned_end) and scanned_end > start:
+        ends.append(scanned_end)
+    return h.digest(), ends
+
+def hash_pdf(pdf_path: str, alg: str = DEFAULT_ALG, checkpoint=None):
+    """
+    Compute step of signing: the record fields for this PDF, with no key or disk writes.
+    """
+    # Hash each revision's byte range, so an incremental update appended later
+    # leaves the signed ranges intact and verification only hashes the new bytes
     try:
         with open(pdf_path, "rb") as f:
             content = f.read()
     except Exception as e:
         raise ValueError(f"Failed to load PDF: {e}")
 
-    # Calculate Hash
-    file_hash = hashlib.sha256(content).hexdigest()
-
-    prov_id = uuid.uuid4().hex[:8]
-    
-    # Save Hash Map
-    provenance_data = {
-        "id": prov_id,
-        "type": "pdf",
-        "hash": file_hash
-    }
-    
-    prov_filename = f"hashes_{prov_id}.json"
-    prov_path = os.path.join("provenance", prov_filename)
-    
-    with open(prov_path, "w") as f:
-        json.dump(provenance_data, f)
-
-    # Sign the Provenance Data
-    data_to_sign = json.dumps(provenance_data, sort_keys=True).encode()
-    signature = private_key.sign(data_to_sign, ec.ECDSA(hashes.SHA256()))
-
-    sig_filename = f"sig_{prov_id}.bin"
-    sig_path = os.path.join("provenance", sig_filename)
-
-    with open(sig_path, "wb") as f:
-        f.write(signature)
-
-    print(f"PDF signed. Provenance saved to {prov_path}")
+    ends = revision_boundaries(content)
+    revisions = []
+    start = 0
+    view = memoryview(content)
+    for end in ends:
+        if checkpoint is not None:
+            checkpoint()
+        h = new_hasher(alg, end - start)
+        h.update(view[start:end])
+        revisions.append(h.digest())
+        start = end
+
+    # Revision end offsets + digests
+    return {"kind": KIND_PDF, "alg": alg, "digests": revisions, "size": len(content), "offsets": ends}
+
+def sign_pdf(pdf_path: str, alg: str = DEFAULT_ALG, checkpoint=None, private_key=None,
+             provenance_dir: str = PROVENANCE_DIR):
+    if private_key is None:
+        private_key = load_private_key()
+
+    fields = hash_pdf(pdf_path, alg, checkpoint)
+    prov_path = store_record(fields, private_key, provenance_dir)
+
+    print(f"PDF signed ({len(fields['digests'])} revision(s)). Provenance saved to {prov_path}")
+    return prov_path
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
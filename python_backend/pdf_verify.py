@@ -1,12 +1,93 @@
 import sys
 import os
 import json
-import hashlib
-from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.exceptions import InvalidSignature
+from video_utils import LEGACY_ALG
+from pdf_sign import hash_range, scan_range
+from provenance_record import KIND_PDF
+from provenance_store import iter_records, verify_record, load_public_key, PROVENANCE_DIR
 
-def verify_pdf(pdf_path: str, public_key_path: str = "keys/public_key.pem"):
+def count_intact_revisions(revisions, file_size: int, alg: str, range_digest) -> int:
+    """
+    Number of leading signed revisions whose byte ranges still hash the same. Stops at the
+    first divergence, so later ranges of a modified document are never read.
+    """
+    start = 0
+    intact = 0
+    for rev in revisions:
+        if rev["end"] > file_size or range_digest(start, rev["end"], alg) != rev["hash"]:
+            break
+        intact += 1
+        start = rev["end"]
+    return intact
+
+def report_partial_match(report, candidate, pdf_file, file_size: int, checkpoint=None):
+    revisions = candidate["revisions"]
+    intact = candidate["intact"]
+    report["signed_by"] = "ECDSA"
+    report["hash_alg"] = candidate["alg"]
+    report["signed_revisions"] = len(revisions)
+    report["intact_revisions"] = intact
+
+    if intact == len(revisions):
+        # Every signed revision is untouched; the rest was appended as incremental updates.
+        # Only the appended bytes are read, in one streaming pass that hashes and splits them.
+        signed_size = revisions[-1]["end"] if revisions else 0
+        appended_hash, appended_ends = scan_range(pdf_file, signed_size, file_size, candidate["alg"], checkpoint)
+        report["status"] = "UPDATED"
+        report["failure_type"] = "INCREMENTAL_UPDATE_APPENDED"
+        report["appended_bytes"] = file_size - signed_size
+        report["appended_revisions"] = len(appended_ends)
+        report["appended_hash"] = appended_hash.hex()
+    else:
+        # Revision `intact` (0-based) no longer matches what was signed
+        report["status"] = "TAMPERED"
+        report["failure_type"] = "REVISION_MISMATCH"
+        report["diverged_revision"] = intact
+        report["intact_bytes"] = revisions[intact - 1]["end"] if intact else 0
+
+def iter_candidates(provenance_dir: str, records, hash_files, public_key):
+    """
+    Yields (provenance, signature_valid) for every PDF record: binary records first, then
+    legacy JSON ones. Signatures are only checked once a record's hashes match.
+    """
+    for record in records:
+        yield record.to_json(), lambda record=record: verify_record(record, public_key, provenance_dir)
+
+    for hash_file in hash_files:
+        candidate_uuid = hash_file.replace("hashes_", "").replace(".json", "")
+        json_path = os.path.join(provenance_dir, hash_file)
+        sig_path = os.path.join(provenance_dir, f"sig_{candidate_uuid}.bin")
+
+        if not os.path.exists(sig_path):
+            continue
+
+        try:
+            with open(json_path, "r") as f:
+                prov_data = json.load(f)
+        except Exception:
+            continue
+
+        # Skip if not a PDF record
+        if prov_data.get("type") != "pdf":
+            continue
+
+        def signature_valid(prov_data=prov_data, sig_path=sig_path):
+            with open(sig_path, "rb") as f:
+                signature = f.read()
+            data_to_verify = json.dumps(prov_data, sort_keys=True).encode()
+            try:
+                public_key.verify(signature, data_to_verify, ec.ECDSA(hashes.SHA256()))
+                return True
+            except InvalidSignature:
+                return False
+
+        yield prov_data, signature_valid
+
+def verify_pdf(pdf_path: str, public_key_path: str = "keys/public_key.pem", checkpoint=None,
+               public_key=None, provenance_dir: str = PROVENANCE_DIR, evidence: bool = True):
     report = {
         "file": pdf_path,
         "status": "UNKNOWN",
@@ -15,20 +96,21 @@ def verify_pdf(pdf_path: str, public_key_path: str = "keys/public_key.pem"):
 
     # 1. Load Public Key
     try:
-        with open(public_key_path, "rb") as f:
-            public_key = serialization.load_pem_public_key(f.read())
+        if public_key is None:
+            public_key = load_public_key(public_key_path)
     except Exception as e:
         report["status"] = "ERROR"
         report["failure_type"] = f"Key Load Failed: {e}"
         return report
 
     # 2. Multi-Provenance Discovery
-    provenance_dir = "provenance"
     
     try:
         if not os.path.exists(provenance_dir):
             os.makedirs(provenance_dir)
-            
+
+        records = list(iter_records(KIND_PDF, provenance_dir))
+        # Legacy JSON records
         hash_files = [f for f in os.listdir(provenance_dir) if f.startswith("hashes_") and f.endswith(".json")]
             
     except Exception as e:
@@ -36,65 +118,73 @@ def verify_pdf(pdf_path: str, public_key_path: str = "keys/public_key.pem"):
         report["failure_type"] = f"Provenance Scan Failed: {e}"
         return report
 
-    if not hash_files:
+    if not records and not hash_files:
         report["status"] = "FAILED"
         report["failure_type"] = "NO_PROVENANCE_FOUND"
         return report
 
-    # 3. Hash PDF
+    # 3. Open PDF. Byte ranges are hashed on demand and cached across candidates, so the
+    #    signed prefix is read at most once per algorithm and appended revisions cost only their own bytes.
     try:
-        with open(pdf_path, "rb") as f:
-            content = f.read()
-            target_hash = hashlib.sha256(content).hexdigest()
+        pdf_file = open(pdf_path, "rb")
+        file_size = os.fstat(pdf_file.fileno()).st_size
     except Exception as e:
         report["status"] = "ERROR"
         report["failure_type"] = f"File Read Failed: {e}"
         return report
-    
+
+    range_cache = {}
+
+    def range_digest(start, end, alg):
+        key = (start, end, alg)
+        if key not in range_cache:
+            range_cache[key] = hash_range(pdf_file, start, end, alg, checkpoint).hex()
+        return range_cache[key]
+
     # 4. Find Match
     match_found = False
+    best_candidate = None
     
-    for hash_file in hash_files:
-        candidate_uuid = hash_file.replace("hashes_", "").replace(".json", "")
-        sig_file = f"sig_{candidate_uuid}.bin"
-            
-        json_path = os.path.join(provenance_dir, hash_file)
-        sig_path = os.path.join(provenance_dir, sig_file)
-        
-        if not os.path.exists(sig_path):
-            continue
-
-        try:
-            # Load Data
-            with open(json_path, "r") as f:
-                prov_json_str = f.read()
-                prov_data = json.loads(prov_json_str)
+    with pdf_file:
+        for prov_data, signature_valid in iter_candidates(provenance_dir, records, hash_files, public_key):
+            try:
+                # Check Hash Match First (Efficiency)
+                alg = prov_data.get("alg", LEGACY_ALG)
+                if "revisions" in prov_data:
+                    revisions = prov_data["revisions"]
+                    intact = count_intact_revisions(revisions, file_size, alg, range_digest)
+                    if intact == 0 and revisions:
+                        continue
+                    exact = intact == len(revisions) and prov_data.get("size") == file_size
+                else:
+                    # Legacy records hold a single whole-file hash
+                    if prov_data.get("hash") != range_digest(0, file_size, alg):
+                        continue
+                    revisions, intact, exact = [], 0, True
 
-            # Skip if not a PDF record (optional check, but good for safety)
-            if prov_data.get("type") != "pdf":
-                continue
+                # Verify Signature
+                if not signature_valid():
+                    continue
+                
+                if exact:
+                    # If we get here, it's a valid match
+                    match_found = True
+                    report["status"] = "VERIFIED"
+                    report["signed_by"] = "ECDSA"
+                    report["hash_alg"] = alg
+                    report["signed_revisions"] = len(revisions)
+                    break
 
-            # Check Hash Match First (Efficiency)
-            if prov_data.get("hash") != target_hash:
+                # Partial match: keep the record sharing the longest intact prefix
+                if best_candidate is None or intact > best_candidate["intact"]:
+                    best_candidate = {"prov": prov_data, "alg": alg, "revisions": revisions, "intact": intact}
+            
+            except Exception:
                 continue
 
-            # Verify Signature
-            with open(sig_path, "rb") as f:
-                signature = f.read()
-                
-            data_to_verify = json.dumps(prov_data, sort_keys=True).encode()
-            public_key.verify(signature, data_to_verify, ec.ECDSA(hashes.SHA256()))
-            
-            # If we get here, it's a valid match
+        if not match_found and best_candidate is not None:
+            report_partial_match(report, best_candidate, pdf_file, file_size, checkpoint)
             match_found = True
-            report["status"] = "VERIFIED"
-            report["signed_by"] = "ECDSA"
-            break
-        
-        except InvalidSignature:
-            continue
-        except Exception:
-            continue
 
     if not match_found:
         report["status"] = "TAMPERED" 
@@ -0,0 +1,196 @@
+import os
+import zlib
+import hmac
+import struct
+import hashlib
+import secrets
+import subprocess
+import numpy as np
+import imageio.v3 as iio
+import imageio_ffmpeg
+from cryptography.hazmat.primitives import serialization
+from video_utils import content_hash, DEFAULT_ALG
+from image_stream import open_strips, BlockHasher, STRIP_ROWS
+
+# Protect-time perturbation: the low PERTURB_BITS of every channel are XORed with keyed
+# noise before hashing, so the signed pixels are the perturbed ones. This is a keyed
+# watermark, not an adversarial perturbation: it is not optimised against any model and
+# does not stop ML training on the media.
+#
+# Noise is derived from (seed, stream, index), where index is the strip band of an image or
+# the frame number of a video. The seed is HMAC(perturbation key, nonce): the record stores
+# only the random nonce, and the perturbation key is derived from the signing key, so only
+# the signing node can reproduce the noise (or XOR it out again to recover the original).
+PERTURB_BITS = 2
+STREAM_IMAGE = 1
+STREAM_VIDEO = 2
+PERTURB_KEY_LABEL = b"hemlock-perturbation-key"
+
+# Frames perturbed per batch; buffers are reused from batch to batch
+FRAME_BATCH = 8
+
+# Perturbed output must decode to exactly the signed pixels, so it is always lossless
+IMAGE_OUTPUT_EXT = ".png"
+VIDEO_OUTPUT_EXT = ".mkv"
+# Browsers can't play lossless RGB H.264 in .mkv, so perturbed videos also get an ordinary
+# H.264 .mp4 for viewing; it is lossy and does not verify, the .mkv is the signed copy
+PREVIEW_EXT = ".mp4"
+PREVIEW_PARAMS = ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-preset", "veryfast", "-crf", "23",
+                  "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", "-movflags", "+faststart", "-an"]
+# Noisy low bits barely compress, so trade ratio for speed
+PNG_COMPRESSION = 1
+# Lossless H.264 in RGB round-trips rgb24 frames bit-exactly and encodes ~2x faster than FFV1
+VIDEO_CODEC = "libx264rgb"
+VIDEO_PIX_FMT = "rgb24"
+VIDEO_PARAMS = ["-preset", "ultrafast", "-qp", "0", "-threads", "0"]
+
+
+def new_nonce() -> int:
+    return secrets.randbits(63)
+
+
+def perturbation_key(private_key) -> bytes:
+    """
+    Secret for deriving noise seeds, derived from the signing key so it needs no storage of its own.
+    """
+    secret = private_key.private_bytes(serialization.Encoding.DER, serialization.PrivateFormat.PKCS8,
+                                       serialization.NoEncryption())
+    return hmac.new(secret, PERTURB_KEY_LABEL, hashlib.sha256).digest()
+
+
+def noise_seed(key: bytes, nonce: int) -> int:
+    """
+    The noise seed of one perturbed file, from the nonce stored in its record.
+    """
+    return int.from_bytes(hmac.new(key, nonce.to_bytes(8, "little"), hashlib.sha256).digest(), "little")
+
+
+def noise(seed: int, stream: int, index: int, shape, bits: int = PERTURB_BITS, out=None):
+    """
+    Deterministic noise in the low `bits` of each byte, filled into `out` if given.
+    """
+    size = int(np.prod(shape))
+    rng = np.random.SFC64(np.random.SeedSequence([seed, stream, index]))
+    raw = rng.random_raw((size + 7) // 8).astype("<u8", copy=False).view(np.uint8)[:size]
+    if out is None:
+        out = np.empty(shape, dtype=np.uint8)
+    np.bitwise_and(raw.reshape(shape), (1 << bits) - 1, out=out)
+    return out
+
+
+class PNGStreamWriter:
+    """
+    Writes an 8-bit RGB PNG row band by row band, so a large image is never held whole.
+    """
+
+    def __init__(self, path: str, width: int, height: int, level: int = PNG_COMPRESSION):
+        self.width = width
+        self.f = open(path, "wb")
+        self.compressor = zlib.compressobj(level)
+        self.f.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+    def _chunk(self, kind: bytes, data: bytes):
+        self.f.write(struct.pack(">I", len(data)) + kind + data)
+        self.f.write(struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    def write(self, rows):
+        # Every scanline starts with its filter type byte (0: none)
+        lines = np.zeros((rows.shape[0], 1 + self.width * 3), dtype=np.uint8)
+        lines[:, 1:] = rows.reshape(rows.shape[0], -1)
+        data = self.compressor.compress(lines.tobytes())
+        if data:
+            self._chunk(b"IDAT", data)
+
+    def close(self):
+        self._chunk(b"IDAT", self.compressor.flush())
+        self._chunk(b"IEND", b"")
+        self.f.close()
+
+
+def perturb_image(image_path: str, output_path: str, seed: int, grid_rows: int, grid_cols: int,
+                  alg: str = DEFAULT_ALG, checkpoint=None):
+    """
+    One streaming pass: each decoded strip is perturbed, fed to the block hasher and
+    appended to the PNG at `output_path`. Returns the block digests of the output.
+    """
+    h, w, strips = open_strips(image_path)
+    hasher = BlockHasher(h, w, grid_rows, grid_cols, alg)
+    writer = PNGStreamWriter(output_path, w, h)
+    try:
+        for y0, strip in strips:
+            if checkpoint is not None:
+                checkpoint()
+            # Strips always start on multiples of STRIP_ROWS, so a band index names the same rows every time
+            perturbed = np.bitwise_xor(strip, noise(seed, STREAM_IMAGE, y0 // STRIP_ROWS, strip.shape))
+            hasher.update(y0, perturbed)
+            writer.write(perturbed)
+    except BaseException:
+        writer.close()
+        os.remove(output_path)
+        raise
+    writer.close()
+    return hasher.finish()
+
+
+def perturb_video(video_path: str, output_path: str, seed: int, alg: str = DEFAULT_ALG, checkpoint=None):
+    """
+    Streams frames in batches of FRAME_BATCH: each batch is perturbed with one vectorized
+    XOR, then every frame is hashed and piped to a lossless encoder writing `output_path`
+    (ffmpeg encodes in its own process, overlapping with the next batch).
+    Returns the per-frame digests of the output.
+    """
+    fps = iio.immeta(video_path).get("fps") or 30
+    frame_hashes = []
+    writer = None
+    batch = noise_buf = None
+    count = 0
+
+    def flush(n):
+        np.bitwise_xor(batch[:n], noise_buf[:n], out=batch[:n])
+        for frame in batch[:n]:
+            frame_hashes.append(content_hash(frame.tobytes(), alg))
+            writer.send(frame)
+
+    try:
+        for index, frame in enumerate(iio.imiter(video_path)):
+            if checkpoint is not None:
+                checkpoint()
+            frame = frame[..., :3].astype(np.uint8, copy=False)
+            if writer is None:
+                h, w, _ = frame.shape
+                batch = np.empty((FRAME_BATCH, h, w, 3), dtype=np.uint8)
+                noise_buf = np.empty_like(batch)
+                writer = imageio_ffmpeg.write_frames(output_path, (w, h), fps=fps, codec=VIDEO_CODEC,
+                                                     pix_fmt_out=VIDEO_PIX_FMT, macro_block_size=1,
+                                                     output_params=VIDEO_PARAMS)
+                writer.send(None)
+
+            batch[count] = frame
+            noise(seed, STREAM_VIDEO, index, frame.shape, out=noise_buf[count])
+            count += 1
+            if count == FRAME_BATCH:
+                flush(count)
+                count = 0
+        if count:
+            flush(count)
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        raise
+
+    if writer is None:
+        raise ValueError("Video has no frames")
+    writer.close()
+    return frame_hashes
+
+
+def write_preview(video_path: str, preview_path: str):
+    """
+    Browser-playable copy of a perturbed video (see PREVIEW_EXT).
+    """
+    subprocess.run([imageio_ffmpeg.get_ffmpeg_exe(), "-y", "-loglevel", "error", "-i", video_path,
+                    *PREVIEW_PARAMS, preview_path], check=True)
+    return preview_path
@@ -0,0 +1,153 @@
+import sys
+import json
+import struct
+import numpy as np
+
+# Binary provenance record, signed over its exact bytes (no re-serialization on verify).
+#
+# Header (little-endian, 48 bytes; version 1 records end after `id`, at 32 bytes):
+#   magic    4s  b"HMPR"
+#   version  B   format version
+#   kind     B   KIND_IMAGE / KIND_PDF / KIND_VIDEO
+#   alg      B   hash algorithm code (ALG_CODES)
+#   dsize    B   digest size in bytes
+#   rows     H   image grid rows (0 for other kinds)
+#   cols     H   image grid cols (0 for other kinds)
+#   count    I   number of digests
+#   size     Q   source size in bytes (PDF; 0 otherwise)
+#   id       8s  record id (ascii)
+#   nonce    Q   perturbation nonce; the noise seed derives from it and a server secret (see perturb.py)
+#   pbits    B   perturbed low bits per channel (0: media was not perturbed)
+#   pad      7x
+# Body:
+#   offsets  count x u64   range end offsets (PDF only)
+#   digests  count x dsize raw digests (image blocks row-major, PDF revisions, video frames)
+MAGIC = b"HMPR"
+VERSION = 2
+HEADER_V1 = struct.Struct("<4sBBBBHHIQ8s")
+HEADER = struct.Struct("<4sBBBBHHIQ8sQB7x")
+HEADER_SIZE = HEADER.size
+
+KIND_IMAGE = 1
+KIND_PDF = 2
+KIND_VIDEO = 3
+KIND_NAMES = {KIND_IMAGE: "image", KIND_PDF: "pdf", KIND_VIDEO: "video"}
+
+ALG_CODES = {"sha256": 1, "blake2b": 2, "blake3": 3}
+ALG_NAMES = {code: name for name, code in ALG_CODES.items()}
+
+RECORD_EXT = ".hpr"
+
+
+class ProvenanceRecord:
+    """
+    A parsed record. `digests` is a (count, dsize) uint8 array and `offsets` a uint64
+    array, both views into the original buffer, so parsing copies nothing and many
+    records can be compared in bulk with numpy.
+    """
+
+    def __init__(self, kind, alg, digests, record_id, grid=(0, 0), size=0, offsets=None, raw=None,
+                 perturbation=None):
+        self.kind = kind
+        self.alg = alg
+        self.digests = digests
+        self.id = record_id
+        self.grid = grid
+        self.size = size
+        self.offsets = offsets
+        self.raw = raw
+        self.perturbation = perturbation  # (nonce, bits) or None
+        # Set when the record comes from a snapshot, which carries signatures inline
+        self.signature = None
+
+    @classmethod
+    def build(cls, kind, alg, digests, record_id, grid=(0, 0), size=0, offsets=None, perturbation=None):
+        """
+        Create a record from a list of digest bytes and serialize it.
+        """
+        digest_size = len(digests[0]) if digests else 32
+        body = b""
+        if kind == KIND_PDF:
+            body += np.asarray(offsets, dtype="<u8").tobytes()
+        body += b"".join(digests)
+        nonce, bits = perturbation or (0, 0)
+        header = HEADER.pack(MAGIC, VERSION, kind, ALG_CODES[alg], digest_size, grid[0], grid[1],
+                             len(digests), size, record_id.encode("ascii"), nonce, bits)
+        return cls.from_bytes(header + body)
+
+    @classmethod
+    def from_bytes(cls, buf):
+        view = memoryview(buf)
+        if len(view) < HEADER_V1.size or bytes(view[:4]) != MAGIC:
+            raise ValueError("Malformed provenance record: bad magic")
+        version = view[4]
+        if version not in (1, VERSION):
+            raise ValueError(f"Unsupported provenance record version: {version}")
+        header = HEADER if version == VERSION else HEADER_V1
+        if len(view) < header.size:
+            raise ValueError("Malformed provenance record: truncated header")
+
+        nonce, bits = 0, 0
+        if version == VERSION:
+            _, _, kind, alg_code, digest_size, rows, cols, count, size, record_id, nonce, bits = header.unpack_from(view, 0)
+        else:
+            _, _, kind, alg_code, digest_size, rows, cols, count, size, record_id = header.unpack_from(view, 0)
+        if kind not in KIND_NAMES or alg_code not in ALG_NAMES:
+            raise ValueError("Malformed provenance record: unknown kind or algorithm")
+
+        offset = header.size
+        offsets = None
+        if kind == KIND_PDF:
+            offsets = np.frombuffer(view, dtype="<u8", count=count, offset=offset)
+            offset += 8 * count
+
+        if len(view) != offset + count * digest_size:
+            raise ValueError("Malformed provenance record: length does not match header")
+        digests = np.frombuffer(view, dtype=np.uint8, count=count * digest_size, offset=offset)
+
+        return cls(kind, ALG_NAMES[alg_code], digests.reshape(count, digest_size),
+                   record_id.decode("ascii"), (rows, cols), size, offsets, view,
+                   (nonce, bits) if bits else None)
+
+    def to_bytes(self) -> bytes:
+        return bytes(self.raw)
+
+    def digest(self, index: int) -> bytes:
+        return self.digests[index].tobytes()
+
+    def to_json(self):
+        """
+        Debug export only; signatures cover the binary bytes, never this JSON.
+        """
+        data = {
+            "id": self.id,
+            "type": KIND_NAMES[self.kind],
+            "alg": self.alg,
+            "hashes": [d.tobytes().hex() for d in self.digests],
+        }
+        if self.kind == KIND_IMAGE:
+            data["grid"] = list(self.grid)
+        if self.perturbation:
+            data["perturbation"] = {"nonce": self.perturbation[0], "bits": self.perturbation[1]}
+        if self.kind == KIND_PDF:
+            data["size"] = self.size
+            data["revisions"] = [{"end": int(end), "hash": h}
+                                 for end, h in zip(self.offsets, data.pop("hashes"))]
+        return data
+
+
+def peek_kind(header: bytes):
+    """
+    Record kind from the start of a record (any version), or None if it isn't a record header.
+    """
+    if len(header) < 6 or header[:4] != MAGIC:
+        return None
+    return header[5]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python provenance_record.py <record.hpr>")
+        sys.exit(1)
+    with open(sys.argv[1], "rb") as f:
+        print(json.dumps(ProvenanceRecord.from_bytes(f.read()).to_json(), indent=2))
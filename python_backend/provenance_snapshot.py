@@ -0,0 +1,342 @@
+import os
+import sys
+import json
+import mmap
+import time
+import struct
+import hashlib
+import argparse
+import threading
+import numpy as np
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.exceptions import InvalidSignature
+from provenance_record import ProvenanceRecord, KIND_NAMES
+from provenance_store import (iter_local_records, signature_path, load_private_key, load_public_key,
+                              PROVENANCE_DIR, PRIVATE_KEY_PATH, PUBLIC_KEY_PATH)
+
+# Read-only snapshot of the provenance store, for verify-only nodes.
+#
+# A snapshot directory holds immutable snapshot files plus manifest.json, which lists the
+# files in order (one base, then deltas holding only records exported since) and is signed
+# by the signing node. Records keep their own signatures, so the manifest only has to vouch
+# for *which* records exist: it pins the SHA-256 of every file's header and index.
+#
+# Snapshot file (.hps), little-endian, every section 8-byte aligned:
+#   header   SNAP_HEADER: magic b"HMPS", version, record count, index offset
+#   data     per record: record bytes, then its detached signature
+#   index    count x INDEX_DTYPE, sorted by key = kind byte + first digest
+#
+# Files are memory-mapped and records are parsed as views into the mapping, so opening a
+# snapshot reads only its index and every worker process shares the pages.
+SNAP_MAGIC = b"HMPS"
+SNAP_VERSION = 1
+SNAP_HEADER = struct.Struct("<4sB3xIQ")
+SNAP_EXT = ".hps"
+MANIFEST_NAME = "manifest.json"
+INDEX_DTYPE = np.dtype([
+    ("key", "S33"),
+    ("id", "S8"),
+    ("offset", "<u8"),
+    ("length", "<u4"),
+    ("sig_length", "<u4"),
+    ("pad", "V7"),  # 64-byte entries
+])
+# Most deltas on top of the base; the export after that compacts everything into a new base
+MAX_DELTAS = 16
+# How often readers look at the manifest's mtime for a new generation
+CHECK_INTERVAL = float(os.environ.get("PROVENANCE_SNAPSHOT_CHECK_S", 2))
+
+
+def _align(n: int) -> int:
+    return (n + 7) & ~7
+
+
+def record_key(kind: int, first_digest: bytes) -> bytes:
+    return bytes([kind]) + first_digest[:32].ljust(32, b"\x00")
+
+
+def _manifest_message(manifest) -> bytes:
+    return json.dumps(manifest, sort_keys=True, separators=(",", ":")).encode()
+
+
+def _write_durably(path: str, data: bytes):
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+
+
+class Snapshot:
+    """
+    One mapped snapshot file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count, index_offset = SNAP_HEADER.unpack_from(self.map, 0)
+        if magic != SNAP_MAGIC or version != SNAP_VERSION:
+            raise ValueError(f"{path} is not a version {SNAP_VERSION} provenance snapshot")
+        if index_offset + count * INDEX_DTYPE.itemsize != len(self.map):
+            raise ValueError(f"{path} is truncated")
+        self.index = np.frombuffer(self.map, dtype=INDEX_DTYPE, count=count, offset=index_offset)
+        self.index_end = index_offset + count * INDEX_DTYPE.itemsize
+        self.index_offset = index_offset
+
+    def __len__(self):
+        return len(self.index)
+
+    def index_digest(self) -> str:
+        # Header and index only: records are covered by their own signatures
+        h = hashlib.sha256(self.map[:SNAP_HEADER.size])
+        h.update(self.map[self.index_offset:self.index_end])
+        return h.hexdigest()
+
+    def record(self, i: int) -> ProvenanceRecord:
+        entry = self.index[i]
+        start = int(entry["offset"])
+        end = start + int(entry["length"])
+        record = ProvenanceRecord.from_bytes(memoryview(self.map)[start:end])
+        record.signature = self.map[end:end + int(entry["sig_length"])]
+        return record
+
+    def records(self, kind=None):
+        if kind is None:
+            lo, hi = 0, len(self.index)
+        else:
+            keys = self.index["key"]
+            lo = np.searchsorted(keys, bytes([kind]), side="left")
+            hi = np.searchsorted(keys, bytes([kind + 1]), side="left")
+        for i in range(lo, hi):
+            yield self.record(i)
+
+    def find(self, keys):
+        index_keys = self.index["key"]
+        for key in keys:
+            lo = np.searchsorted(index_keys, key, side="left")
+            hi = np.searchsorted(index_keys, key, side="right")
+            for i in range(lo, hi):
+                yield self.record(i)
+
+    def ids(self):
+        return {i.decode("ascii") for i in self.index["id"]}
+
+
+def load_manifest(snapshot_dir: str, public_key):
+    """
+    The signed manifest's contents, or None if there is none. Raises ValueError if it
+    isn't signed by `public_key`.
+    """
+    path = os.path.join(snapshot_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        data = json.load(f)
+    try:
+        public_key.verify(bytes.fromhex(data["signature"]), _manifest_message(data["manifest"]),
+                          ec.ECDSA(hashes.SHA256()))
+    except (InvalidSignature, KeyError, ValueError):
+        raise ValueError(f"{path} is not signed by the snapshot key")
+    return data["manifest"]
+
+
+def open_snapshots(snapshot_dir: str, manifest, reuse=None):
+    """
+    Map every file listed in `manifest`, reusing already mapped ones from `reuse` (files are
+    immutable, so a name always means the same content).
+    """
+    reuse = {snap.name: snap for snap in reuse or ()}
+    snapshots = []
+    for entry in manifest["files"]:
+        snap = reuse.get(entry["name"])
+        if snap is None:
+            snap = Snapshot(os.path.join(snapshot_dir, entry["name"]))
+            if len(snap) != entry["records"] or snap.index_digest() != entry["index_sha256"]:
+                raise ValueError(f"{snap.path} does not match the manifest")
+        snapshots.append(snap)
+    return tuple(snapshots)
+
+
+def write_snapshot(path: str, records):
+    """
+    Write (record, signature) pairs as one snapshot file. Returns its manifest entry.
+    """
+    entries = np.zeros(len(records), dtype=INDEX_DTYPE)
+    chunks = []
+    offset = SNAP_HEADER.size
+    for i, (record, signature) in enumerate(records):
+        data = record.to_bytes()
+        first = record.digest(0) if len(record.digests) else b""
+        entries[i]["key"] = record_key(record.kind, first)
+        entries[i]["id"] = record.id.encode("ascii")
+        entries[i]["offset"] = offset
+        entries[i]["length"] = len(data)
+        entries[i]["sig_length"] = len(signature)
+        chunk = data + signature
+        chunk += b"\x00" * (_align(len(chunk)) - len(chunk))
+        chunks.append(chunk)
+        offset += len(chunk)
+
+    entries.sort(order="key", kind="stable")
+    header = SNAP_HEADER.pack(SNAP_MAGIC, SNAP_VERSION, len(records), offset)
+    index = entries.tobytes()
+    _write_durably(path, header + b"".join(chunks) + index)
+
+    return {"name": os.path.basename(path), "records": len(records), "size": os.path.getsize(path),
+            "index_sha256": hashlib.sha256(header + index).hexdigest()}
+
+
+def export_snapshot(snapshot_dir: str, private_key, provenance_dir: str = PROVENANCE_DIR, compact: bool = False):
+    """
+    Export signed records from `provenance_dir` into `snapshot_dir`: a delta holding the
+    records not yet exported, or (first export, `compact`, or too many deltas) a new base
+    holding all of them. Returns the new manifest, or None if there was nothing to export.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    public_key = private_key.public_key()
+    try:
+        manifest = load_manifest(snapshot_dir, public_key)
+    except ValueError:
+        if not compact:
+            raise
+        manifest = None  # A compaction doesn't need the old generation, so it can replace a bad one
+    # files[0] is the base; the rest are deltas
+    if manifest is None or len(manifest["files"]) - 1 >= MAX_DELTAS:
+        compact = True
+
+    exported = set()
+    if not compact:
+        for snap in open_snapshots(snapshot_dir, manifest):
+            exported |= snap.ids()
+
+    records = []
+    for record in iter_local_records(None, provenance_dir):
+        if record.id in exported:
+            continue
+        try:
+            with open(signature_path(record.id, provenance_dir), "rb") as f:
+                signature = f.read()
+        except OSError:
+            print(f"Skipping unsigned record {record.id}")
+            continue
+        records.append((record, signature))
+
+    if not records and not compact:
+        print("Snapshot is up to date")
+        return None
+
+    # File names are never reused, even after the manifest was lost
+    generations = [int(name[len("snapshot_"):-len(SNAP_EXT)]) for name in os.listdir(snapshot_dir)
+                   if name.startswith("snapshot_") and name.endswith(SNAP_EXT)]
+    generation = max(generations + [manifest["generation"] if manifest else 0]) + 1
+    entry = write_snapshot(os.path.join(snapshot_dir, f"snapshot_{generation:06d}{SNAP_EXT}"), records)
+    files = [entry] if compact else manifest["files"] + [entry]
+    new_manifest = {"version": SNAP_VERSION, "generation": generation, "created": int(time.time()), "files": files}
+
+    signature = private_key.sign(_manifest_message(new_manifest), ec.ECDSA(hashes.SHA256()))
+    _write_durably(os.path.join(snapshot_dir, MANIFEST_NAME),
+                   json.dumps({"manifest": new_manifest, "signature": signature.hex()}, indent=2).encode())
+
+    # Replaced files can go: readers that still map them keep their pages until they swap
+    if compact:
+        listed = {f["name"] for f in files}
+        for name in os.listdir(snapshot_dir):
+            if name.endswith(SNAP_EXT) and name not in listed:
+                os.remove(os.path.join(snapshot_dir, name))
+
+    kind = "base" if compact else "delta"
+    print(f"Exported {len(records)} records as {kind} {entry['name']} (generation {generation})")
+    return new_manifest
+
+
+class SnapshotReader:
+    """
+    The current generation of a snapshot directory. Every access checks the manifest's
+    mtime (at most every CHECK_INTERVAL seconds) and swaps to a new generation in place;
+    if the new one can't be loaded or verified, the previous one stays in use.
+    """
+
+    def __init__(self, snapshot_dir: str, public_key):
+        self.snapshot_dir = snapshot_dir
+        self.public_key = public_key
+        self.snapshots = ()
+        self.generation = None
+        self.mtime = None
+        self.checked = 0.0
+        self.lock = threading.Lock()
+        self.refresh(force=True)
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.checked < CHECK_INTERVAL:
+            return
+        with self.lock:
+            self.checked = now
+            try:
+                mtime = os.stat(os.path.join(self.snapshot_dir, MANIFEST_NAME)).st_mtime_ns
+            except OSError:
+                return
+            if mtime == self.mtime:
+                return
+            try:
+                manifest = load_manifest(self.snapshot_dir, self.public_key)
+                snapshots = open_snapshots(self.snapshot_dir, manifest, self.snapshots)
+            except (OSError, ValueError) as e:
+                print(f"Keeping provenance snapshot generation {self.generation}: {e}")
+                return
+            self.snapshots, self.generation, self.mtime = snapshots, manifest["generation"], mtime
+
+    def current(self):
+        self.refresh()
+        return self.snapshots
+
+    def records(self, kind=None):
+        for snap in self.current():
+            yield from snap.records(kind)
+
+    def find(self, kind, first_digests):
+        keys = [record_key(kind, d) for d in first_digests]
+        for snap in self.current():
+            yield from snap.find(keys)
+
+    def info(self):
+        snapshots = self.current()
+        return {"generation": self.generation, "files": len(snapshots),
+                "records": sum(len(snap) for snap in snapshots)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export or inspect read-only provenance snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Export new records (a delta) or all records (--compact)")
+    export.add_argument("snapshot_dir")
+    export.add_argument("--provenance-dir", default=PROVENANCE_DIR)
+    export.add_argument("--key", default=PRIVATE_KEY_PATH)
+    export.add_argument("--compact", action="store_true", help="Write a single new base file")
+    info = sub.add_parser("info", help="Verify the manifest and summarize the snapshot")
+    info.add_argument("snapshot_dir")
+    info.add_argument("--public-key", default=PUBLIC_KEY_PATH)
+    args = parser.parse_args()
+
+    try:
+        if args.command == "export":
+            export_snapshot(args.snapshot_dir, load_private_key(args.key), args.provenance_dir, args.compact)
+        else:
+            reader = SnapshotReader(args.snapshot_dir, load_public_key(args.public_key))
+            if reader.generation is None:
+                print(f"No valid snapshot in {args.snapshot_dir}")
+                sys.exit(1)
+            summary = reader.info()
+            summary["kinds"] = {}
+            for record in reader.records():
+                name = KIND_NAMES[record.kind]
+                summary["kinds"][name] = summary["kinds"].get(name, 0) + 1
+            print(json.dumps(summary, indent=2))
+    except (OSError, ValueError) as e:
+        print(e)
+        sys.exit(1)
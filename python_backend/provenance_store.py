@@ -0,0 +1,182 @@
+import os
+import glob
+import uuid
+from contextlib import contextmanager
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.exceptions import InvalidSignature
+from provenance_record import ProvenanceRecord, RECORD_EXT, HEADER_SIZE, peek_kind
+
+PROVENANCE_DIR = "provenance"
+PRIVATE_KEY_PATH = "keys/private_key.pem"
+PUBLIC_KEY_PATH = "keys/public_key.pem"
+# Verify-only nodes read records from a snapshot directory exported by the signing node
+SNAPSHOT_DIR = os.environ.get("PROVENANCE_SNAPSHOT_DIR")
+# Key the snapshot manifest must be signed with
+SNAPSHOT_KEY_PATH = os.environ.get("PROVENANCE_SNAPSHOT_KEY", PUBLIC_KEY_PATH)
+
+_snapshot_reader = None
+
+
+def record_path(record_id: str, provenance_dir: str = PROVENANCE_DIR) -> str:
+    return os.path.join(provenance_dir, f"record_{record_id}{RECORD_EXT}")
+
+
+def signature_path(record_id: str, provenance_dir: str = PROVENANCE_DIR) -> str:
+    return os.path.join(provenance_dir, f"sig_{record_id}.bin")
+
+
+def load_private_key(path: str = PRIVATE_KEY_PATH):
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Error: {path} not found. Run from project root or generate keys.")
+    with open(path, "rb") as f:
+        return serialization.load_pem_private_key(f.read(), password=None, backend=None)
+
+
+def load_public_key(path: str = PUBLIC_KEY_PATH):
+    with open(path, "rb") as f:
+        return serialization.load_pem_public_key(f.read())
+
+
+class Transaction:
+    """
+    Signs and stages records, then writes them all in commit(): every file goes to a
+    temporary name and is fsynced first, then signatures and records are renamed into
+    place (records last, so a reader never sees an unsigned record). Nothing staged is
+    written if the batch fails before commit.
+    """
+
+    def __init__(self, private_key, provenance_dir: str = PROVENANCE_DIR):
+        self.private_key = private_key
+        self.provenance_dir = provenance_dir
+        self.staged = []
+        self.ids = set()
+
+    def _new_id(self) -> str:
+        # 8 hex chars collide quickly across large archives, so ids are checked against the store
+        while True:
+            record_id = uuid.uuid4().hex[:8]
+            if record_id not in self.ids and not os.path.exists(record_path(record_id, self.provenance_dir)):
+                self.ids.add(record_id)
+                return record_id
+
+    def add(self, fields) -> str:
+        """
+        Build a record from `fields` (ProvenanceRecord.build keyword arguments, minus the id),
+        sign it and stage it. Returns the path the record will have once committed.
+        """
+        record = ProvenanceRecord.build(record_id=self._new_id(), **fields)
+        data = record.to_bytes()
+        signature = self.private_key.sign(data, ec.ECDSA(hashes.SHA256()))
+        self.staged.append((record.id, data, signature))
+        return record_path(record.id, self.provenance_dir)
+
+    def commit(self):
+        os.makedirs(self.provenance_dir, exist_ok=True)
+        renames = []
+        for record_id, data, signature in self.staged:
+            for path, content in ((signature_path(record_id, self.provenance_dir), signature),
+                                  (record_path(record_id, self.provenance_dir), data)):
+                with open(path + ".tmp", "wb") as f:
+                    f.write(content)
+                    f.flush()
+                    os.fsync(f.fileno())
+                renames.append(path)
+
+        # Signatures before records
+        for path in renames[0::2] + renames[1::2]:
+            os.replace(path + ".tmp", path)
+
+        dir_fd = os.open(self.provenance_dir, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+        self.staged = []
+
+
+@contextmanager
+def transaction(private_key, provenance_dir: str = PROVENANCE_DIR):
+    txn = Transaction(private_key, provenance_dir)
+    yield txn
+    txn.commit()
+
+
+def store_record(fields, private_key, provenance_dir: str = PROVENANCE_DIR) -> str:
+    """
+    Sign and durably store a single record. Returns its path.
+    """
+    with transaction(private_key, provenance_dir) as txn:
+        return txn.add(fields)
+
+
+def snapshots():
+    """
+    The SnapshotReader for SNAPSHOT_DIR, opened on first use, or None when not configured.
+    """
+    global _snapshot_reader
+    if SNAPSHOT_DIR and _snapshot_reader is None:
+        from provenance_snapshot import SnapshotReader
+        _snapshot_reader = SnapshotReader(SNAPSHOT_DIR, load_public_key(SNAPSHOT_KEY_PATH))
+    return _snapshot_reader
+
+
+def iter_records(kind=None, provenance_dir: str = PROVENANCE_DIR):
+    """
+    Yields every parseable record (optionally of one kind) without checking signatures;
+    callers narrow candidates by content first and verify only the ones they report on.
+    Snapshot records come first, then local ones not already in the snapshot.
+    """
+    reader = snapshots()
+    seen = set()
+    if reader is not None:
+        for record in reader.records(kind):
+            seen.add(record.id)
+            yield record
+    for record in iter_local_records(kind, provenance_dir):
+        if record.id not in seen:
+            yield record
+
+
+def find_records(kind, first_digests, provenance_dir: str = PROVENANCE_DIR):
+    """
+    Records of `kind` whose first digest is one of `first_digests`. Snapshots answer from
+    their index; local records are scanned.
+    """
+    first_digests = set(first_digests)
+    reader = snapshots()
+    seen = set()
+    if reader is not None:
+        for record in reader.find(kind, first_digests):
+            seen.add(record.id)
+            yield record
+    for record in iter_local_records(kind, provenance_dir):
+        if record.id not in seen and len(record.digests) and record.digest(0) in first_digests:
+            yield record
+
+
+def iter_local_records(kind=None, provenance_dir: str = PROVENANCE_DIR):
+    for path in sorted(glob.glob(os.path.join(provenance_dir, f"record_*{RECORD_EXT}"))):
+        try:
+            with open(path, "rb") as f:
+                header = f.read(HEADER_SIZE)
+                record_kind = peek_kind(header)
+                if record_kind is None or (kind is not None and record_kind != kind):
+                    continue
+                record = ProvenanceRecord.from_bytes(header + f.read())
+        except (OSError, ValueError) as e:
+            print(f"Skipping provenance record {path}: {e}")
+            continue
+        yield record
+
+
+def verify_record(record: ProvenanceRecord, public_key, provenance_dir: str = PROVENANCE_DIR) -> bool:
+    try:
+        signature = record.signature
+        if signature is None:
+            with open(signature_path(record.id, provenance_dir), "rb") as f:
+                signature = f.read()
+        public_key.verify(signature, record.to_bytes(), ec.ECDSA(hashes.SHA256()))
+        return True
+    except (OSError, InvalidSignature):
+        return False
@@ -1,43 +1,61 @@
-import sys
 import os
+import sys
 import imageio.v3 as iio
 import numpy as np
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import ec
-from video_utils import chained_hash
-
-def sign_video(video_path: str):
-    # Ensure provenance directory exists
-    os.makedirs("provenance", exist_ok=True)
-    
-    # Check if private key exists
-    if not os.path.exists("keys/private_key.pem"):
-        raise FileNotFoundError("Error: keys/private_key.pem not found. Run from project root or generate keys.")
-    
-    with open("keys/private_key.pem", "rb") as f:
-        private_key = serialization.load_pem_private_key(f.read(), password=None, backend=None)
-
-    prev_hash = b"\x00" * 32
-    chain = []
+from video_utils import content_hash, DEFAULT_ALG
+from provenance_record import KIND_VIDEO
+from provenance_store import store_record, load_private_key, PROVENANCE_DIR
+from perturb import perturb_video, perturbation_key, noise_seed, new_nonce, PERTURB_BITS, VIDEO_OUTPUT_EXT
+
+def hash_video(video_path: str, alg: str = DEFAULT_ALG, checkpoint=None, perturb_key=None, output_path=None):
+    """
+    Compute step of signing: the record fields for this video, with no key writes. With a
+    `perturb_key`, the perturbed video is written to `output_path` and that is what gets hashed.
+    """
+    if perturb_key is not None:
+        nonce = new_nonce()
+        return {"kind": KIND_VIDEO, "alg": alg, "perturbation": (nonce, PERTURB_BITS),
+                "digests": perturb_video(video_path, output_path, noise_seed(perturb_key, nonce), alg, checkpoint)}
+
+    # Independent per-frame hashes let the verifier check any frame without decoding its predecessors
+    frame_hashes = []
 
     for frame in iio.imiter(video_path):
-        frame_bytes = frame.astype(np.uint8).tobytes()
-        curr_hash = chained_hash(frame_bytes, prev_hash)
-        chain.append(curr_hash)
-        prev_hash = curr_hash
+        if checkpoint is not None:
+            checkpoint()
+        frame_hashes.append(content_hash(frame.astype(np.uint8).tobytes(), alg))
+
+    return {"kind": KIND_VIDEO, "alg": alg, "digests": frame_hashes}
+
+def protected_path(video_path: str) -> str:
+    return os.path.splitext(video_path)[0] + "_protected" + VIDEO_OUTPUT_EXT
+
+def sign_video(video_path: str, alg: str = DEFAULT_ALG, checkpoint=None, private_key=None,
+               provenance_dir: str = PROVENANCE_DIR, perturb: bool = False, output_path=None):
+    """
+    Signs the video as is, or with `perturb` writes a lossless video with keyed noise (to
+    `output_path`, by default next to the input) and signs that.
+    """
+    if private_key is None:
+        private_key = load_private_key()
 
-    with open("provenance/video_chain.bin", "wb") as f:
-        for h in chain:
-            f.write(h)
+    perturb_key = None
+    if perturb:
+        perturb_key = perturbation_key(private_key)
+        output_path = output_path or protected_path(video_path)
 
-    signature = private_key.sign(prev_hash, ec.ECDSA(hashes.SHA256()))
-    with open("provenance/video_sig.bin", "wb") as f:
-        f.write(signature)
+    # Per-frame index as a binary record, so every signed video keeps its own index
+    prov_path = store_record(hash_video(video_path, alg, checkpoint, perturb_key, output_path),
+                             private_key, provenance_dir)
+    if perturb:
+        print(f"Perturbed video written to {output_path}")
 
     print("Video signed successfully")
+    return prov_path
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python video_sign.py <video.mp4>")
+    args = [a for a in sys.argv[1:] if a != "--perturb"]
+    if len(args) != 1:
+        print("Usage: python video_sign.py <video.mp4> [--perturb]")
         sys.exit(1)
-    sign_video(sys.argv[1])
+    sign_video(args[0], perturb="--perturb" in sys.argv)
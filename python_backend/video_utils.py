@@ -1,12 +1,55 @@
 import hashlib
 
-def chained_hash(frame: bytes, prev_hash: bytes) -> bytes:
-    h = hashlib.sha256()
+try:
+    import blake3
+except ImportError:  # Optional: multithreaded tree hashing for large frames/blocks
+    blake3 = None
+
+# Records without an "alg" field were produced before algorithm agility and are SHA-256.
+LEGACY_ALG = "sha256"
+
+# All supported algorithms produce 32-byte digests so chain seeds and record layouts stay fixed.
+DIGEST_SIZE = 32
+
+# Inputs at least this large are hashed with BLAKE3's thread pool (when available).
+BLAKE3_PARALLEL_MIN_BYTES = 1 << 20
+
+SUPPORTED_ALGS = ("sha256", "blake2b") + (("blake3",) if blake3 is not None else ())
+
+# New records use the fastest algorithm this install supports.
+DEFAULT_ALG = "blake3" if blake3 is not None else "blake2b"
+
+
+def new_hasher(alg: str = LEGACY_ALG, size_hint: int = 0):
+    if alg == "sha256":
+        return hashlib.sha256()
+    if alg == "blake2b":
+        return hashlib.blake2b(digest_size=DIGEST_SIZE)
+    if alg == "blake3":
+        if blake3 is None:
+            raise ValueError("Hash algorithm 'blake3' requires the blake3 package")
+        if size_hint >= BLAKE3_PARALLEL_MIN_BYTES:
+            return blake3.blake3(max_threads=blake3.blake3.AUTO)
+        return blake3.blake3()
+    raise ValueError(f"Unsupported hash algorithm: {alg}")
+
+
+def chained_hash(frame: bytes, prev_hash: bytes, alg: str = LEGACY_ALG) -> bytes:
+    h = new_hasher(alg, len(frame))
     h.update(frame)
     h.update(prev_hash)
     return h.digest()
 
-def content_hash(data: bytes) -> bytes:
-    h = hashlib.sha256()
+def content_hash(data: bytes, alg: str = LEGACY_ALG) -> bytes:
+    h = new_hasher(alg, len(data))
     h.update(data)
-    return h.digest()
\ No newline at end of file
+    return h.digest()
+
+
+def frame_index_message(alg: str, digests: bytes) -> bytes:
+    """
+    Bytes signed for an independent per-frame hash index. Binding the algorithm and
+    frame count into the signed message stops either from being swapped out.
+    """
+    header = f"hemlock-frame-index:{alg}:{len(digests) // DIGEST_SIZE}:".encode()
+    return header + digests
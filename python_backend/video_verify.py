@@ -1,13 +1,34 @@
 import sys
+import os
 import json
+import math
+import random
 import numpy as np
 import imageio.v3 as iio
 
-from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.exceptions import InvalidSignature
 
-from video_utils import chained_hash
+from video_utils import chained_hash, content_hash, frame_index_message, LEGACY_ALG, DIGEST_SIZE, SUPPORTED_ALGS
+from provenance_record import KIND_VIDEO
+from provenance_store import iter_records, find_records, verify_record, load_public_key, PROVENANCE_DIR
+
+
+# A video is matched to its signed frame index from its first frames; if none of these
+# matches any index, it is reported as NO_MATCHING_RECORD
+LOOKUP_FRAMES = 32
+# Frames, from the first match, compared against every index that matched it
+NARROW_FRAMES = 8
+
+# Quick verify defaults
+QUICK_SAMPLE_SIZE = 32
+QUICK_CONFIDENCE = 0.95
+
+# Longest side of the overlay thumbnail kept for each tampered range
+THUMBNAIL_MAX_DIM = 320
+# Further ranges are still reported, just without thumbnails
+MAX_RANGE_THUMBNAILS = 32
 
 
 # ----------------------------
@@ -25,103 +46,501 @@ def load_chain(path):
     return chain
 
 
-def save_mismatch_overlay(video_path: str, frame_index: int):
+def load_chain_alg(path):
     """
-    Save the mismatched frame with a red forensic overlay.
+    Hash algorithm used for the stored chain (chains predating video_meta.json are SHA-256).
     """
-    for idx, frame in enumerate(iio.imiter(video_path)):
-        if idx == frame_index:
-            frame = frame.copy()
-            h, w, _ = frame.shape
+    if not os.path.exists(path):
+        return LEGACY_ALG
+    with open(path, "r") as f:
+        return json.load(f).get("alg", LEGACY_ALG)
 
-            thickness = 10  # border thickness
 
-            # Red border
-            frame[:thickness, :, :] = [255, 0, 0]
-            frame[-thickness:, :, :] = [255, 0, 0]
-            frame[:, :thickness, :] = [255, 0, 0]
-            frame[:, -thickness:, :] = [255, 0, 0]
+def red_border(frame, thickness: int):
+    frame[:thickness, :, :] = [255, 0, 0]
+    frame[-thickness:, :, :] = [255, 0, 0]
+    frame[:, :thickness, :] = [255, 0, 0]
+    frame[:, -thickness:, :] = [255, 0, 0]
+    return frame
 
-            os.makedirs("provenance", exist_ok=True)
-            out_path = f"provenance/mismatch_frame_{frame_index}.png"
-            iio.imwrite(out_path, frame)
 
-            print(f"🖼️  Mismatch frame saved to {out_path}")
-            return
+def range_thumbnail(frame):
+    """
+    Decimated copy of a range's first tampered frame with a red border, kept during the scan
+    so no frame has to be decoded again for the report.
+    """
+    step = max(1, math.ceil(max(frame.shape[:2]) / THUMBNAIL_MAX_DIM))
+    return red_border(frame[::step, ::step, :3].astype(np.uint8), 3)
+
+
+def save_thumbnail(thumbnail, name: str, provenance_dir: str = PROVENANCE_DIR):
+    os.makedirs(provenance_dir, exist_ok=True)
+    out_path = os.path.join(provenance_dir, name)
+    iio.imwrite(out_path, thumbnail)
+    return out_path
+
+
+def save_range_thumbnails(ranges, thumbnails, provenance_dir: str = PROVENANCE_DIR):
+    for tampered in ranges:
+        thumbnail = thumbnails.get(tampered["start"])
+        if thumbnail is not None:
+            tampered["overlay"] = save_thumbnail(
+                thumbnail, f"mismatch_range_{tampered['start']}_{tampered['end']}.png", provenance_dir)
+
+
+def stratified_sample(total: int, sample_size: int, rng: random.Random):
+    """
+    One random frame from each of `sample_size` equal strata, so samples cover the whole video.
+    """
+    if total <= sample_size:
+        return list(range(total))
+    stride = total / sample_size
+    return [int(i * stride) + rng.randrange(max(1, int((i + 1) * stride) - int(i * stride)))
+            for i in range(sample_size)]
+
+
+def tampered_fraction_upper_bound(samples: int, failures: int, confidence: float) -> float:
+    """
+    One-sided Clopper-Pearson upper bound on the tampered fraction of frames, given
+    `failures` mismatches among `samples` uniformly drawn frames. Sampling without
+    replacement only tightens this, so the bound is conservative.
+    """
+    if samples == 0:
+        return 1.0
+    if failures >= samples:
+        return 1.0
+
+    alpha = 1.0 - confidence
+
+    def cdf(p):
+        return sum(math.comb(samples, i) * p ** i * (1 - p) ** (samples - i) for i in range(failures + 1))
+
+    lo, hi = failures / samples, 1.0
+    for _ in range(60):
+        mid = (lo + hi) / 2
+        if cdf(mid) > alpha:
+            lo = mid
+        else:
+            hi = mid
+    return hi
+
+
+def record_candidate(record, public_key, provenance_dir: str = PROVENANCE_DIR):
+    return {"id": f"record_{record.id}", "alg": record.alg, "count": len(record.digests),
+            "matches": lambda idx, frame, digest: digest(record.alg) == record.digest(idx),
+            "signature_valid": lambda: verify_record(record, public_key, provenance_dir)}
+
+
+def legacy_index_candidate(public_key, provenance_dir: str = PROVENANCE_DIR):
+    """
+    The single-slot per-frame index (provenance/video_frames.bin) of videos signed before records.
+    """
+    index_path = os.path.join(provenance_dir, "video_frames.bin")
+    if not os.path.exists(index_path):
+        return None
+    alg = load_chain_alg(os.path.join(provenance_dir, "video_meta.json"))
+    with open(index_path, "rb") as f:
+        frame_index = f.read()
+    digests = np.frombuffer(frame_index, dtype=np.uint8).reshape(-1, DIGEST_SIZE)
+
+    def signature_valid():
+        try:
+            with open(os.path.join(provenance_dir, "video_frames_sig.bin"), "rb") as f:
+                public_key.verify(f.read(), frame_index_message(alg, frame_index), ec.ECDSA(hashes.SHA256()))
+            return True
+        except (OSError, InvalidSignature):
+            return False
+
+    return {"id": "video_frames.bin", "alg": alg, "count": len(digests),
+            "matches": lambda idx, frame, digest: digest(alg) == digests[idx].tobytes(),
+            "signature_valid": signature_valid}
+
+
+def legacy_chain_candidate(public_key, provenance_dir: str = PROVENANCE_DIR):
+    """
+    The single-slot hash chain (provenance/video_chain.bin), signed over its last link.
+    Each frame is checked against its stored link, chained from the *stored* previous link
+    rather than the recomputed one, so one edited frame doesn't fail every frame after it.
+    The signature over the last link then vouches for the whole stored chain.
+    """
+    chain_path = os.path.join(provenance_dir, "video_chain.bin")
+    if not os.path.exists(chain_path):
+        return None
+    stored_chain = load_chain(chain_path)
+    alg = load_chain_alg(os.path.join(provenance_dir, "video_meta.json"))
+
+    def link_matches(idx, frame, digest):
+        prev_hash = stored_chain[idx - 1] if idx else b"\x00" * 32
+        return chained_hash(frame, prev_hash, alg) == stored_chain[idx]
+
+    def signature_valid():
+        try:
+            with open(os.path.join(provenance_dir, "video_sig.bin"), "rb") as f:
+                public_key.verify(f.read(), stored_chain[-1] if stored_chain else b"\x00" * 32,
+                                  ec.ECDSA(hashes.SHA256()))
+            return True
+        except (OSError, InvalidSignature):
+            return False
+
+    return {"id": "video_chain.bin", "alg": alg, "count": len(stored_chain),
+            "matches": link_matches, "signature_valid": signature_valid}
+
+
+class FrameIndexLocator:
+    """
+    Finds the signed frame index of the video being verified from the frames themselves:
+    the first frame (up to LOOKUP_FRAMES) that matches some index at its own position,
+    under a valid signature, picks out the contenders. An edited opening therefore still
+    finds the video's own record, and a video matching nothing is never checked against an
+    unrelated legacy index.
+
+    Signed videos can share opening frames (a black frame 0, a common intro), so every
+    index matching that frame is kept and the next NARROW_FRAMES frames are compared
+    against all of them; the one matching the most is locked in.
+
+    Untouched videos are found through the records' first-digest lookup (which snapshots
+    answer from their index); only when frame 0 matches nothing are all records compared.
+    """
+
+    def __init__(self, public_key, provenance_dir: str = PROVENANCE_DIR):
+        self.public_key = public_key
+        self.provenance_dir = provenance_dir
+        self.candidate = None
+        self.hits = set()  # Frames the locked-in index matched while it was being located
+        self.candidates = None  # Every record and legacy index, loaded on the first miss
+        self.contenders = []  # (candidate, matched frames) of every index matching so far
+        self.narrow_from = None
+        self.signatures = {}
+        self.failure = "NO_MATCHING_RECORD"
+
+    def _load_candidates(self):
+        self.candidates = [record_candidate(record, self.public_key, self.provenance_dir)
+                           for record in iter_records(KIND_VIDEO, self.provenance_dir)
+                           if record.alg in SUPPORTED_ALGS]
+        for legacy in (legacy_index_candidate, legacy_chain_candidate):
+            candidate = legacy(self.public_key, self.provenance_dir)
+            if candidate is not None and candidate["alg"] in SUPPORTED_ALGS:
+                self.candidates.append(candidate)
+        if not self.candidates:
+            self.failure = "NO_FRAME_INDEX"
+
+    def _signature_valid(self, candidate) -> bool:
+        if candidate["id"] not in self.signatures:
+            self.signatures[candidate["id"]] = candidate["signature_valid"]()
+        if not self.signatures[candidate["id"]]:
+            self.failure = "SIGNATURE_MISMATCH"
+        return self.signatures[candidate["id"]]
+
+    def _matching(self, idx: int, frame: bytes, digest):
+        """
+        Every validly signed index matching frame `idx` at its own position.
+        """
+        if idx == 0:
+            first_digests = {digest(alg): alg for alg in SUPPORTED_ALGS}
+            found = [record_candidate(record, self.public_key, self.provenance_dir)
+                     for record in find_records(KIND_VIDEO, first_digests, self.provenance_dir)
+                     if first_digests.get(record.digest(0)) == record.alg]
+            found = [candidate for candidate in found if self._signature_valid(candidate)]
+            if found:
+                return found
+
+        if self.candidates is None:
+            self._load_candidates()
+        return [candidate for candidate in self.candidates
+                if idx < candidate["count"] and candidate["matches"](idx, frame, digest)
+                and self._signature_valid(candidate)]
+
+    @staticmethod
+    def _digests(frame: bytes):
+        digests = {}
+
+        def digest(alg):
+            if alg not in digests:
+                digests[alg] = content_hash(frame, alg)
+            return digests[alg]
+        return digest
+
+    def observe(self, idx: int, frame: bytes) -> bool:
+        """
+        Feed frame `idx` while no index is locked in; True once one is.
+        """
+        digest = self._digests(frame)
+        if not self.contenders:
+            self.contenders = [(candidate, {idx}) for candidate in self._matching(idx, frame, digest)]
+            self.narrow_from = idx
+        else:
+            for candidate, hits in self.contenders:
+                if idx < candidate["count"] and candidate["matches"](idx, frame, digest):
+                    hits.add(idx)
+
+        if len(self.contenders) == 1 or (self.contenders and idx + 1 - self.narrow_from >= NARROW_FRAMES):
+            self.finish(idx + 1)
+        return self.candidate is not None
+
+    def finish(self, frames_seen: int):
+        """
+        Lock in the contender that matched the most frames, preferring one signed for as many
+        frames as the video turned out to have. Called early when the video ends first.
+        """
+        if self.candidate is None and self.contenders:
+            self.candidate, self.hits = max(
+                self.contenders, key=lambda contender: (len(contender[1]), contender[0]["count"] == frames_seen))
+        return self.candidate
+
+    def matches(self, idx: int, frame: bytes) -> bool:
+        """
+        Whether frame `idx` matches the locked-in index.
+        """
+        return idx < self.candidate["count"] and self.candidate["matches"](idx, frame, self._digests(frame))
 
 
 # ----------------------------
 # Main verification
 # ----------------------------
 
-def verify_video(video_path: str, public_key_path: str = "keys/public_key.pem"):
+def quick_verify_video(video_path: str, public_key_path: str = "keys/public_key.pem",
+                       sample_size: int = QUICK_SAMPLE_SIZE, confidence: float = QUICK_CONFIDENCE,
+                       seed=None, checkpoint=None, public_key=None, provenance_dir: str = PROVENANCE_DIR,
+                       evidence: bool = True, evidence_dir: str = None):
+    """
+    Probabilistic triage: check a stratified random sample of frames against the independent
+    per-frame hash index. The frames come from a single decode pass, numbered exactly as the
+    signer numbered them (seeking by timestamp misplaces frames of variable frame rate
+    video, and restarts the decoder per sample), and only the sampled ones are hashed, so
+    a quick check never costs more than a full one. With `evidence`, a thumbnail of the
+    first mismatched frame is saved to `evidence_dir` (default: the provenance directory)
+    as report["mismatch_overlay"].
+    """
     report = {
         "file": video_path,
+        "mode": "quick",
         "status": "UNKNOWN",
         "failure_type": None,
         "first_mismatched_frame": None,
-        "total_frames_checked": 0,
+        "sampled_frames": [],
+        "mismatched_frames": [],
+        "confidence": confidence,
+        "tampered_fraction_upper_bound": None,
         "signed_by": "ECDSA-P256",
         "verified_with_public_key": True
     }
 
-    # Load public key
-    with open(public_key_path, "rb") as f:
-        public_key = serialization.load_pem_public_key(f.read())
+    if public_key is None:
+        public_key = load_public_key(public_key_path)
+    evidence_dir = evidence_dir or provenance_dir
 
-    # Load stored hash chain
-    stored_chain = load_chain("provenance/video_chain.bin")
-    report["total_expected_frames"] = len(stored_chain)
+    # Locate the video's frame index from its first frames; the frames passed over on the way are mismatches
+    locator = FrameIndexLocator(public_key, provenance_dir)
+    lookup_thumbnails = {}
+    frames_seen = 0
+    frames = enumerate(iio.imiter(video_path))
+    for idx, frame in frames:
+        if checkpoint is not None:
+            checkpoint()
+        frames_seen += 1
+        lookup_thumbnails[idx] = range_thumbnail(frame)
+        if locator.observe(idx, frame.astype(np.uint8).tobytes()):
+            break
+        if not locator.contenders and idx + 1 >= LOOKUP_FRAMES:
+            break
+
+    candidate = locator.finish(frames_seen)
+    if candidate is None:
+        report["status"] = "FAILED"
+        report["failure_type"] = locator.failure
+        return report
+    report["hash_alg"] = candidate["alg"]
+
+    total = candidate["count"]
+    report["total_expected_frames"] = total
+    lookup_mismatches = [idx for idx in sorted(lookup_thumbnails) if idx not in locator.hits]
+    # Frames are in ascending order, so the first one kept is the first mismatched frame
+    first_thumbnail = lookup_thumbnails[lookup_mismatches[0]] if lookup_mismatches else None
+
+    samples = sorted(stratified_sample(total, sample_size, random.Random(seed)))
+    report["sampled_frames"] = samples
+    # Samples among the frames already checked while locating take that result
+    sampled_mismatches = [idx for idx in samples if idx < frames_seen and idx not in locator.hits]
+    pending = {idx for idx in samples if idx >= frames_seen}
+
+    if frames_seen > total:
+        report["failure_type"] = "EXTRA_FRAMES"
+    else:
+        # The rest of the same pass: only sampled frames are hashed, and it ends on the probe
+        # one past the signed end, since appended frames would never be sampled
+        for idx, frame in frames:
+            if checkpoint is not None:
+                checkpoint()
+            if idx >= total:
+                report["failure_type"] = "EXTRA_FRAMES"
+                if first_thumbnail is None:
+                    first_thumbnail = range_thumbnail(frame)
+                break
+            if idx not in pending:
+                continue
+            pending.discard(idx)
+            if not locator.matches(idx, frame.astype(np.uint8).tobytes()):
+                sampled_mismatches.append(idx)
+                if first_thumbnail is None:
+                    first_thumbnail = range_thumbnail(frame)
+        # Sampled frames the video doesn't have: it was truncated
+        sampled_mismatches.extend(pending)
+
+    # The bound only counts the uniformly drawn samples, not the frames checked while locating
+    report["mismatched_frames"] = sorted(set(lookup_mismatches) | set(sampled_mismatches))
+    report["tampered_fraction_upper_bound"] = tampered_fraction_upper_bound(len(samples), len(sampled_mismatches),
+                                                                            confidence)
+
+    if report["mismatched_frames"]:
+        report["status"] = "FAILED"
+        report["failure_type"] = "SAMPLED_FRAME_MISMATCH"
+        report["first_mismatched_frame"] = report["mismatched_frames"][0]
+    elif report["failure_type"] == "EXTRA_FRAMES":
+        report["status"] = "FAILED"
+        report["first_mismatched_frame"] = total
+    else:
+        report["status"] = "VERIFIED"
+
+    if evidence and report["status"] == "FAILED" and first_thumbnail is not None:
+        report["mismatch_overlay"] = save_thumbnail(
+            first_thumbnail, f"mismatch_frame_{report['first_mismatched_frame']}.png", evidence_dir)
+    return report
 
-    prev_hash = b"\x00" * 32
-    last_valid_frame = -1
 
-    # Frame-by-frame verification
+def scan_frames(video_path: str, locator: FrameIndexLocator, report, checkpoint=None):
+    """
+    One decode pass that checks every frame with `locator.matches(idx, frame_bytes)` and keeps
+    going after a mismatch. Frames before the locator locks an index in are held (as
+    thumbnails) and classified once it has; those the index didn't match count as modified.
+    Consecutive failing frames are coalesced into report["tampered_ranges"]
+    ({"start", "end", "frames", "kind"} with kind "modified", "extra" for frames past the
+    signed end, or "missing" for signed frames the video lacks).
+    Returns thumbnails of each range's first frame, keyed by range start.
+    """
+    ranges = []
+    thumbnails = {}
+    held = []  # (idx, thumbnail) of frames seen before an index was locked in
+
+    def add(idx, kind, thumbnail):
+        if ranges and ranges[-1]["end"] == idx - 1 and ranges[-1]["kind"] == kind:
+            ranges[-1]["end"] = idx
+            ranges[-1]["frames"] += 1
+            return
+        ranges.append({"start": idx, "end": idx, "frames": 1, "kind": kind})
+        if len(thumbnails) < MAX_RANGE_THUMBNAILS:
+            thumbnails[idx] = thumbnail()
+
+    def release():
+        for held_idx, thumbnail in held:
+            if held_idx >= locator.candidate["count"]:
+                add(held_idx, "extra", lambda: thumbnail)
+            elif held_idx not in locator.hits:
+                add(held_idx, "modified", lambda: thumbnail)
+        held.clear()
+
     for idx, frame in enumerate(iio.imiter(video_path)):
+        if checkpoint is not None:
+            checkpoint()
         report["total_frames_checked"] += 1
 
-        frame_bytes = frame.astype(np.uint8).tobytes()
-        curr_hash = chained_hash(frame_bytes, prev_hash)
+        if locator.candidate is None:
+            held.append((idx, range_thumbnail(frame)))
+            if locator.observe(idx, frame.astype(np.uint8).tobytes()):
+                release()
+            elif not locator.contenders and idx + 1 >= LOOKUP_FRAMES:
+                break  # No signed index matches this video
+            continue
 
-        if idx >= len(stored_chain) or curr_hash != stored_chain[idx]:
-            report["status"] = "FAILED"
-            report["failure_type"] = "FRAME_HASH_MISMATCH"
-            report["first_mismatched_frame"] = idx
-            break
+        if idx >= locator.candidate["count"]:
+            add(idx, "extra", lambda: range_thumbnail(frame))
+        elif not locator.matches(idx, frame.astype(np.uint8).tobytes()):
+            add(idx, "modified", lambda: range_thumbnail(frame))
+
+    if locator.finish(report["total_frames_checked"]) is None:
+        report["status"] = "FAILED"
+        report["failure_type"] = locator.failure
+        return {}
+    release()
+
+    expected_frames = locator.candidate["count"]
+    report["hash_alg"] = locator.candidate["alg"]
+    report["total_expected_frames"] = expected_frames
+    checked = report["total_frames_checked"]
+    if checked < expected_frames:
+        ranges.append({"start": checked, "end": expected_frames - 1,
+                       "frames": expected_frames - checked, "kind": "missing"})
 
-        prev_hash = curr_hash
-        last_valid_frame = idx
+    report["tampered_ranges"] = ranges
+    report["mismatched_frame_count"] = sum(r["frames"] for r in ranges)
+    if ranges:
+        report["status"] = "FAILED"
+        report["first_mismatched_frame"] = ranges[0]["start"]
+        only_missing = all(r["kind"] == "missing" for r in ranges)
+        report["failure_type"] = "MISSING_FRAMES" if only_missing else "FRAME_HASH_MISMATCH"
     else:
-        # Frame chain matched → verify signature
-        try:
-            with open("provenance/video_sig.bin", "rb") as f:
-                signature = f.read()
+        report["status"] = "VERIFIED"
+    return thumbnails
+
+
+def verify_video(video_path: str, public_key_path: str = "keys/public_key.pem", mode: str = "full",
+                 sample_size: int = QUICK_SAMPLE_SIZE, confidence: float = QUICK_CONFIDENCE, checkpoint=None,
+                 public_key=None, provenance_dir: str = PROVENANCE_DIR, evidence: bool = True,
+                 evidence_dir: str = None):
+    """
+    `public_key` skips loading the key file (bulk runs reuse one); with `evidence=False`
+    neither the JSON report nor mismatch overlays are written. Both go to `evidence_dir`
+    (default: the provenance directory); concurrent callers each pass their own.
+    """
+    evidence_dir = evidence_dir or provenance_dir
+    if mode == "quick":
+        report = quick_verify_video(video_path, public_key_path, sample_size, confidence, checkpoint=checkpoint,
+                                    public_key=public_key, provenance_dir=provenance_dir, evidence=evidence,
+                                    evidence_dir=evidence_dir)
+        if report["status"] == "VERIFIED":
+            print(f"Video sample verified ({len(report['sampled_frames'])} frames, "
+                  f"tampered fraction <= {report['tampered_fraction_upper_bound']:.1%} "
+                  f"at {confidence:.0%} confidence)")
+        else:
+            print("Video quick verification failed")
+            print(f"  Reason: {report['failure_type']}")
+        return report
 
-            public_key.verify(
-                signature,
-                prev_hash,
-                ec.ECDSA(hashes.SHA256())
-            )
+    report = {
+        "file": video_path,
+        "status": "UNKNOWN",
+        "failure_type": None,
+        "first_mismatched_frame": None,
+        "total_frames_checked": 0,
+        "signed_by": "ECDSA-P256",
+        "verified_with_public_key": True
+    }
 
-            report["status"] = "VERIFIED"
+    # Load public key
+    if public_key is None:
+        public_key = load_public_key(public_key_path)
 
-        except InvalidSignature:
-            report["status"] = "FAILED"
-            report["failure_type"] = "SIGNATURE_MISMATCH"
-            report["first_mismatched_frame"] = last_valid_frame + 1
+    # Per-video records first; videos signed before records used a single-slot index and hash chain
+    thumbnails = scan_frames(video_path, FrameIndexLocator(public_key, provenance_dir), report, checkpoint)
 
-    # Write JSON report
-    with open("provenance/video_verification_report.json", "w") as f:
-        json.dump(report, f, indent=2)
+    # Write JSON report. The overlays are the thumbnails the scan kept, so no frame is decoded again
+    if evidence:
+        ranges = report.get("tampered_ranges", [])
+        save_range_thumbnails(ranges, thumbnails, evidence_dir)
+        if ranges and ranges[0].get("overlay"):
+            report["mismatch_overlay"] = ranges[0]["overlay"]
+        os.makedirs(evidence_dir, exist_ok=True)
+        with open(os.path.join(evidence_dir, "video_verification_report.json"), "w") as f:
+            json.dump(report, f, indent=2)
 
-    # Console output + visual evidence
+    # Console output
     if report["status"] == "VERIFIED":
         print("Video verified successfully")
     else:
         print("Video verification failed")
         print(f"  Reason: {report['failure_type']}")
         print(f"  First mismatched frame: {report['first_mismatched_frame']}")
-        save_mismatch_overlay(video_path, report["first_mismatched_frame"])
+        for tampered in report.get("tampered_ranges", []):
+            print(f"  Frames {tampered['start']}-{tampered['end']}: {tampered['kind']}")
 
     return report
 
@@ -131,8 +550,8 @@ def verify_video(video_path: str, public_key_path: str = "keys/public_key.pem"):
 # ----------------------------
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python video_verify.py <video.mp4>")
+    if len(sys.argv) not in (2, 3) or (len(sys.argv) == 3 and sys.argv[2] != "--quick"):
+        print("Usage: python video_verify.py <video.mp4> [--quick]")
         sys.exit(1)
 
-    verify_video(sys.argv[1])
\ No newline at end of file
+    verify_video(sys.argv[1], mode="quick" if len(sys.argv) == 3 else "full")
@@ -1,87 +1,199 @@
+import time
+
+# Measured from here to the end of bootstrap() to report import-to-ready time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
 import sys
-from flask import Flask, request, send_file, send_from_directory
+import re
+import hmac
+import math
+import hashlib
+import importlib
+import mimetypes
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from flask import Flask, Request, request, send_file, send_from_directory
 
 # Add CWD to system path so we can import video_py modules if needed
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 # Also add the python_backend subdirectory so 'import video_utils' works inside those scripts
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'python_backend'))
 
-# Import Video Backend
-VIDEO_IMPORT_ERROR = None
-try:
-    # Import directly since we added python_backend to path
-    import video_sign
-    import video_verify
-    import image_sign
-    import image_sign
-    import image_verify
-    import pdf_sign
-    import pdf_verify
-    from job_manager import job_manager
-    VIDEO_BACKEND_AVAILABLE = True
-except ImportError as e:
-    print(f"Warning: Video backend not available: {e}")
-    VIDEO_IMPORT_ERROR = str(e)
-    VIDEO_BACKEND_AVAILABLE = False
+from job_manager import job_manager, AdmissionRejected
+
+# Media type -> (sign module, verify module). Backends pull in numpy, imageio/ffmpeg and
+# cryptography, so they are imported by bootstrap() before forking under Gunicorn, else by
+# load_backend() on the first request for their media type, never at import time.
+BACKEND_MODULES = {
+    'image/jpeg': ('image_sign', 'image_verify'),
+    'application/pdf': ('pdf_sign', 'pdf_verify'),
+    'video/mp4': ('video_sign', 'video_verify'),
+}
+
+STARTUP = {'keys_ready': False, 'warmed_backends': [], 'backend_errors': {}, 'ready_ms': None, 'snapshot': None}
+_BOOTSTRAP_LOCK = threading.Lock()
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+UPLOAD_DIR = os.path.join(BASE_DIR, 'uploads')
+# Signed media and verification artifacts, stored under their SHA-256 so URLs never change meaning
+ASSETS_DIR = os.path.join(BASE_DIR, 'assets')
+ASSET_NAME_RE = re.compile(r'^([0-9a-f]{64})(\.[a-z0-9]+)$')
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+class StreamingRequest(Request):
+    """
+    Writes multipart file parts straight to a file on the same filesystem as the job
+    inputs, so a large upload is streamed to disk once and "saving" it is a rename.
+    """
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, prefix='upload_', delete=False)
 
 app = Flask(__name__, static_folder='ui', static_url_path='')
+app.request_class = StreamingRequest
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB Limit
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 KEYS_DIR = os.path.join(BASE_DIR, 'keys')
 PRIVATE_KEY_PATH = os.path.join(KEYS_DIR, 'private_key.pem')
 PUBLIC_KEY_PATH = os.path.join(KEYS_DIR, 'public_key.pem')
 
-# Ensure Device Keys Exist on Startup
-# Priority 1: Load from Environment (Render / Production)
-if os.environ.get('PRIVATE_KEY') and os.environ.get('PUBLIC_KEY'):
+# Admin-only features (job profiling) are disabled unless this is set
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# --- BACKENDS ---
+def load_backend(mimetype):
+    """
+    The (sign, verify) modules for a media type, imported on first use. A failed import is
+    remembered, so a missing dependency costs one attempt rather than one per request.
+    """
+    error = STARTUP['backend_errors'].get(mimetype)
+    if error:
+        raise ImportError(error)
+    sign_name, verify_name = BACKEND_MODULES[mimetype]
     try:
-        Path(KEYS_DIR).mkdir(exist_ok=True)
-        # We assume the keys are passed as PEM strings in the Env Vars
-        # Newlines might need handling if they are escaped as \n
-        priv_env = os.environ['PRIVATE_KEY'].replace('\\n', '\n')
-        pub_env = os.environ['PUBLIC_KEY'].replace('\\n', '\n')
-        
-        with open(PRIVATE_KEY_PATH, "w") as f:
-            f.write(priv_env)
-        with open(PUBLIC_KEY_PATH, "w") as f:
-            f.write(pub_env)
-        print("✔ Loaded Device Keys from Environment Variables")
-    except Exception as e:
-        print(f"Failed to load keys from environment: {e}")
+        modules = importlib.import_module(sign_name), importlib.import_module(verify_name)
+    except ImportError as e:
+        STARTUP['backend_errors'][mimetype] = str(e)
+        print(f"Warning: {mimetype} backend not available: {e}")
+        raise
+    if mimetype not in STARTUP['warmed_backends']:
+        STARTUP['warmed_backends'].append(mimetype)
+    return modules
 
-# Priority 2: Generate New Keys if missing (Local Dev)
-if not os.path.exists(PRIVATE_KEY_PATH) or not os.path.exists(PUBLIC_KEY_PATH):
-    print("Generating Device Identity Keys...")
+def backend_error(mimetype):
     try:
-        from cryptography.hazmat.primitives.asymmetric import ec
-        from cryptography.hazmat.primitives import serialization
-        from pathlib import Path
-        
-        Path(KEYS_DIR).mkdir(exist_ok=True)
-        
-        private_key = ec.generate_private_key(ec.SECP256R1())
-        
-        with open(PRIVATE_KEY_PATH, "wb") as f:
-            f.write(private_key.private_bytes(
-                serialization.Encoding.PEM,
-                serialization.PrivateFormat.PKCS8,
-                serialization.NoEncryption(),
-            ))
-            
-        with open(PUBLIC_KEY_PATH, "wb") as f:
-            f.write(private_key.public_key().public_bytes(
-                serialization.Encoding.PEM,
-                serialization.PublicFormat.SubjectPublicKeyInfo,
-            ))
-        print("✔ Device Identity Created")
-    except Exception as e:
-        print(f"Failed to generate keys: {e}")
+        load_backend(mimetype)
+    except ImportError as e:
+        return str(e)
+    return None
+
+def warm_backends():
+    for mimetype in BACKEND_MODULES:
+        backend_error(mimetype)
+
+# --- STARTUP ---
+def bootstrap_keys():
+    """
+    Ensure Device Keys exist. Runs once per deployment: in the Gunicorn master before
+    workers fork, otherwise on the first request (or from __main__ for local runs).
+    """
+    # Priority 1: Load from Environment (Render / Production)
+    if os.environ.get('PRIVATE_KEY') and os.environ.get('PUBLIC_KEY'):
+        try:
+            Path(KEYS_DIR).mkdir(exist_ok=True)
+            # We assume the keys are passed as PEM strings in the Env Vars
+            # Newlines might need handling if they are escaped as \n
+            priv_env = os.environ['PRIVATE_KEY'].replace('\\n', '\n')
+            pub_env = os.environ['PUBLIC_KEY'].replace('\\n', '\n')
+
+            with open(PRIVATE_KEY_PATH, "w") as f:
+                f.write(priv_env)
+            with open(PUBLIC_KEY_PATH, "w") as f:
+                f.write(pub_env)
+            print("✔ Loaded Device Keys from Environment Variables")
+        except Exception as e:
+            print(f"Failed to load keys from environment: {e}")
+
+    # Priority 2: Generate New Keys if missing (Local Dev)
+    if not os.path.exists(PRIVATE_KEY_PATH) or not os.path.exists(PUBLIC_KEY_PATH):
+        print("Generating Device Identity Keys...")
+        try:
+            from cryptography.hazmat.primitives.asymmetric import ec
+            from cryptography.hazmat.primitives import serialization
+
+            Path(KEYS_DIR).mkdir(exist_ok=True)
+
+            private_key = ec.generate_private_key(ec.SECP256R1())
+
+            with open(PRIVATE_KEY_PATH, "wb") as f:
+                f.write(private_key.private_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PrivateFormat.PKCS8,
+                    serialization.NoEncryption(),
+                ))
+
+            with open(PUBLIC_KEY_PATH, "wb") as f:
+                f.write(private_key.public_key().public_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PublicFormat.SubjectPublicKeyInfo,
+                ))
+            print("✔ Device Identity Created")
+        except Exception as e:
+            print(f"Failed to generate keys: {e}")
+
+    STARTUP['keys_ready'] = os.path.exists(PRIVATE_KEY_PATH) and os.path.exists(PUBLIC_KEY_PATH)
+
+def bootstrap_snapshot():
+    """
+    Map the provenance snapshot (PROVENANCE_SNAPSHOT_DIR) before workers fork, so they
+    inherit the mapping instead of each opening it on their first verification.
+    """
+    try:
+        import provenance_store
+        reader = provenance_store.snapshots()
+    except (ImportError, OSError, ValueError) as e:
+        print(f"Warning: provenance snapshot not available: {e}")
+        return
+    if reader is not None:
+        STARTUP['snapshot'] = reader
+        print(f"✔ Provenance snapshot generation {reader.generation} mapped ({reader.info()['records']} records)")
+
+def bootstrap(warm=True):
+    """
+    The single startup step: keys and the snapshot first, then (optionally) backend imports.
+    Each part runs once per process, so calling it again is cheap. warm=False leaves each
+    import to the first request that needs it (requests bootstrap this way, and so does the
+    Gunicorn master with WARM_BACKENDS=0).
+    """
+    with _BOOTSTRAP_LOCK:
+        first = STARTUP['ready_ms'] is None
+        if first:
+            bootstrap_keys()
+            bootstrap_snapshot()
+        if warm:
+            warm_backends()
+        if first:
+            STARTUP['ready_ms'] = round((time.perf_counter() - _IMPORT_STARTED) * 1000, 1)
+            print(f"✔ Hemlock ready in {STARTUP['ready_ms']} ms (warmed: {', '.join(STARTUP['warmed_backends']) or 'none'})")
+
+@app.before_request
+def ensure_bootstrapped():
+    # Gunicorn bootstraps in its master before forking; `flask run`, other WSGI hosts and
+    # code importing the app (tests) bootstrap here, on their first request. Only keys and
+    # the snapshot: a backend loads with the first request for its media type, and /health
+    # answers without either
+    if STARTUP['ready_ms'] is None and request.endpoint != 'health_check':
+        bootstrap(warm=False)
 
 @app.route('/health')
 def health_check():
-    return {'status': 'alive', 'service': 'hemlock-engine'}, 200
+    health = {'status': 'alive', 'service': 'hemlock-engine', 'ready_ms': STARTUP['ready_ms']}
+    if STARTUP['snapshot'] is not None:
+        health['snapshot'] = STARTUP['snapshot'].info()
+    return health, 200
 
 @app.route('/')
 def serve_index():
@@ -89,41 +201,134 @@ def serve_index():
 
 @app.route('/provenance/<path:filename>')
 def serve_provenance(filename):
-    return send_from_directory('provenance', filename)
+    return send_from_directory('provenance', filename, mimetype=guess_mimetype(filename))
 
-@app.route('/input/<path:filename>')
-def serve_input(filename):
-    # Determine mimetype based on extension
-    ext = os.path.splitext(filename)[1].lower()
-    mimetype = 'application/octet-stream'
-    if ext in ['.jpg', '.jpeg', '.png']:
-        mimetype = 'image/jpeg'
-    elif ext in ['.mp4', '.mov']:
-        mimetype = 'video/mp4'
-    return send_from_directory('.', filename, mimetype=mimetype)
+@app.route('/assets/<name>')
+def serve_asset(name):
+    """
+    Content-addressed delivery: the name is the file's SHA-256, so the strong ETag is free
+    and responses can be cached forever by browsers and the CDN. Range and If-None-Match
+    requests are answered by send_file's conditional handling.
+    """
+    match = ASSET_NAME_RE.match(name)
+    if not match:
+        return {'error': 'Asset not found'}, 404
+    path = os.path.join(ASSETS_DIR, name)
+    if not os.path.exists(path):
+        return {'error': 'Asset not found'}, 404
+
+    response = send_file(path, mimetype=guess_mimetype(name), conditional=True,
+                         etag=match.group(1), max_age=ASSET_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+# --- ASSET HELPERS ---
+def guess_mimetype(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def publish_asset(path):
+    """
+    Move a finished file into the content-addressed store and return its URL.
+    """
+    digest = file_sha256(path)
+    ext = os.path.splitext(path)[1].lower()
+    os.makedirs(ASSETS_DIR, exist_ok=True)
+    dest = os.path.join(ASSETS_DIR, f"{digest}{ext}")
+    if os.path.exists(dest):
+        os.remove(path)  # Identical content is already published
+    else:
+        os.replace(path, dest)
+    return f"/assets/{digest}{ext}"
+
+# --- UPLOAD HELPERS ---
+def save_upload(file, input_path):
+    stream_path = getattr(file.stream, 'name', None)
+    if isinstance(stream_path, str) and os.path.dirname(stream_path) == UPLOAD_DIR:
+        file.stream.close()
+        os.replace(stream_path, input_path)
+    else:
+        file.save(input_path)
+
+@app.teardown_request
+def cleanup_uploads(exc):
+    # Only look at files the request actually parsed; touching request.files here would parse the body
+    files = request.__dict__.get('files')
+    if not files:
+        return
+    for file in files.values():
+        stream_path = getattr(file.stream, 'name', None)
+        if isinstance(stream_path, str) and os.path.dirname(stream_path) == UPLOAD_DIR:
+            file.stream.close()
+            if os.path.exists(stream_path):
+                os.remove(stream_path)
 
 # --- JOB HELPERS ---
-def process_protect_async(input_path, mimetype):
+def process_protect_async(input_path, mimetype, perturb=False, checkpoint=None):
     try:
-        if mimetype == 'image/jpeg':
-             image_sign.sign_image(input_path)
-        elif mimetype == 'application/pdf':
-             pdf_sign.sign_pdf(input_path)
+        sign_module, _ = load_backend(mimetype)
+        preview_path = None
+        if mimetype == 'application/pdf':
+             sign_module.sign_pdf(input_path, checkpoint=checkpoint)
+             output_path = input_path
         else:
-             video_sign.sign_video(input_path)
-        return {"file_path": input_path, "mimetype": mimetype}
+             # Perturbed media is re-encoded losslessly (PNG / RGB H.264 .mkv) and that copy is published
+             output_path = sign_module.protected_path(input_path) if perturb else input_path
+             sign = sign_module.sign_image if mimetype == 'image/jpeg' else sign_module.sign_video
+             sign(input_path, checkpoint=checkpoint, perturb=perturb, output_path=output_path if perturb else None)
+             if perturb:
+                 os.remove(input_path)
+                 if mimetype == 'video/mp4':
+                     from perturb import write_preview, PREVIEW_EXT
+                     preview_path = write_preview(output_path, os.path.splitext(output_path)[0] + PREVIEW_EXT)
+        asset_url = publish_asset(output_path)
+        result = {"file_path": os.path.join(ASSETS_DIR, os.path.basename(asset_url)), "mimetype": mimetype, "asset_url": asset_url}
+        if preview_path is not None:
+            # Browsers can't play the signed .mkv; the preview is for viewing only and does not verify
+            result["preview_url"] = publish_asset(preview_path)
+        return result
     except Exception as e:
         raise e
 
-def process_verify_async(input_path, mimetype, verify_key_path):
+def process_verify_async(input_path, mimetype, verify_key_path, mode="full", checkpoint=None):
+    # JobCancelled is a BaseException, so cancellation passes through the handler below
+    # Each job gets its own evidence directory, so concurrent verifications never overwrite
+    # (or publish) each other's tamper maps and overlays
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    evidence_dir = tempfile.mkdtemp(dir=UPLOAD_DIR, prefix='evidence_')
     try:
+        _, verify_module = load_backend(mimetype)
         if mimetype == 'image/jpeg':
-            report = image_verify.verify_image(input_path, public_key_path=verify_key_path)
+            report = verify_module.verify_image(input_path, public_key_path=verify_key_path, checkpoint=checkpoint,
+                                                evidence_dir=evidence_dir)
         elif mimetype == 'application/pdf':
-            report = pdf_verify.verify_pdf(input_path, public_key_path=verify_key_path)
+            report = verify_module.verify_pdf(input_path, public_key_path=verify_key_path, checkpoint=checkpoint)
         else:
-            report = video_verify.verify_video(input_path, public_key_path=verify_key_path)
+            report = verify_module.verify_video(input_path, public_key_path=verify_key_path, mode=mode,
+                                                checkpoint=checkpoint, evidence_dir=evidence_dir)
         
+        # Publish each piece of visual evidence under its own hash. A video's mismatch overlay is
+        # its first range's thumbnail, so one file can be named twice
+        published = {}
+        def evidence_url(path):
+            if path not in published and os.path.exists(path):
+                published[path] = publish_asset(path)
+            return published.get(path)
+
+        for field in ('tamper_map', 'mismatch_overlay'):
+            if report.get(field) and evidence_url(report[field]):
+                report[f'{field}_url'] = evidence_url(report[field])
+        for tampered in report.get('tampered_ranges') or []:
+            if tampered.get('overlay') and evidence_url(tampered['overlay']):
+                tampered['overlay_url'] = evidence_url(tampered['overlay'])
+
         status = report.get('status', 'UNKNOWN')
         if status == "FAILED":
              status = "TAMPERED"
@@ -132,16 +337,89 @@ def process_verify_async(input_path, mimetype, verify_key_path):
     except Exception as e:
         # Return a structure similar to success but with error status
         return {'status': 'TAMPERED', 'details': str(e)}
+    finally:
+        shutil.rmtree(evidence_dir, ignore_errors=True)
 
 @app.route('/api/jobs/<job_id>', methods=['GET'])
 def get_job_status(job_id):
     job = job_manager.get_job(job_id)
     if not job:
         return {'error': 'Job not found'}, 404
+    job = dict(job)
+    profile = job.pop('profile', None)
+    # Profiles expose server internals, so only admins see them
+    if is_admin():
+        if profile:
+            job['profile'] = {key: value for key, value in profile.items() if key != 'artifact'}
+            if profile.get('artifact'):
+                job['profile']['artifact_url'] = f'/api/jobs/{job_id}/profile'
+    else:
+        job.pop('profiled', None)
     return job
 
+@app.route('/api/jobs/<job_id>/profile', methods=['GET'])
+def get_job_profile(job_id):
+    if not is_admin():
+        return {'error': 'Admin token required'}, 403
+    job = job_manager.get_job(job_id)
+    artifact = (job or {}).get('profile', {}).get('artifact')
+    if not artifact or not os.path.exists(artifact):
+        return {'error': 'Profile not found'}, 404
+    # .collapsed stacks are text for flamegraph tools; .prof is a binary pstats dump
+    mimetype = 'text/plain' if artifact.endswith('.collapsed') else 'application/octet-stream'
+    return send_file(artifact, mimetype=mimetype, as_attachment=True)
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    status = job_manager.cancel_job(job_id)
+    if status is None:
+        return {'error': 'Job not found'}, 404
+    return {'job_id': job_id, 'status': status}
+
+def busy_response(rejection, *paths):
+    # Nothing was queued, so drop whatever this request already wrote to disk
+    for path in paths:
+        if path and path != PUBLIC_KEY_PATH and os.path.exists(path):
+            os.remove(path)
+    return ({'error': 'Server busy, try again later', 'retry_after': rejection.retry_after}, 429,
+            {'Retry-After': str(rejection.retry_after)})
+
+def is_admin():
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+def profiling_requested():
+    return request.values.get('profile', '').lower() in ('1', 'true', 'yes')
+
+def requested_deadline():
+    """
+    Optional `deadline` form field in seconds. Raises ValueError unless it is finite and positive.
+    """
+    if not request.form.get('deadline'):
+        return None
+    deadline = float(request.form['deadline'])
+    if not math.isfinite(deadline) or deadline <= 0:
+        raise ValueError(f"invalid deadline {request.form['deadline']!r}")
+    return deadline
+
+def bad_deadline_response():
+    return {'error': 'deadline must be a positive number of seconds'}, 400
+
+def perturb_requested():
+    # Uploads are signed unchanged unless `perturb=1` asks for keyed noise
+    return request.form.get('perturb', '0').lower() in ('1', 'true', 'yes')
+
 @app.route('/api/protect', methods=['POST'])
 def protect_media():
+    # Refuse before reading the upload body when the queue is already backed up
+    try:
+        job_manager.check_admission()
+    except AdmissionRejected as e:
+        return busy_response(e)
+
+    if profiling_requested() and not is_admin():
+        return {'error': 'Profiling requires a valid X-Admin-Token'}, 403
+
     if 'file' not in request.files:
         return {'error': 'No file part'}, 400
     
@@ -164,9 +442,15 @@ def protect_media():
     if mimetype is None:
         return {'error': 'Unsupported file type'}, 400 
 
-    if not VIDEO_BACKEND_AVAILABLE:
-        return {'error': 'Backend not available', 'details': VIDEO_IMPORT_ERROR}, 501
-        
+    import_error = backend_error(mimetype)
+    if import_error:
+        return {'error': 'Backend not available', 'details': import_error}, 501
+
+    try:
+        deadline = requested_deadline()
+    except ValueError:
+        return bad_deadline_response()
+
     # Save input
     input_path = os.path.join(BASE_DIR, f'input{ext}')
     
@@ -177,14 +461,29 @@ def protect_media():
     unique_filename = f"input_{uuid.uuid4().hex}{ext}"
     input_path = os.path.join(BASE_DIR, unique_filename)
     
-    file.save(input_path)
+    save_upload(file, input_path)
     
     # Submit Job
-    job_id = job_manager.submit_job(process_protect_async, input_path, mimetype)
-    return {"job_id": job_id, "input_path": unique_filename}
+    try:
+        job_id = job_manager.submit_job(process_protect_async, input_path, mimetype, perturb_requested(),
+                                        kind=mimetype, size=os.path.getsize(input_path), deadline=deadline,
+                                        profile=profiling_requested())
+    except AdmissionRejected as e:
+        return busy_response(e, input_path)
+    # The upload is moved into the asset store when the job finishes; its asset_url is the only link to it
+    return {"job_id": job_id}
 
 @app.route('/api/verify', methods=['POST'])
 def verify_media():
+    # Refuse before reading the upload body when the queue is already backed up
+    try:
+        job_manager.check_admission()
+    except AdmissionRejected as e:
+        return busy_response(e)
+
+    if profiling_requested() and not is_admin():
+        return {'error': 'Profiling requires a valid X-Admin-Token'}, 403
+
     if 'file' not in request.files:
         return {'error': 'No file part'}, 400
     
@@ -194,12 +493,6 @@ def verify_media():
     
     filename = file.filename
     ext = os.path.splitext(filename)[1].lower()
-    # Handles...
-    import uuid
-    unique_filename = f"verify_{uuid.uuid4().hex}{ext}"
-    input_path = os.path.join(BASE_DIR, unique_filename)
-    file.save(input_path)
-
     mimetype = None
     if ext in ['.jpg', '.jpeg', '.png']:
         mimetype = 'image/jpeg'
@@ -213,8 +506,20 @@ def verify_media():
         # Better to error.
         return {'error': 'Unsupported file type'}, 400
 
-    if not VIDEO_BACKEND_AVAILABLE:
-        return {'error': 'Backend not available', 'details': VIDEO_IMPORT_ERROR}, 501
+    import_error = backend_error(mimetype)
+    if import_error:
+        return {'error': 'Backend not available', 'details': import_error}, 501
+
+    try:
+        deadline = requested_deadline()
+    except ValueError:
+        return bad_deadline_response()
+
+    # Handles...
+    import uuid
+    unique_filename = f"verify_{uuid.uuid4().hex}{ext}"
+    input_path = os.path.join(BASE_DIR, unique_filename)
+    save_upload(file, input_path)
 
     # Submit Job
     # Check key
@@ -227,7 +532,15 @@ def verify_media():
                  f.write(user_key)
              final_key_path = temp_key_path
 
-    job_id = job_manager.submit_job(process_verify_async, input_path, mimetype, final_key_path)
+    # Videos can be triaged with a sampled check instead of a full decode
+    mode = 'quick' if request.form.get('mode') == 'quick' else 'full'
+
+    try:
+        job_id = job_manager.submit_job(process_verify_async, input_path, mimetype, final_key_path, mode,
+                                        kind=mimetype, size=os.path.getsize(input_path),
+                                        deadline=deadline, profile=profiling_requested())
+    except AdmissionRejected as e:
+        return busy_response(e, input_path, final_key_path)
     return {"job_id": job_id}
 
 @app.route('/api/public-key')
@@ -241,5 +554,6 @@ def get_public_key():
     return {'key': '-----BEGIN PUBLIC KEY-----\nNo Key Generated Yet\n-----END PUBLIC KEY-----'}
 
 if __name__ == '__main__':
+    bootstrap()
     print("Starting Hemlock Server on http://localhost:5000")
     app.run(debug=True, port=5000)
@@ -0,0 +1,111 @@
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Same layout server.py and bulk.py set up: the root modules plus the flat backend modules
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "python_backend"))
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    The backends read keys/ and write provenance/ relative to the working directory.
+    """
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def private_key(workdir):
+    """
+    A fresh device identity, also written to keys/ for code that loads it from disk.
+    """
+    from cryptography.hazmat.primitives.asymmetric import ec
+    from cryptography.hazmat.primitives import serialization
+
+    key = ec.generate_private_key(ec.SECP256R1())
+    os.makedirs("keys")
+    with open("keys/private_key.pem", "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    with open("keys/public_key.pem", "wb") as f:
+        f.write(key.public_key().public_bytes(serialization.Encoding.PEM,
+                                              serialization.PublicFormat.SubjectPublicKeyInfo))
+    return key
+
+
+@pytest.fixture
+def public_key(private_key):
+    return private_key.public_key()
+
+
+def random_frames(count, height=48, width=64, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (count, height, width, 3), dtype=np.uint8)
+
+
+def random_image(height=96, width=128, seed=0):
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+@pytest.fixture
+def write_video():
+    """
+    Writes frames as lossless RGB H.264, so decoding returns exactly the frames written.
+    """
+    import imageio.v3 as iio
+    pytest.importorskip("imageio_ffmpeg")
+
+    def write(path, frames, fps=10):
+        iio.imwrite(str(path), np.asarray(frames), fps=fps, codec="libx264rgb", pixelformat="rgb24",
+                    macro_block_size=1, output_params=["-qp", "0", "-preset", "ultrafast"])
+        return str(path)
+
+    return write
+
+
+@pytest.fixture
+def write_image():
+    import imageio.v3 as iio
+
+    def write(path, image):
+        iio.imwrite(str(path), image)
+        return str(path)
+
+    return write
+
+
+@pytest.fixture
+def server_app(private_key, workdir, monkeypatch):
+    """
+    server.py with every path it writes moved into the temporary working directory and a
+    fresh JobManager, returned as (module, Flask test client).
+    """
+    import server
+    from job_manager import JobManager
+
+    monkeypatch.setattr(server, "BASE_DIR", str(workdir))
+    monkeypatch.setattr(server, "UPLOAD_DIR", str(workdir / "uploads"))
+    monkeypatch.setattr(server, "ASSETS_DIR", str(workdir / "assets"))
+    monkeypatch.setattr(server, "KEYS_DIR", str(workdir / "keys"))
+    monkeypatch.setattr(server, "PRIVATE_KEY_PATH", str(workdir / "keys" / "private_key.pem"))
+    monkeypatch.setattr(server, "PUBLIC_KEY_PATH", str(workdir / "keys" / "public_key.pem"))
+    monkeypatch.setattr(server, "job_manager", JobManager(max_workers=1))
+    # Not bootstrapped yet, as in a freshly imported app
+    monkeypatch.setattr(server, "STARTUP", {"keys_ready": False, "warmed_backends": [], "backend_errors": {},
+                                            "ready_ms": None, "snapshot": None})
+    return server, server.app.test_client()
+
+
+def wait_for_job(client, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").get_json()
+        if job["status"] in ("done", "failed", "cancelled"):
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"Job {job_id} did not finish within {timeout}s")
@@ -0,0 +1,102 @@
+import io
+import os
+import hashlib
+import threading
+
+from conftest import random_image, wait_for_job
+
+
+def test_published_asset_is_content_addressed(server_app, workdir):
+    server, _ = server_app
+    path = workdir / "result.pdf"
+    path.write_bytes(b"%PDF-1.4 signed")
+
+    url = server.publish_asset(str(path))
+    assert url == f"/assets/{hashlib.sha256(b'%PDF-1.4 signed').hexdigest()}.pdf"
+    assert not path.exists()
+
+    # Publishing identical content again reuses the existing asset
+    path.write_bytes(b"%PDF-1.4 signed")
+    assert server.publish_asset(str(path)) == url
+    assert not path.exists()
+
+
+def test_assets_have_strong_etags_and_ranges(server_app, workdir):
+    server, client = server_app
+    path = workdir / "result.pdf"
+    path.write_bytes(b"0123456789")
+    url = server.publish_asset(str(path))
+    digest = os.path.basename(url).split(".")[0]
+
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.headers["ETag"] == f'"{digest}"'
+    assert "immutable" in response.headers["Cache-Control"]
+
+    assert client.get(url, headers={"If-None-Match": f'"{digest}"'}).status_code == 304
+
+    partial = client.get(url, headers={"Range": "bytes=2-4"})
+    assert partial.status_code == 206
+    assert partial.data == b"234"
+
+
+def test_unknown_or_malformed_assets_are_404(server_app):
+    _, client = server_app
+    assert client.get("/assets/" + "0" * 64 + ".png").status_code == 404
+    assert client.get("/assets/..%2Fkeys%2Fprivate_key.pem").status_code == 404
+
+
+def test_protect_result_is_only_reachable_by_asset_url(server_app):
+    server, client = server_app
+    response = client.post("/api/protect", data={"file": (io.BytesIO(b"%PDF-1.4\n"), "doc.pdf")},
+                           content_type="multipart/form-data")
+    submitted = response.get_json()
+    assert "input_path" not in submitted
+
+    job = wait_for_job(client, submitted["job_id"])
+    assert job["status"] == "done"
+    asset = client.get(job["result"]["asset_url"])
+    assert asset.status_code == 200
+    assert asset.data.startswith(b"%PDF-1.4")
+
+    # No input_<id> files are left behind, and the project root is not served
+    assert not [name for name in os.listdir(server.BASE_DIR) if name.startswith("input_")]
+    assert client.get("/input/keys/private_key.pem").status_code == 404
+
+
+def test_concurrent_verifications_publish_their_own_evidence(server_app, workdir, write_image, monkeypatch):
+    import image_verify
+    from image_sign import sign_image
+    from job_manager import JobManager
+
+    server, client = server_app
+    monkeypatch.setattr(server, "job_manager", JobManager(max_workers=2))
+    uploads = []
+    for seed, rows in ((1, slice(0, 16)), (2, slice(-16, None))):
+        image = random_image(seed=seed)
+        path = write_image(workdir / f"photo_{seed}.png", image)
+        sign_image(path)
+        image[rows] = 255 - image[rows]
+        write_image(path, image)
+        uploads.append(path)
+
+    # Both jobs have written their tamper maps before either publishes
+    both_written = threading.Barrier(2, timeout=10)
+    real_verify_image = image_verify.verify_image
+
+    def verify_image(*args, **kwargs):
+        report = real_verify_image(*args, **kwargs)
+        both_written.wait()
+        return report
+    monkeypatch.setattr(image_verify, "verify_image", verify_image)
+
+    job_ids = []
+    for path in uploads:
+        with open(path, "rb") as f:
+            data = {"file": (io.BytesIO(f.read()), os.path.basename(path))}
+        job_ids.append(client.post("/api/verify", data=data, content_type="multipart/form-data").get_json()["job_id"])
+    urls = [wait_for_job(client, job_id)["result"]["details"].get("tamper_map_url") for job_id in job_ids]
+
+    assert all(urls) and urls[0] != urls[1]
+    assert not [name for name in os.listdir(server.UPLOAD_DIR) if name.startswith("evidence_")]
+    assert not os.path.exists(workdir / "provenance" / "tamper_map.png")
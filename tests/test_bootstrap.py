@@ -0,0 +1,88 @@
+import io
+import os
+import sys
+from types import SimpleNamespace
+
+import imageio.v3 as iio
+
+from conftest import random_image, wait_for_job
+
+
+def test_first_request_bootstraps_keys_but_not_backends(server_app, workdir):
+    server, client = server_app
+    for name in os.listdir(workdir / "keys"):
+        os.remove(workdir / "keys" / name)
+
+    response = client.get("/api/public-key")
+    assert response.status_code == 200
+    assert "BEGIN PUBLIC KEY" in response.get_json()["key"]
+    assert server.STARTUP["ready_ms"] is not None
+    assert server.STARTUP["keys_ready"]
+    assert server.STARTUP["warmed_backends"] == []
+
+
+def test_health_stays_off_the_bootstrap_path(server_app, workdir):
+    server, client = server_app
+    for name in os.listdir(workdir / "keys"):
+        os.remove(workdir / "keys" / name)
+
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.get_json()["ready_ms"] is None
+    assert not os.path.exists(server.PRIVATE_KEY_PATH)
+
+
+def test_bootstrap_is_idempotent(server_app):
+    server, client = server_app
+    server.bootstrap()
+    with open(server.PRIVATE_KEY_PATH, "rb") as f:
+        key = f.read()
+    ready_ms = server.STARTUP["ready_ms"]
+
+    server.bootstrap()
+    client.get("/health")
+    with open(server.PRIVATE_KEY_PATH, "rb") as f:
+        assert f.read() == key
+    assert server.STARTUP["ready_ms"] == ready_ms
+    assert len(server.STARTUP["warmed_backends"]) == len(server.BACKEND_MODULES)
+
+
+def test_cold_image_request_imports_only_the_image_backend(server_app, monkeypatch):
+    server, client = server_app
+    others = ["video_sign", "video_verify", "pdf_sign", "pdf_verify"]
+    for name in others:
+        monkeypatch.delitem(sys.modules, name, raising=False)
+
+    upload = {"file": (io.BytesIO(iio.imwrite("<bytes>", random_image(), extension=".png")), "photo.png")}
+    response = client.post("/api/protect", data=upload, content_type="multipart/form-data")
+    assert wait_for_job(client, response.get_json()["job_id"])["status"] == "done"
+    assert server.STARTUP["warmed_backends"] == ["image/jpeg"]
+    assert not [name for name in others if name in sys.modules]
+
+
+def test_failed_backend_import_is_not_retried(server_app, monkeypatch):
+    server, client = server_app
+    attempts = []
+
+    def import_module(name):
+        attempts.append(name)
+        raise ImportError(f"No module named '{name}'")
+    monkeypatch.setattr(server, "importlib", SimpleNamespace(import_module=import_module))
+
+    for _ in range(2):
+        response = client.post("/api/protect", data={"file": (io.BytesIO(b"%PDF-1.4\n"), "doc.pdf")},
+                               content_type="multipart/form-data")
+        assert response.status_code == 501
+        assert "pdf_sign" in response.get_json()["details"]
+    assert attempts == ["pdf_sign"]
+
+
+def test_unavailable_backend_disables_only_its_media_type(server_app):
+    server, client = server_app
+    server.bootstrap()
+    server.STARTUP["backend_errors"]["video/mp4"] = "No module named 'imageio'"
+
+    response = client.post("/api/protect", data={"file": (io.BytesIO(b"data"), "clip.mp4")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 501
+    assert "imageio" in response.get_json()["details"]
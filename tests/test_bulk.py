@@ -0,0 +1,73 @@
+import json
+import sys
+
+import pytest
+
+import bulk
+from conftest import random_frames, random_image
+
+
+def run_bulk(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["bulk.py", *argv, "--jobs", "2"])
+    bulk.main()
+
+
+def read_results(path):
+    with open(path) as f:
+        return {json.loads(line)["file"]: json.loads(line) for line in f}
+
+
+@pytest.fixture
+def tree(workdir, write_image, write_video):
+    (workdir / "archive" / "nested").mkdir(parents=True)
+    write_image(workdir / "archive" / "a.png", random_image(seed=1))
+    write_image(workdir / "archive" / "nested" / "b.png", random_image(seed=2))
+    write_video(workdir / "archive" / "nested" / "clip.mkv", random_frames(4))
+    (workdir / "archive" / "notes.txt").write_text("not media")
+    return workdir / "archive"
+
+
+def test_iter_media_walks_tree_and_skips_provenance(tree):
+    (tree / "provenance").mkdir()
+    (tree / "provenance" / "map.png").write_bytes(b"")
+    names = [path[len(str(tree)) + 1:] for path in bulk.iter_media([str(tree)], str(tree / "provenance"))]
+    assert names == ["a.png", "nested/b.png", "nested/clip.mkv"]
+
+
+def test_sign_then_verify_tree(private_key, tree, monkeypatch):
+    run_bulk(monkeypatch, "sign", str(tree))
+    signed = read_results("bulk_sign.jsonl")
+    assert len(signed) == 3
+    assert {entry["status"] for entry in signed.values()} == {"SIGNED"}
+
+    run_bulk(monkeypatch, "verify", str(tree))
+    verified = read_results("bulk_verify.jsonl")
+    assert {entry["status"] for entry in verified.values()} == {"VERIFIED"}
+
+
+def test_rerun_resumes_from_checkpoint(private_key, tree, monkeypatch):
+    run_bulk(monkeypatch, "sign", str(tree))
+    run_bulk(monkeypatch, "sign", str(tree))
+    # Nothing was signed twice
+    with open("bulk_sign.jsonl") as f:
+        assert len(f.readlines()) == 3
+
+
+def test_verify_flags_tampered_video(private_key, tree, monkeypatch, write_video):
+    run_bulk(monkeypatch, "sign", str(tree))
+    frames = random_frames(4)
+    frames[2] = 255 - frames[2]
+    write_video(tree / "nested" / "clip.mkv", frames)
+
+    run_bulk(monkeypatch, "verify", str(tree), "--output", "out.jsonl", "--checkpoint", "out.checkpoint")
+    entry = read_results("out.jsonl")[str(tree / "nested" / "clip.mkv")]
+    assert entry["status"] == "FAILED"
+    assert entry["report"]["tampered_ranges"] == [{"start": 2, "end": 2, "frames": 1, "kind": "modified"}]
+
+
+def test_unknown_alg_is_rejected_at_parse_time(tree, monkeypatch, capsys):
+    monkeypatch.setattr(sys, "argv", ["bulk.py", "sign", str(tree), "--alg", "sha265"])
+    with pytest.raises(SystemExit) as exc:
+        bulk.main()
+    assert exc.value.code == 2
+    assert "invalid choice" in capsys.readouterr().err
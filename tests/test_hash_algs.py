@@ -0,0 +1,60 @@
+import hashlib
+
+import pytest
+
+from conftest import random_image
+from video_utils import (content_hash, chained_hash, frame_index_message, new_hasher,
+                         SUPPORTED_ALGS, DEFAULT_ALG, LEGACY_ALG, DIGEST_SIZE, blake3)
+
+
+def test_default_alg_is_supported_and_legacy_is_sha256():
+    assert DEFAULT_ALG in SUPPORTED_ALGS
+    assert LEGACY_ALG == "sha256"
+
+
+@pytest.mark.parametrize("alg", SUPPORTED_ALGS)
+def test_every_alg_produces_fixed_size_digests(alg):
+    assert len(content_hash(b"frame", alg)) == DIGEST_SIZE
+    assert len(chained_hash(b"frame", b"\x00" * DIGEST_SIZE, alg)) == DIGEST_SIZE
+
+
+def test_sha256_matches_legacy_records():
+    assert content_hash(b"frame") == hashlib.sha256(b"frame").digest()
+    assert chained_hash(b"frame", b"prev") == hashlib.sha256(b"frameprev").digest()
+
+
+def test_algs_are_not_interchangeable():
+    assert content_hash(b"frame", "sha256") != content_hash(b"frame", "blake2b")
+
+
+def test_unknown_alg_is_rejected():
+    with pytest.raises(ValueError):
+        new_hasher("md5")
+
+
+@pytest.mark.skipif(blake3 is not None, reason="blake3 is installed")
+def test_blake3_without_package_is_rejected():
+    with pytest.raises(ValueError, match="blake3"):
+        content_hash(b"frame", "blake3")
+
+
+def test_frame_index_message_binds_alg_and_count():
+    digests = content_hash(b"a") + content_hash(b"b")
+    assert frame_index_message("sha256", digests) != frame_index_message("blake2b", digests)
+    assert frame_index_message("sha256", digests) != frame_index_message("sha256", digests[:DIGEST_SIZE])
+
+
+@pytest.mark.parametrize("alg", SUPPORTED_ALGS)
+def test_image_signed_with_any_alg_verifies(alg, private_key, write_image, workdir):
+    from image_sign import sign_image
+    from image_verify import verify_image
+    from provenance_record import ProvenanceRecord
+
+    path = write_image(workdir / "photo.png", random_image())
+    record_path = sign_image(path, alg=alg)
+    with open(record_path, "rb") as f:
+        assert ProvenanceRecord.from_bytes(f.read()).alg == alg
+
+    report = verify_image(path)
+    assert report["status"] == "VERIFIED"
+    assert report["hash_alg"] == alg
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from conftest import random_image
+from image_stream import open_strips, hash_image_blocks, grid_edges, STRIP_ROWS
+from video_utils import content_hash
+import image_stream
+
+
+def whole_image_digests(image, grid_rows, grid_cols, alg):
+    rows = grid_edges(image.shape[0], grid_rows)
+    cols = grid_edges(image.shape[1], grid_cols)
+    return [content_hash(image[y1:y2, x1:x2].tobytes(), alg)
+            for y1, y2 in zip(rows, rows[1:]) for x1, x2 in zip(cols, cols[1:])]
+
+
+def test_grid_edges_put_remainder_in_last_block():
+    assert grid_edges(10, 3) == [0, 3, 6, 10]
+
+
+@pytest.mark.parametrize("streamed", [True, False])
+def test_block_digests_match_whole_image_hashing(streamed, write_image, workdir, monkeypatch):
+    if streamed:
+        pytest.importorskip("pyvips")
+    else:
+        monkeypatch.setattr(image_stream, "pyvips", None)
+
+    image = random_image(height=STRIP_ROWS * 2 + 37, width=101)
+    path = write_image(workdir / "big.png", image)
+
+    digests, _ = hash_image_blocks(path, 8, 8, "blake2b")
+    assert digests == whole_image_digests(image, 8, 8, "blake2b")
+
+
+def test_large_png_is_decoded_in_strips(write_image, workdir):
+    pytest.importorskip("pyvips")
+    image = random_image(height=STRIP_ROWS * 3 + 5, width=64)
+    path = write_image(workdir / "big.png", image)
+
+    h, w, strips = open_strips(path)
+    assert (h, w) == image.shape[:2]
+    starts = []
+    for y, strip in strips:
+        assert strip.shape[0] <= STRIP_ROWS
+        assert np.array_equal(strip, image[y:y + strip.shape[0]])
+        starts.append(y)
+    assert starts == [0, STRIP_ROWS, 2 * STRIP_ROWS, 3 * STRIP_ROWS]
+
+
+def test_rgba_images_hash_their_rgb_channels(write_image, workdir):
+    rgb = random_image()
+    rgba = np.dstack([rgb, np.full(rgb.shape[:2], 128, dtype=np.uint8)])
+    path = write_image(workdir / "alpha.png", rgba)
+
+    digests, _ = hash_image_blocks(path, 4, 4, "sha256")
+    assert digests == whole_image_digests(rgb, 4, 4, "sha256")
+
+
+def test_preview_is_decimated(workdir, write_image, monkeypatch):
+    monkeypatch.setattr(image_stream, "PREVIEW_MAX_DIM", 50)
+    image = random_image(height=120, width=80)
+    path = write_image(workdir / "photo.png", image)
+
+    _, preview = hash_image_blocks(path, 8, 8, with_preview=True)
+    assert preview["step"] == 3
+    assert np.array_equal(preview["image"], image[::3, ::3])
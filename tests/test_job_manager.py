@@ -0,0 +1,169 @@
+import io
+import os
+import math
+import threading
+import time
+
+import pytest
+
+from job_manager import JobManager, JobCancelled, AdmissionRejected
+
+
+def wait_until_finished(manager, job_id, timeout=10):
+    deadline = time.time() + timeout
+    while manager.get_job(job_id)["status"] in ("queued", "processing"):
+        assert time.time() < deadline, "job did not finish"
+        time.sleep(0.01)
+    return manager.get_job(job_id)
+
+
+def looping_task(started=None, checkpoint=None):
+    if started is not None:
+        started.set()
+    while True:
+        checkpoint()
+        time.sleep(0.005)
+
+
+def test_job_result_and_timestamps():
+    manager = JobManager()
+    job = wait_until_finished(manager, manager.submit_job(lambda x, checkpoint: x * 2, 21))
+    assert job["status"] == "done"
+    assert job["result"] == 42
+    assert job["submitted_at"] <= job["started_at"] <= job["finished_at"]
+
+
+def test_running_job_stops_at_its_deadline():
+    manager = JobManager()
+    job = wait_until_finished(manager, manager.submit_job(looping_task, deadline=0.05))
+    assert job["status"] == "failed"
+    assert "Deadline exceeded" in job["error"]
+
+
+def test_requested_deadline_cannot_exceed_default():
+    manager = JobManager(default_deadline=5)
+    job_id = manager.submit_job(lambda checkpoint: None, deadline=1000)
+    job = manager.get_job(job_id)
+    assert job["deadline_at"] - job["submitted_at"] == pytest.approx(5)
+
+
+@pytest.mark.parametrize("deadline", [math.nan, math.inf, -math.inf, 0, -1])
+def test_invalid_deadlines_are_rejected(deadline):
+    manager = JobManager()
+    with pytest.raises(ValueError):
+        manager.submit_job(lambda checkpoint: None, deadline=deadline)
+    assert manager.jobs == {}
+
+
+def test_cancel_running_job_at_next_checkpoint():
+    manager = JobManager()
+    started = threading.Event()
+    job_id = manager.submit_job(looping_task, started)
+    assert started.wait(5)
+
+    assert manager.cancel_job(job_id) == "processing"
+    job = wait_until_finished(manager, job_id)
+    assert job["status"] == "cancelled"
+    assert manager.cancel_job("missing") is None
+
+
+def test_cancel_queued_job_never_runs_it():
+    manager = JobManager(max_workers=1)
+    started = threading.Event()
+    blocker = manager.submit_job(looping_task, started)
+    assert started.wait(5)
+
+    ran = []
+    queued = manager.submit_job(lambda checkpoint: ran.append(True))
+    assert manager.cancel_job(queued) == "cancelled"
+    manager.cancel_job(blocker)
+    wait_until_finished(manager, blocker)
+    manager.executor.shutdown(wait=True)
+    assert ran == []
+    assert manager.get_job(queued)["status"] == "cancelled"
+
+
+def test_cancellation_is_not_swallowed_by_broad_handlers():
+    assert not issubclass(JobCancelled, Exception)
+
+
+def test_admission_rejects_when_projected_wait_is_too_long():
+    manager = JobManager(max_queue_wait=10)
+    started = threading.Event()
+    # 2s/MB video estimate: a 20 MB upload projects ~40s of work
+    blocker = manager.submit_job(looping_task, started, kind="video/mp4", size=20 * 1024 * 1024)
+    assert started.wait(5)
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        manager.check_admission()
+    assert rejected.value.retry_after >= 1
+    with pytest.raises(AdmissionRejected):
+        manager.submit_job(lambda checkpoint: None, kind="image/jpeg", size=1024)
+
+    manager.cancel_job(blocker)
+    wait_until_finished(manager, blocker)
+    manager.check_admission()
+
+
+@pytest.mark.parametrize("deadline", ["nan", "inf", "-inf", "0", "-5", "soon"])
+def test_server_rejects_invalid_deadlines(server_app, deadline):
+    server, client = server_app
+    for route, name in (("/api/protect", "doc.pdf"), ("/api/verify", "doc.pdf")):
+        response = client.post(route, data={"file": (io.BytesIO(b"%PDF-1.4\n"), name), "deadline": deadline},
+                               content_type="multipart/form-data")
+        assert response.status_code == 400
+    assert server.job_manager.jobs == {}
+
+
+def test_server_passes_valid_deadline(server_app):
+    server, client = server_app
+    response = client.post("/api/protect", data={"file": (io.BytesIO(b"%PDF-1.4\n"), "doc.pdf"), "deadline": "2.5"},
+                           content_type="multipart/form-data")
+    job = server.job_manager.get_job(response.get_json()["job_id"])
+    assert job["deadline_at"] - job["submitted_at"] == pytest.approx(2.5)
+
+
+def test_other_workers_see_job_status(tmp_path):
+    accepting = JobManager(state_dir=str(tmp_path))
+    polled = JobManager(state_dir=str(tmp_path))
+
+    job_id = accepting.submit_job(lambda x, checkpoint: {"value": x}, 7)
+    job = wait_until_finished(polled, job_id)
+    assert job["status"] == "done"
+    assert job["result"] == {"value": 7}
+    assert "cancel_requested" not in job
+
+
+def test_other_workers_can_cancel_running_job(tmp_path):
+    accepting = JobManager(state_dir=str(tmp_path))
+    polled = JobManager(state_dir=str(tmp_path))
+    started = threading.Event()
+    job_id = accepting.submit_job(looping_task, started)
+    assert started.wait(5)
+
+    assert polled.cancel_job(job_id) == "processing"
+    assert wait_until_finished(polled, job_id)["status"] == "cancelled"
+    accepting.executor.shutdown(wait=True)
+    assert not (tmp_path / f"{job_id}.cancel").exists()
+
+
+def test_unknown_and_malformed_job_ids(tmp_path):
+    manager = JobManager(state_dir=str(tmp_path))
+    assert manager.get_job("00000000-0000-0000-0000-000000000000") is None
+    assert manager.get_job("../../etc/passwd") is None
+    assert manager.cancel_job("..") is None
+
+
+def test_old_status_files_are_pruned(tmp_path, monkeypatch):
+    import job_manager
+    monkeypatch.setattr(job_manager, "JOB_STATE_TTL", 10)
+    stale = tmp_path / "00000000-0000-0000-0000-000000000000.json"
+    stale.write_text("{}")
+    os.utime(stale, (time.time() - 60, time.time() - 60))
+
+    manager = JobManager(state_dir=str(tmp_path))
+    job_id = manager.submit_job(lambda checkpoint: None)
+    wait_until_finished(manager, job_id)
+    manager.executor.shutdown(wait=True)
+    assert not stale.exists()
+    assert (tmp_path / f"{job_id}.json").exists()
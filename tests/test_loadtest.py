@@ -0,0 +1,85 @@
+import io
+import json
+import os
+import sys
+
+import pytest
+
+import loadtest
+from loadtest import summarize, summarize_samples, build_report, diff_reports, parse_weights, parse_sizes
+
+
+def sample(op="protect", media="image", size=512, outcome="done", polls=4, polls_404=0, e2e=1.0):
+    return {"op": op, "media": media, "size": size, "outcome": outcome, "polls": polls,
+            "polls_404": polls_404, "submit_s": 0.1, "e2e_s": e2e, "queue_wait_s": 0.2,
+            "service_s": 0.6, "overhead_s": 0.2}
+
+
+def test_percentiles_interpolate_between_ranks():
+    summary = summarize([4, 1, 3, 2, None])
+    assert summary["count"] == 4
+    assert summary["p50"] == 2.5
+    assert summary["max"] == 4
+    assert summarize([None]) == {"count": 0}
+
+
+def test_rates_count_rejections_separately_from_errors_and_404s_as_errors():
+    samples = [sample(), sample(outcome="rejected", polls=0), sample(outcome="failed"),
+               sample(polls=4, polls_404=2)]
+    summary = summarize_samples(samples, wall_s=2.0)
+    assert summary["throughput_jobs_per_s"] == 1.0
+    # The job that finished after 404 polls counts as an error too
+    assert summary["error_rate"] == 0.5
+    assert summary["rejection_rate"] == 0.25
+    assert summary["poll_404_rate"] == pytest.approx(2 / 12, abs=1e-4)
+    assert summary["latency_s"]["end_to_end"]["count"] == 2
+
+
+def test_report_groups_scenarios_and_diffs_against_baseline():
+    baseline = build_report([sample(e2e=1.0)], 1.0, {"clients": 1}, {})
+    current = build_report([sample(e2e=1.5), sample(op="verify", media="pdf", size=64)], 1.0, {"clients": 2}, {})
+    assert set(current["scenarios"]) == {"protect/image/512", "verify/pdf/64"}
+
+    diff = diff_reports(baseline, current)
+    assert diff["overall.latency_s.end_to_end.max"] == {"baseline": 1.0, "current": 1.5, "change_pct": 50.0}
+    assert not any(name.startswith("config") for name in diff)
+    assert not any("verify/pdf/64" in name for name in diff)
+
+
+def test_cli_parsers():
+    assert parse_weights("image=3, pdf=2,video") == {"image": 3.0, "pdf": 2.0, "video": 1.0}
+    assert parse_sizes("512,1024,") == [512, 1024]
+
+
+def test_harness_end_to_end_against_the_app(server_app, workdir, monkeypatch):
+    _, client = server_app
+
+    def http_request(url, fields=None, file_path=None, headers=None, timeout=60):
+        path = url[len("http://app"):]
+        if fields is None and file_path is None:
+            response = client.get(path, headers=headers)
+        else:
+            data = dict(fields or {})
+            if file_path is not None:
+                with open(file_path, "rb") as f:
+                    data["file"] = (io.BytesIO(f.read()), os.path.basename(file_path))
+            response = client.post(path, data=data, headers=headers, content_type="multipart/form-data")
+        return response.status_code, response.headers, response.data
+    monkeypatch.setattr(loadtest, "http_request", http_request)
+
+    report_path = workdir / "report.json"
+    monkeypatch.setattr(sys, "argv", ["loadtest.py", "--url", "http://app", "--clients", "2", "--requests", "6",
+                                      "--mix", "image=1,pdf=1", "--image-sizes", "64", "--pdf-sizes", "4",
+                                      "--poll-interval", "0.02", "--fixture-dir", str(workdir / "fixtures"),
+                                      "--output", str(report_path)])
+    loadtest.main()
+
+    with open(report_path) as f:
+        report = json.load(f)
+    overall = report["overall"]
+    assert overall["requests"] == 6
+    assert overall["outcomes"] == {"done": 6}
+    assert overall["error_rate"] == 0 and overall["poll_404_rate"] == 0
+    assert overall["latency_s"]["end_to_end"]["count"] == 6
+    assert set(report["scenarios"]) <= {"protect/image/64", "verify/image/64", "protect/pdf/4", "verify/pdf/4"}
+    assert report["server"]["status"] == "alive"
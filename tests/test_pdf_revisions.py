@@ -0,0 +1,79 @@
+import io
+import random
+
+import pytest
+
+import pdf_sign
+from pdf_sign import revision_boundaries, hash_range, scan_range, sign_pdf
+from pdf_verify import verify_pdf
+
+ORIGINAL = b"%PDF-1.4\n1 0 obj << >> endobj\ntrailer << >>\n%%EOF\n"
+UPDATE = b"2 0 obj << /Annot >> endobj\ntrailer << /Prev 9 >>\n%%EOF\r\n"
+
+
+def random_pdf_bytes(seed):
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(rng.randrange(1, 12)):
+        parts.append(bytes(rng.randrange(32, 127) for _ in range(rng.randrange(0, 40))))
+        parts.append(rng.choice([b"%%EOF", b"%%EOF\n", b"%%EOF\r\n", b"%%EOF \t\r", b"%%EO", b"%%"]))
+    return b"".join(parts)
+
+
+@pytest.mark.parametrize("seed", range(25))
+@pytest.mark.parametrize("chunk", [1, 3, 7, 64])
+def test_scan_range_matches_whole_buffer_scan(seed, chunk, monkeypatch):
+    monkeypatch.setattr(pdf_sign, "READ_CHUNK", chunk)
+    content = random_pdf_bytes(seed)
+    start = random.Random(seed).randrange(len(content) + 1)
+    f = io.BytesIO(content)
+
+    digest, ends = scan_range(f, start, len(content), "sha256")
+    assert digest == hash_range(f, start, len(content), "sha256")
+    assert ends == [start + end for end in revision_boundaries(content[start:])]
+
+
+def test_unchanged_pdf_verifies(private_key, workdir):
+    path = workdir / "doc.pdf"
+    path.write_bytes(ORIGINAL + UPDATE)
+    sign_pdf(str(path))
+
+    report = verify_pdf(str(path))
+    assert report["status"] == "VERIFIED"
+    assert report["signed_revisions"] == 2
+
+
+def test_appended_revisions_are_reported_from_offsets(private_key, workdir):
+    path = workdir / "doc.pdf"
+    path.write_bytes(ORIGINAL)
+    sign_pdf(str(path))
+
+    path.write_bytes(ORIGINAL + UPDATE + UPDATE + b"trailing")
+    report = verify_pdf(str(path))
+    assert report["status"] == "UPDATED"
+    assert report["intact_revisions"] == 1
+    assert report["appended_bytes"] == 2 * len(UPDATE) + len(b"trailing")
+    assert report["appended_revisions"] == 3
+    assert bytes.fromhex(report["appended_hash"]) == hash_range(
+        io.BytesIO(UPDATE + UPDATE + b"trailing"), 0, 2 * len(UPDATE) + 8, report["hash_alg"])
+
+
+def test_modified_revision_is_located(private_key, workdir):
+    path = workdir / "doc.pdf"
+    path.write_bytes(ORIGINAL + UPDATE)
+    sign_pdf(str(path))
+
+    path.write_bytes(ORIGINAL + UPDATE.replace(b"Annot", b"Anno7"))
+    report = verify_pdf(str(path))
+    assert report["status"] == "TAMPERED"
+    assert report["diverged_revision"] == 1
+    assert report["intact_bytes"] == len(ORIGINAL)
+
+
+def test_unrelated_pdf_has_no_match(private_key, workdir):
+    path = workdir / "doc.pdf"
+    path.write_bytes(ORIGINAL)
+    sign_pdf(str(path))
+
+    path.write_bytes(ORIGINAL.replace(b"1 0 obj", b"9 0 obj"))
+    assert verify_pdf(str(path))["status"] == "TAMPERED"
@@ -0,0 +1,115 @@
+import io
+
+import imageio.v3 as iio
+import numpy as np
+import pytest
+
+from conftest import random_frames, random_image, wait_for_job
+from perturb import noise, noise_seed, perturbation_key, STREAM_IMAGE, STREAM_VIDEO, PERTURB_BITS
+from provenance_record import ProvenanceRecord
+from image_stream import STRIP_ROWS
+
+
+def read_record(path):
+    with open(path, "rb") as f:
+        return ProvenanceRecord.from_bytes(f.read())
+
+
+def image_noise(seed, shape):
+    return np.concatenate([noise(seed, STREAM_IMAGE, y0 // STRIP_ROWS, (min(STRIP_ROWS, shape[0] - y0),) + shape[1:])
+                           for y0 in range(0, shape[0], STRIP_ROWS)])
+
+
+def test_noise_is_deterministic_and_low_bits_only():
+    a = noise(7, STREAM_VIDEO, 3, (4, 5, 3))
+    assert np.array_equal(a, noise(7, STREAM_VIDEO, 3, (4, 5, 3)))
+    assert not np.array_equal(a, noise(7, STREAM_VIDEO, 4, (4, 5, 3)))
+    assert a.max() < 1 << PERTURB_BITS
+
+
+def test_perturbation_key_depends_on_the_signing_key(private_key):
+    from cryptography.hazmat.primitives.asymmetric import ec
+
+    key = perturbation_key(private_key)
+    assert key == perturbation_key(private_key)
+    assert key != perturbation_key(ec.generate_private_key(ec.SECP256R1()))
+    assert noise_seed(key, 1) != noise_seed(key, 2)
+
+
+def test_perturbed_image_is_reproducible_only_with_the_key(private_key, write_image, workdir):
+    from image_sign import sign_image
+    from image_verify import verify_image
+
+    original = random_image()
+    path = write_image(workdir / "photo.png", original)
+    record = read_record(sign_image(path, perturb=True))
+    protected = iio.imread(workdir / "photo_protected.png")
+
+    nonce, bits = record.perturbation
+    assert bits == PERTURB_BITS
+    assert "seed" not in record.to_json()["perturbation"]
+    assert not np.array_equal(protected, original)
+    # The stored nonce alone doesn't give the noise; the key-derived seed does
+    assert not np.array_equal(protected ^ image_noise(nonce, original.shape), original)
+    seed = noise_seed(perturbation_key(private_key), nonce)
+    assert np.array_equal(protected ^ image_noise(seed, original.shape), original)
+
+    assert verify_image(str(workdir / "photo_protected.png"))["status"] == "VERIFIED"
+
+
+def test_perturbed_video_verifies(private_key, write_video, workdir):
+    from video_sign import sign_video
+    from video_verify import verify_video
+
+    frames = random_frames(5)
+    path = write_video(workdir / "clip.mkv", frames)
+    record = read_record(sign_video(path, perturb=True, output_path=str(workdir / "out.mkv")))
+
+    seed = noise_seed(perturbation_key(private_key), record.perturbation[0])
+    protected = iio.imread(workdir / "out.mkv")
+    for index, frame in enumerate(protected):
+        assert np.array_equal(frame ^ noise(seed, STREAM_VIDEO, index, frame.shape), frames[index])
+    assert verify_video(str(workdir / "out.mkv"))["status"] == "VERIFIED"
+
+
+def test_unperturbed_signing_records_no_perturbation(private_key, write_image, workdir):
+    from image_sign import sign_image
+
+    assert read_record(sign_image(write_image(workdir / "photo.png", random_image()))).perturbation is None
+
+
+def png_upload(**fields):
+    return {"file": (io.BytesIO(iio.imwrite("<bytes>", random_image(), extension=".png")), "photo.png"), **fields}
+
+
+def test_server_signs_uploads_unchanged_by_default(server_app):
+    _, client = server_app
+    response = client.post("/api/protect", data=png_upload(), content_type="multipart/form-data")
+    job = wait_for_job(client, response.get_json()["job_id"])
+    assert job["status"] == "done"
+    assert "preview_url" not in job["result"]
+    assert np.array_equal(iio.imread(client.get(job["result"]["asset_url"]).data, extension=".png"), random_image())
+
+
+def test_server_perturbs_on_request(server_app):
+    _, client = server_app
+    response = client.post("/api/protect", data=png_upload(perturb="1"), content_type="multipart/form-data")
+    job = wait_for_job(client, response.get_json()["job_id"])
+    published = iio.imread(client.get(job["result"]["asset_url"]).data, extension=".png")
+    assert not np.array_equal(published, random_image())
+
+
+def test_perturbed_video_gets_playable_preview(server_app, write_video, workdir):
+    pytest.importorskip("imageio_ffmpeg")
+    _, client = server_app
+    path = write_video(workdir / "clip.mkv", random_frames(4))
+    with open(path, "rb") as f:
+        data = {"file": (io.BytesIO(f.read()), "clip.mkv"), "perturb": "1"}
+    job = wait_for_job(client, client.post("/api/protect", data=data,
+                                           content_type="multipart/form-data").get_json()["job_id"])
+    assert job["status"] == "done"
+    assert job["result"]["asset_url"].endswith(".mkv")
+    assert job["result"]["preview_url"].endswith(".mp4")
+    preview = client.get(job["result"]["preview_url"])
+    assert preview.status_code == 200
+    assert preview.mimetype == "video/mp4"
@@ -0,0 +1,93 @@
+import io
+import time
+import functools
+
+import pytest
+
+import job_manager as job_manager_module
+from job_profiler import JobProfiler
+from conftest import wait_for_job
+
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    total = 0
+    while time.perf_counter() < end:
+        total += 1
+    return total
+
+
+def test_sampling_profile_finds_the_hot_function(tmp_path):
+    with JobProfiler("job1", mode="sampling", interval=0.002, artifact_dir=str(tmp_path)) as profiler:
+        busy_loop(0.2)
+
+    summary = profiler.summary
+    assert summary["mode"] == "sampling"
+    assert summary["samples"] > 10
+    assert summary["hotspots"][0]["function"].startswith("busy_loop")
+    with open(summary["artifact"]) as f:
+        line = f.readline()
+    stack, count = line.rsplit(" ", 1)
+    assert "busy_loop" in stack and int(count) > 0
+
+
+def test_cprofile_mode_writes_pstats(tmp_path):
+    with JobProfiler("job2", mode="cprofile", artifact_dir=str(tmp_path)) as profiler:
+        busy_loop(0.01)
+
+    assert profiler.summary["artifact"].endswith(".prof")
+    assert any(h["function"].startswith("busy_loop") for h in profiler.summary["hotspots"])
+
+
+def test_summary_errors_never_fail_the_job(tmp_path, monkeypatch):
+    def broken(self, duration):
+        raise ValueError("bad stats")
+    monkeypatch.setattr(JobProfiler, "_sampling_summary", broken)
+
+    with JobProfiler("job3", mode="sampling", artifact_dir=str(tmp_path)) as profiler:
+        result = busy_loop(0.01)
+
+    assert result > 0
+    assert profiler.summary["error"] == "bad stats"
+
+
+@pytest.fixture
+def admin_server(server_app, tmp_path, monkeypatch):
+    server, client = server_app
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+    monkeypatch.setattr(job_manager_module, "JobProfiler",
+                        functools.partial(JobProfiler, artifact_dir=str(tmp_path / "profiles")))
+    return server, client
+
+
+def pdf_upload(**fields):
+    return dict(fields, file=(io.BytesIO(b"%PDF-1.4\n%%EOF\n"), "doc.pdf"))
+
+
+def test_profiling_requires_admin_token(admin_server):
+    _, client = admin_server
+    response = client.post("/api/protect", data=pdf_upload(profile="1"), content_type="multipart/form-data")
+    assert response.status_code == 403
+
+    response = client.post("/api/protect", data=pdf_upload(profile="1"), content_type="multipart/form-data",
+                           headers={"X-Admin-Token": "wrong"})
+    assert response.status_code == 403
+
+
+def test_admin_sees_profile_and_downloads_artifact(admin_server):
+    _, client = admin_server
+    admin = {"X-Admin-Token": "secret"}
+    response = client.post("/api/protect", data=pdf_upload(profile="1"), content_type="multipart/form-data",
+                           headers=admin)
+    job_id = response.get_json()["job_id"]
+    wait_for_job(client, job_id)
+
+    job = client.get(f"/api/jobs/{job_id}", headers=admin).get_json()
+    assert job["profile"]["artifact_url"] == f"/api/jobs/{job_id}/profile"
+    assert "artifact" not in job["profile"]
+    assert client.get(job["profile"]["artifact_url"], headers=admin).status_code == 200
+
+    # Everyone else sees neither the profile nor that one was taken
+    public = client.get(f"/api/jobs/{job_id}").get_json()
+    assert "profile" not in public and "profiled" not in public
+    assert client.get(f"/api/jobs/{job_id}/profile").status_code == 403
@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+import pytest
+
+from video_utils import content_hash
+from provenance_record import (ProvenanceRecord, HEADER_V1, HEADER_SIZE, MAGIC, ALG_CODES,
+                               KIND_IMAGE, KIND_PDF, KIND_VIDEO, peek_kind)
+from provenance_store import (store_record, transaction, verify_record, iter_records, find_records,
+                              record_path, signature_path)
+
+
+def digests(count, alg="blake2b"):
+    return [content_hash(bytes([i]), alg) for i in range(count)]
+
+
+def test_round_trip_is_byte_exact_and_zero_copy():
+    record = ProvenanceRecord.build(KIND_IMAGE, "blake2b", digests(64), "abcd1234", grid=(8, 8))
+    data = record.to_bytes()
+    assert len(data) == HEADER_SIZE + 64 * 32
+
+    parsed = ProvenanceRecord.from_bytes(data)
+    assert parsed.to_bytes() == data
+    assert (parsed.kind, parsed.alg, parsed.id, parsed.grid) == (KIND_IMAGE, "blake2b", "abcd1234", (8, 8))
+    assert parsed.digest(5) == content_hash(bytes([5]), "blake2b")
+    assert np.shares_memory(parsed.digests, np.frombuffer(parsed.raw, dtype=np.uint8))
+
+
+def test_pdf_records_carry_offsets_and_size():
+    record = ProvenanceRecord.build(KIND_PDF, "sha256", digests(2, "sha256"), "pdf00001", size=300,
+                                    offsets=[100, 300])
+    data = ProvenanceRecord.from_bytes(record.to_bytes()).to_json()
+    assert data["size"] == 300
+    assert [rev["end"] for rev in data["revisions"]] == [100, 300]
+
+
+def test_version_1_records_still_parse():
+    body = b"".join(digests(3))
+    header = HEADER_V1.pack(MAGIC, 1, KIND_VIDEO, ALG_CODES["blake2b"], 32, 0, 0, 3, 0, b"old00001")
+    record = ProvenanceRecord.from_bytes(header + body)
+    assert record.id == "old00001"
+    assert record.digest(2) == content_hash(bytes([2]), "blake2b")
+    assert record.perturbation is None
+
+
+@pytest.mark.parametrize("mutate", [
+    lambda data: b"XXXX" + data[4:],                  # magic
+    lambda data: data[:4] + b"\x09" + data[5:],       # version
+    lambda data: data[:20],                           # truncated header
+    lambda data: data[:-1],                           # truncated body
+    lambda data: data + b"\x00",                      # trailing bytes
+])
+def test_malformed_records_are_rejected(mutate):
+    data = ProvenanceRecord.build(KIND_VIDEO, "blake2b", digests(3), "abcd1234").to_bytes()
+    with pytest.raises(ValueError):
+        ProvenanceRecord.from_bytes(mutate(data))
+
+
+def test_peek_kind():
+    data = ProvenanceRecord.build(KIND_VIDEO, "blake2b", digests(1), "abcd1234").to_bytes()
+    assert peek_kind(data[:HEADER_SIZE]) == KIND_VIDEO
+    assert peek_kind(b"HMP") is None
+    assert peek_kind(b"not a record") is None
+
+
+def test_stored_record_signature_covers_exact_bytes(private_key, public_key, workdir):
+    path = store_record({"kind": KIND_VIDEO, "alg": "blake2b", "digests": digests(4)}, private_key)
+    with open(path, "rb") as f:
+        record = ProvenanceRecord.from_bytes(f.read())
+    assert verify_record(record, public_key)
+
+    data = bytearray(record.to_bytes())
+    data[-1] ^= 1
+    assert not verify_record(ProvenanceRecord.from_bytes(bytes(data)), public_key)
+
+
+def test_transaction_writes_all_records_or_none(private_key, workdir):
+    with transaction(private_key, "provenance") as txn:
+        paths = [txn.add({"kind": KIND_VIDEO, "alg": "blake2b", "digests": digests(2)}) for _ in range(3)]
+        assert not any(os.path.exists(path) for path in paths)
+    assert all(os.path.exists(path) for path in paths)
+    assert not [name for name in os.listdir("provenance") if name.endswith(".tmp")]
+
+    with pytest.raises(RuntimeError):
+        with transaction(private_key, "provenance") as txn:
+            failed = txn.add({"kind": KIND_VIDEO, "alg": "blake2b", "digests": digests(2)})
+            raise RuntimeError("batch failed")
+    assert not os.path.exists(failed)
+
+
+def test_records_are_found_by_kind_and_first_digest(private_key, workdir):
+    video = store_record({"kind": KIND_VIDEO, "alg": "blake2b", "digests": digests(3)}, private_key)
+    store_record({"kind": KIND_IMAGE, "alg": "blake2b", "digests": digests(4), "grid": (2, 2)}, private_key)
+
+    video_id = os.path.basename(video)[len("record_"):-len(".hpr")]
+    assert [r.id for r in iter_records(KIND_VIDEO)] == [video_id]
+    assert len(list(iter_records())) == 2
+    assert [r.id for r in find_records(KIND_VIDEO, {digests(1)[0]})] == [video_id]
+    assert list(find_records(KIND_VIDEO, {content_hash(b"other", "blake2b")})) == []
+    assert os.path.exists(signature_path(video_id)) and record_path(video_id) == video
@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+
+import provenance_snapshot
+import provenance_store
+from provenance_record import KIND_IMAGE, KIND_VIDEO
+from provenance_snapshot import SnapshotReader, export_snapshot, load_manifest, MANIFEST_NAME
+from provenance_store import store_record, verify_record, iter_records, find_records
+
+
+def add_record(private_key, seed, kind=KIND_IMAGE):
+    digest = bytes([seed]) * 32
+    fields = {"kind": kind, "alg": "sha256", "digests": [digest]}
+    if kind == KIND_IMAGE:
+        fields["grid"] = (1, 1)
+    return store_record(fields, private_key)
+
+
+def test_first_export_is_a_base_then_deltas(private_key, workdir):
+    add_record(private_key, 1)
+    base = export_snapshot("snap", private_key)
+    assert len(base["files"]) == 1
+
+    assert export_snapshot("snap", private_key) is None  # Nothing new
+
+    add_record(private_key, 2)
+    delta = export_snapshot("snap", private_key)
+    assert delta["generation"] == base["generation"] + 1
+    assert [f["records"] for f in delta["files"]] == [1, 1]
+
+
+def test_compacts_after_max_deltas(private_key, workdir, monkeypatch):
+    monkeypatch.setattr(provenance_snapshot, "MAX_DELTAS", 2)
+    add_record(private_key, 0)
+    export_snapshot("snap", private_key)
+
+    # The base plus exactly MAX_DELTAS deltas, then a compaction
+    counts = []
+    for seed in range(1, 4):
+        add_record(private_key, seed)
+        counts.append(len(export_snapshot("snap", private_key)["files"]))
+    assert counts == [2, 3, 1]
+
+    manifest = load_manifest("snap", private_key.public_key())
+    assert manifest["files"][0]["records"] == 4
+    assert sorted(os.listdir("snap")) == [MANIFEST_NAME, manifest["files"][0]["name"]]
+
+
+def test_reader_serves_records_with_signatures(private_key, public_key, workdir):
+    add_record(private_key, 1)
+    add_record(private_key, 2, KIND_VIDEO)
+    export_snapshot("snap", private_key)
+
+    reader = SnapshotReader("snap", public_key)
+    assert reader.info() == {"generation": 1, "files": 1, "records": 2}
+    [video] = reader.records(KIND_VIDEO)
+    assert video.digest(0) == bytes([2]) * 32
+    assert verify_record(video, public_key, "nowhere")
+    assert [r.id for r in reader.find(KIND_VIDEO, [bytes([2]) * 32])] == [video.id]
+    assert list(reader.find(KIND_IMAGE, [bytes([2]) * 32])) == []
+
+
+def test_tampered_manifest_is_rejected_and_reader_keeps_generation(private_key, public_key, workdir):
+    add_record(private_key, 1)
+    export_snapshot("snap", private_key)
+    reader = SnapshotReader("snap", public_key)
+
+    path = os.path.join("snap", MANIFEST_NAME)
+    with open(path) as f:
+        data = json.load(f)
+    data["manifest"]["generation"] = 99
+    with open(path, "w") as f:
+        json.dump(data, f)
+
+    with pytest.raises(ValueError):
+        load_manifest("snap", public_key)
+    reader.refresh(force=True)
+    assert reader.generation == 1
+    with pytest.raises(ValueError):
+        export_snapshot("snap", private_key)
+    # Compaction replaces the bad generation
+    assert export_snapshot("snap", private_key, compact=True)["generation"] == 2
+
+
+def test_store_reads_snapshot_before_local_records(private_key, public_key, workdir, monkeypatch):
+    add_record(private_key, 1)
+    export_snapshot("snap", private_key)
+    add_record(private_key, 2)
+
+    monkeypatch.setattr(provenance_store, "SNAPSHOT_DIR", "snap")
+    monkeypatch.setattr(provenance_store, "SNAPSHOT_KEY_PATH", "keys/public_key.pem")
+    monkeypatch.setattr(provenance_store, "_snapshot_reader", None)
+
+    records = list(iter_records(KIND_IMAGE))
+    assert [r.digest(0)[0] for r in records] == [1, 2]
+    assert records[0].signature is not None and records[1].signature is None
+    assert [r.digest(0)[0] for r in find_records(KIND_IMAGE, [bytes([2]) * 32])] == [2]
@@ -0,0 +1,100 @@
+import io
+import os
+import sys
+import json
+import subprocess
+
+import pytest
+
+from conftest import ROOT, random_image, wait_for_job
+
+
+def png_bytes():
+    import imageio.v3 as iio
+    return iio.imwrite("<bytes>", random_image(), extension=".png")
+
+
+def test_file_parts_stream_into_upload_dir(server_app):
+    server, _ = server_app
+    data = {"file": (io.BytesIO(b"x" * 100_000), "clip.mp4")}
+    with server.app.test_request_context("/api/protect", method="POST", data=data,
+                                         content_type="multipart/form-data"):
+        stream = server.request.files["file"].stream
+        assert os.path.dirname(stream.name) == server.UPLOAD_DIR
+
+        # Saving is a rename of the streamed file, not a copy
+        target = os.path.join(server.BASE_DIR, "input_test.mp4")
+        server.save_upload(server.request.files["file"], target)
+        assert not os.path.exists(stream.name)
+        assert os.path.getsize(target) == 100_000
+
+
+def test_unused_uploads_are_removed(server_app):
+    server, client = server_app
+    response = client.post("/api/protect", data={"file": (io.BytesIO(b"data"), "notes.txt")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 400
+    assert os.listdir(server.UPLOAD_DIR) == []
+
+
+def test_protect_job_runs_off_the_request(server_app):
+    server, client = server_app
+    response = client.post("/api/protect", data={"file": (io.BytesIO(png_bytes()), "photo.png")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 200
+    job = wait_for_job(client, response.get_json()["job_id"])
+    assert job["status"] == "done"
+    assert os.listdir(server.UPLOAD_DIR) == []
+
+
+# Runs in its own interpreter: patching is process-wide and can't be undone
+GEVENT_WORKER_SCRIPT = """
+import json, sys, threading, time
+from gevent import monkey
+from gevent_worker import PATCH_OPTIONS
+monkey.patch_all(**PATCH_OPTIONS)
+
+import urllib.request
+from gevent.pywsgi import WSGIServer
+import server
+
+def burn(seconds, checkpoint=None):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+    return {"thread": threading.get_native_id()}
+
+http = WSGIServer(("127.0.0.1", 0), server.app, log=None)
+http.start()
+job_id = server.job_manager.submit_job(burn, 3.0)
+time.sleep(0.3)
+
+started = time.perf_counter()
+with urllib.request.urlopen(f"http://127.0.0.1:{http.server_port}/health", timeout=10) as response:
+    response.read()
+health_s = time.perf_counter() - started
+status_during = server.job_manager.get_job(job_id)["status"]
+
+while server.job_manager.get_job(job_id)["status"] in ("queued", "processing"):
+    time.sleep(0.05)
+job = server.job_manager.get_job(job_id)
+print(json.dumps({"health_s": health_s, "status_during": status_during, "status": job["status"],
+                  "job_thread": job["result"]["thread"], "request_thread": threading.get_native_id()}))
+"""
+
+
+def test_gevent_worker_runs_jobs_on_native_threads(tmp_path):
+    pytest.importorskip("gevent")
+    pytest.importorskip("gunicorn")
+
+    env = dict(os.environ, JOB_STATE_DIR=str(tmp_path / "jobs"),
+               PYTHONPATH=os.pathsep.join([ROOT, os.environ.get("PYTHONPATH", "")]))
+    output = subprocess.run([sys.executable, "-c", GEVENT_WORKER_SCRIPT], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=60, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    # /health was answered while the CPU-bound job held its own OS thread
+    assert result["status_during"] == "processing"
+    assert result["health_s"] < 1.0
+    assert result["status"] == "done"
+    assert result["job_thread"] != result["request_thread"]
@@ -0,0 +1,127 @@
+import random
+import subprocess
+from types import SimpleNamespace
+
+import imageio.v3 as iio
+import pytest
+
+import video_verify
+
+from conftest import random_frames
+from video_verify import stratified_sample, tampered_fraction_upper_bound, verify_video, quick_verify_video
+
+
+def test_stratified_sample_takes_one_frame_per_stratum():
+    samples = stratified_sample(1000, 10, random.Random(1))
+    assert len(samples) == 10
+    assert [s // 100 for s in samples] == list(range(10))
+
+
+def test_short_videos_are_checked_completely():
+    assert stratified_sample(5, 32, random.Random(1)) == [0, 1, 2, 3, 4]
+
+
+def test_upper_bound_without_failures():
+    # (1 - p)^n = alpha at the bound when nothing failed
+    bound = tampered_fraction_upper_bound(32, 0, 0.95)
+    assert (1 - bound) ** 32 == pytest.approx(0.05, rel=1e-6)
+
+
+def test_upper_bound_grows_with_failures_and_confidence():
+    assert tampered_fraction_upper_bound(32, 1, 0.95) > tampered_fraction_upper_bound(32, 0, 0.95)
+    assert tampered_fraction_upper_bound(32, 0, 0.99) > tampered_fraction_upper_bound(32, 0, 0.95)
+    assert tampered_fraction_upper_bound(32, 32, 0.95) == 1.0
+    assert tampered_fraction_upper_bound(0, 0, 0.95) == 1.0
+
+
+def test_quick_verify_of_signed_video(private_key, write_video, workdir):
+    from video_sign import sign_video
+
+    path = write_video(workdir / "clip.mkv", random_frames(12))
+    sign_video(path)
+
+    report = verify_video(path, mode="quick", sample_size=4)
+    assert report["status"] == "VERIFIED"
+    assert len(report["sampled_frames"]) == 4
+    assert report["total_expected_frames"] == 12
+    assert 0 < report["tampered_fraction_upper_bound"] < 1
+
+
+def test_quick_verify_reports_sampled_mismatches(private_key, write_video, workdir):
+    from video_sign import sign_video
+
+    frames = random_frames(12)
+    path = write_video(workdir / "clip.mkv", frames)
+    sign_video(path)
+
+    frames[5] = 255 - frames[5]
+    write_video(path, frames)
+    report = verify_video(path, mode="quick", sample_size=12)
+    assert report["status"] == "FAILED"
+    assert report["failure_type"] == "SAMPLED_FRAME_MISMATCH"
+    assert report["mismatched_frames"] == [5]
+    assert report["first_mismatched_frame"] == 5
+
+
+def test_quick_verify_is_one_pass_hashing_only_samples(private_key, write_video, workdir, monkeypatch):
+    from video_sign import sign_video
+
+    path = write_video(workdir / "clip.mkv", random_frames(40, height=8, width=8))
+    sign_video(path)
+
+    passes, hashed = [], []
+
+    def imiter(*args, **kwargs):
+        passes.append(0)
+        for frame in iio.imiter(*args, **kwargs):
+            passes[-1] += 1
+            yield frame
+
+    def no_seek(*args, **kwargs):
+        raise AssertionError("per-sample decoder opened")
+
+    real_content_hash = video_verify.content_hash
+
+    def content_hash(frame, alg):
+        hashed.append(alg)
+        return real_content_hash(frame, alg)
+
+    monkeypatch.setattr(video_verify, "iio", SimpleNamespace(imiter=imiter, imopen=no_seek, imwrite=iio.imwrite))
+    monkeypatch.setattr(video_verify, "content_hash", content_hash)
+
+    report = verify_video(path, mode="quick", sample_size=4, evidence=False)
+    assert report["status"] == "VERIFIED"
+    # Never more decoding than a full verification, and hashing for the first frame plus the samples only
+    assert passes == [40]
+    assert hashed.count(report["hash_alg"]) <= 1 + 4
+
+
+def test_quick_verify_counts_frames_like_the_signer_on_variable_frame_rate(private_key, write_video, workdir):
+    imageio_ffmpeg = pytest.importorskip("imageio_ffmpeg")
+    from video_sign import sign_video
+
+    # Frames 10 on are spaced three times further apart
+    source = write_video(workdir / "source.mkv", random_frames(60, height=16, width=16))
+    path = str(workdir / "vfr.mkv")
+    subprocess.run([imageio_ffmpeg.get_ffmpeg_exe(), "-loglevel", "error", "-i", source,
+                    "-vf", "setpts='if(lt(N,10),N,N*3)/10/TB'", "-fps_mode", "passthrough",
+                    "-c:v", "libx264rgb", "-qp", "0", path], check=True)
+    sign_video(path)
+
+    for seed in range(3):
+        report = quick_verify_video(path, sample_size=8, seed=seed, evidence=False)
+        assert report["status"] == "VERIFIED", report["mismatched_frames"]
+
+
+def test_quick_verify_probes_appended_frames(private_key, write_video, workdir):
+    from video_sign import sign_video
+
+    frames = random_frames(10)
+    path = write_video(workdir / "clip.mkv", frames)
+    sign_video(path)
+
+    write_video(path, list(frames) + list(random_frames(3, seed=9)))
+    report = verify_video(path, mode="quick", sample_size=4)
+    assert report["failure_type"] == "EXTRA_FRAMES"
+    assert report["first_mismatched_frame"] == 10
+    assert report["mismatch_overlay"].endswith("mismatch_frame_10.png")
@@ -0,0 +1,188 @@
+import io
+import os
+import threading
+from types import SimpleNamespace
+
+import imageio.v3 as iio
+import pytest
+
+import video_verify
+from conftest import random_frames, wait_for_job
+from video_verify import verify_video, MAX_RANGE_THUMBNAILS
+
+
+@pytest.fixture
+def signed_clip(private_key, write_video, workdir):
+    """
+    A signed 12-frame video; returns (path, frames) so tests can rewrite it tampered.
+    """
+    from video_sign import sign_video
+
+    frames = random_frames(12)
+    path = write_video(workdir / "clip.mkv", frames)
+    sign_video(path)
+    return path, frames
+
+
+def ranges_of(report):
+    return [(r["start"], r["end"], r["kind"]) for r in report["tampered_ranges"]]
+
+
+def test_every_tampered_range_is_reported(signed_clip, write_video):
+    path, frames = signed_clip
+    frames[3:5] = 255 - frames[3:5]
+    frames[8] = 255 - frames[8]
+    write_video(path, frames)
+
+    report = verify_video(path)
+    assert report["failure_type"] == "FRAME_HASH_MISMATCH"
+    assert ranges_of(report) == [(3, 4, "modified"), (8, 8, "modified")]
+    assert report["mismatched_frame_count"] == 3
+    assert report["first_mismatched_frame"] == 3
+
+
+def test_tampered_first_frame_is_range_zero(signed_clip, write_video):
+    path, frames = signed_clip
+    frames[0] = 255 - frames[0]
+    frames[6] = 255 - frames[6]
+    write_video(path, frames)
+
+    report = verify_video(path)
+    assert ranges_of(report) == [(0, 0, "modified"), (6, 6, "modified")]
+    assert report["mismatch_overlay"] == report["tampered_ranges"][0]["overlay"]
+
+
+def test_truncated_video_reports_missing_frames(signed_clip, write_video):
+    path, frames = signed_clip
+    write_video(path, frames[:9])
+
+    report = verify_video(path)
+    assert report["failure_type"] == "MISSING_FRAMES"
+    assert ranges_of(report) == [(9, 11, "missing")]
+    assert "overlay" not in report["tampered_ranges"][0]
+    assert "mismatch_overlay" not in report
+
+
+def test_appended_frames_are_extra(signed_clip, write_video):
+    path, frames = signed_clip
+    write_video(path, list(frames) + list(random_frames(2, seed=5)))
+
+    report = verify_video(path)
+    assert ranges_of(report) == [(12, 13, "extra")]
+
+
+def test_overlays_reuse_scan_thumbnails(signed_clip, write_video, monkeypatch):
+    path, frames = signed_clip
+    frames[5] = 255 - frames[5]
+    write_video(path, frames)
+
+    # A full verification decodes the video once; no frame is re-read for the overlays
+    passes = []
+
+    def imiter(*args, **kwargs):
+        passes.append(args)
+        return iio.imiter(*args, **kwargs)
+
+    def no_seek(*args, **kwargs):
+        raise AssertionError("frame decoded again")
+    monkeypatch.setattr(video_verify, "iio", SimpleNamespace(imiter=imiter, imopen=no_seek, imwrite=iio.imwrite))
+
+    report = verify_video(path)
+    assert len(passes) == 1
+    overlay = iio.imread(report["mismatch_overlay"])
+    assert overlay.shape == frames[5].shape
+    assert (overlay[0, 0] == [255, 0, 0]).all()
+
+
+def test_thumbnails_are_capped(private_key, write_video, workdir):
+    from video_sign import sign_video
+
+    count = 2 * (MAX_RANGE_THUMBNAILS + 2)
+    frames = random_frames(count, height=8, width=8)
+    path = write_video(workdir / "long.mkv", frames)
+    sign_video(path)
+    frames[1::2] = 255 - frames[1::2]
+    write_video(path, frames)
+
+    report = verify_video(path)
+    assert len(report["tampered_ranges"]) == MAX_RANGE_THUMBNAILS + 2
+    assert sum("overlay" in r for r in report["tampered_ranges"]) == MAX_RANGE_THUMBNAILS
+
+
+def test_quick_mode_overlay_from_sampled_frame(signed_clip, write_video):
+    path, frames = signed_clip
+    frames[7] = 255 - frames[7]
+    write_video(path, frames)
+
+    report = verify_video(path, mode="quick", sample_size=12)
+    assert report["first_mismatched_frame"] == 7
+    assert report["mismatch_overlay"].endswith("mismatch_frame_7.png")
+
+
+def test_no_evidence_writes_no_overlays(signed_clip, write_video, workdir):
+    path, frames = signed_clip
+    frames[2] = 255 - frames[2]
+    write_video(path, frames)
+
+    report = verify_video(path, evidence=False)
+    assert ranges_of(report) == [(2, 2, "modified")]
+    assert "mismatch_overlay" not in report
+    assert not list(workdir.glob("provenance/*.png"))
+
+
+def test_server_publishes_each_range_overlay(server_app, write_video, workdir):
+    from video_sign import sign_video
+
+    _, client = server_app
+    frames = random_frames(10)
+    path = write_video(workdir / "clip.mkv", frames)
+    sign_video(path)
+    frames[0] = 255 - frames[0]
+    frames[5] = 255 - frames[5]
+    write_video(path, frames)
+
+    with open(path, "rb") as f:
+        data = {"file": (io.BytesIO(f.read()), "clip.mkv"), "key": open("keys/public_key.pem").read()}
+    response = client.post("/api/verify", data=data, content_type="multipart/form-data")
+    job = wait_for_job(client, response.get_json()["job_id"])
+    details = job["result"]["details"]
+    ranges = details["tampered_ranges"]
+    assert [r["start"] for r in ranges] == [0, 5]
+    assert all(client.get(r["overlay_url"]).status_code == 200 for r in ranges)
+    assert details["mismatch_overlay_url"] == ranges[0]["overlay_url"]
+
+
+def test_concurrent_verifications_keep_their_own_range_overlays(server_app, write_video, workdir, monkeypatch):
+    from job_manager import JobManager
+    from video_sign import sign_video
+
+    server, client = server_app
+    monkeypatch.setattr(server, "job_manager", JobManager(max_workers=2))
+    # Both videos are tampered at frame 2, so both have a range named 2-2
+    paths = []
+    for seed in (1, 2):
+        frames = random_frames(6, seed=seed)
+        path = write_video(workdir / f"clip_{seed}.mkv", frames)
+        sign_video(path)
+        frames[2] = 255 - frames[2]
+        write_video(path, frames)
+        paths.append(path)
+
+    # Both jobs have written their overlays before either publishes
+    both_written = threading.Barrier(2, timeout=10)
+    real_verify_video = video_verify.verify_video
+
+    def verify(*args, **kwargs):
+        report = real_verify_video(*args, **kwargs)
+        both_written.wait()
+        return report
+    monkeypatch.setattr(video_verify, "verify_video", verify)
+
+    job_ids = []
+    for path in paths:
+        with open(path, "rb") as f:
+            data = {"file": (io.BytesIO(f.read()), os.path.basename(path))}
+        job_ids.append(client.post("/api/verify", data=data, content_type="multipart/form-data").get_json()["job_id"])
+    overlays = [wait_for_job(client, job_id)["result"]["details"]["tampered_ranges"][0].get("overlay_url")
+                for job_id in job_ids]
+    assert all(overlays) and overlays[0] != overlays[1]
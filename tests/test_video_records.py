@@ -0,0 +1,134 @@
+import json
+import os
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from conftest import random_frames
+from video_utils import content_hash, frame_index_message
+from video_verify import verify_video, LOOKUP_FRAMES
+
+
+def write_legacy_index(frames, private_key, provenance_dir="provenance"):
+    """
+    The single-slot video_frames.bin index the signer wrote before per-video records.
+    """
+    os.makedirs(provenance_dir, exist_ok=True)
+    index = b"".join(content_hash(frame.tobytes(), "sha256") for frame in frames)
+    with open(os.path.join(provenance_dir, "video_frames.bin"), "wb") as f:
+        f.write(index)
+    with open(os.path.join(provenance_dir, "video_frames_sig.bin"), "wb") as f:
+        f.write(private_key.sign(frame_index_message("sha256", index), ec.ECDSA(hashes.SHA256())))
+    with open(os.path.join(provenance_dir, "video_meta.json"), "w") as f:
+        json.dump({"alg": "sha256"}, f)
+
+
+def test_each_video_keeps_its_own_record(private_key, write_video, workdir):
+    from video_sign import sign_video
+
+    first = write_video(workdir / "first.mkv", random_frames(6, seed=1))
+    second = write_video(workdir / "second.mkv", random_frames(9, seed=2))
+    sign_video(first)
+    sign_video(second)
+
+    assert verify_video(first)["total_expected_frames"] == 6
+    assert verify_video(second)["total_expected_frames"] == 9
+    assert verify_video(second)["status"] == "VERIFIED"
+
+
+def test_videos_sharing_opening_frames_each_find_their_record(private_key, write_video, workdir):
+    from video_sign import sign_video
+
+    # Both open on the same black frame; the first is signed (and so stored) first
+    first_frames = random_frames(6, seed=1)
+    second_frames = random_frames(6, seed=2)
+    first_frames[0] = second_frames[0] = 0
+    first = write_video(workdir / "first.mkv", first_frames)
+    second = write_video(workdir / "second.mkv", second_frames)
+    sign_video(first)
+    sign_video(second)
+
+    for path in (first, second):
+        assert verify_video(path)["status"] == "VERIFIED"
+        assert verify_video(path, mode="quick", sample_size=6)["status"] == "VERIFIED"
+
+    second_frames[3] = 255 - second_frames[3]
+    write_video(second, second_frames)
+    report = verify_video(second)
+    assert [(r["start"], r["end"]) for r in report["tampered_ranges"]] == [(3, 3)]
+
+
+def test_tampered_first_frame_still_finds_the_record(private_key, write_video, workdir):
+    from video_sign import sign_video
+
+    frames = random_frames(8)
+    path = write_video(workdir / "clip.mkv", frames)
+    sign_video(path)
+
+    frames[0] = 255 - frames[0]
+    write_video(path, frames)
+    report = verify_video(path)
+    assert report["status"] == "FAILED"
+    assert report["failure_type"] == "FRAME_HASH_MISMATCH"
+    assert report["tampered_ranges"] == [{"start": 0, "end": 0, "frames": 1, "kind": "modified",
+                                          "overlay": report["tampered_ranges"][0]["overlay"]}]
+    assert report["total_expected_frames"] == 8
+
+    quick = verify_video(path, mode="quick", sample_size=8)
+    assert quick["failure_type"] == "SAMPLED_FRAME_MISMATCH"
+    assert quick["mismatched_frames"] == [0]
+
+
+def test_tampered_opening_beyond_lookup_is_unmatched(private_key, write_video, workdir):
+    from video_sign import sign_video
+
+    frames = random_frames(LOOKUP_FRAMES + 2, height=16, width=16)
+    path = write_video(workdir / "clip.mkv", frames)
+    sign_video(path)
+
+    frames[:LOOKUP_FRAMES] = 255 - frames[:LOOKUP_FRAMES]
+    write_video(path, frames)
+    report = verify_video(path)
+    assert report["failure_type"] == "NO_MATCHING_RECORD"
+    assert report["total_frames_checked"] == LOOKUP_FRAMES
+
+
+def test_unrelated_video_is_not_checked_against_legacy_index(private_key, write_video, workdir):
+    from video_sign import sign_video
+
+    write_legacy_index(random_frames(5, seed=1), private_key)
+    sign_video(write_video(workdir / "signed.mkv", random_frames(5, seed=2)))
+
+    unrelated = write_video(workdir / "unrelated.mkv", random_frames(5, seed=3))
+    for mode in ("full", "quick"):
+        report = verify_video(unrelated, mode=mode)
+        assert report["status"] == "FAILED"
+        assert report["failure_type"] == "NO_MATCHING_RECORD"
+        assert not report.get("tampered_ranges")
+
+
+def test_legacy_index_still_verifies_its_video(private_key, write_video, workdir):
+    frames = random_frames(5)
+    path = write_video(workdir / "old.mkv", frames)
+    write_legacy_index(frames, private_key)
+
+    report = verify_video(path)
+    assert report["status"] == "VERIFIED"
+    assert report["hash_alg"] == "sha256"
+
+
+def test_no_index_at_all(private_key, write_video, workdir):
+    report = verify_video(write_video(workdir / "clip.mkv", random_frames(3)))
+    assert report["failure_type"] == "NO_FRAME_INDEX"
+
+
+def test_forged_record_is_a_signature_mismatch(private_key, write_video, workdir):
+    from video_sign import sign_video
+
+    path = write_video(workdir / "clip.mkv", random_frames(4))
+    record_path = sign_video(path)
+    signature = record_path.replace("record_", "sig_").replace(".hpr", ".bin")
+    with open(signature, "wb") as f:
+        f.write(private_key.sign(b"something else", ec.ECDSA(hashes.SHA256())))
+
+    assert verify_video(path)["failure_type"] == "SIGNATURE_MISMATCH"